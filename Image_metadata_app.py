@@ -1,23 +1,74 @@
 import sys
-import json
 import os
-from datetime import datetime
+import html
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QLineEdit, 
-                             QTextEdit, QFileDialog, QMessageBox, QListWidget,
-                             QScrollArea, QFrame)
+                             QTextEdit, QFileDialog, QMessageBox, QListView,
+                             QScrollArea, QFrame, QProgressBar, QMenu, QComboBox)
 from PyQt5.QtGui import QPixmap, QFont
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from login import LoginDialog
+from metadata_extractor import build_metadata, get_recommended_use, extraction_options
+from metadata_store import open_store
+from batch_ingest import ingest_changed, refresh_records, sync_changes, is_stale
+from workers import TaskRunner
+from write_behind import WriteBehind, DEFAULT_DELAY, DEFAULT_MAX_DELAY
+from folder_watcher import FolderWatcher, DEFAULT_WATCH_DELAY, list_watch_paths
+from thumbnail_cache import ThumbnailCache
+from preview_loader import PreviewLoader
+from saved_list_model import SavedImagesModel
+from catalog_index import CatalogIndex
+from duplicate_index import DuplicateIndex
+from duplicates_dialog import DuplicatesDialog
+from catalog_search import SearchIndex, FACETS, parse_query
+from export_dialog import ExportDialog
+from metadata_export import export_records
+from catalog_eviction import enforce_limit, ViewLog, views_file_for
+from diagnostics_dialog import DiagnosticsDialog
+import perf_trace
+import metadata_cli
 
 
 class ImageMetadataApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, metadata_file="image_metadata.json"):
         super().__init__()
         self.current_image_path = None
-        self.metadata_file = "image_metadata.json"
+        # Archivos .db/.sqlite usan SQLite; el resto, JSON con diario
+        self.metadata_file = metadata_file
+        self.store = open_store(self.metadata_file)
         self.metadata_db = self.load_metadata()
+        # Índice hash -> rutas con los hashes ya guardados (no relee archivos)
+        self.duplicates = DuplicateIndex(self.metadata_db.summaries)
+        # Índices por faceta y rango para la búsqueda de la lista
+        self.search = SearchIndex(self.metadata_db.summaries)
+        self.query = parse_query("")
+        # Última vez que se abrió cada imagen (política least_viewed de max_images)
+        self.views = ViewLog(views_file_for(self.metadata_file))
+        self.tasks = TaskRunner(self)
+        # Los guardados se agrupan y se escriben juntos tras una breve espera
+        settings = self.store.settings()
+        self.write_behind = WriteBehind(
+            self.tasks, self.store.put_many,
+            settings.get('write_delay_ms', DEFAULT_DELAY),
+            settings.get('max_write_delay_ms', DEFAULT_MAX_DELAY), self
+        )
+        self.write_behind.saved.connect(self.on_records_saved)
+        self.write_behind.failed.connect(self.on_write_failed)
+        # Mensaje de cada guardado pendiente, que se muestra al confirmarse la escritura
+        self.save_messages = {}
+        self.thumbnails = ThumbnailCache()
+        # Vista previa en segundo plano con precarga de las filas vecinas
+        self.previews = PreviewLoader(self.thumbnails, parent=self)
+        self.previews.ready.connect(self.on_preview_ready)
+        self.previews.failed.connect(self.on_preview_failed)
+        self.diagnostics = None
+        # Carpetas vigiladas: los cambios en disco actualizan solo los registros afectados
+        self.watcher = FolderWatcher(settings.get('watch_delay_ms', DEFAULT_WATCH_DELAY), self)
+        self.watcher.changed.connect(self.on_folders_changed)
+        self.watch_running = False
+        self.watch_queued = (set(), set())
         self.init_ui()
+        self.start_watching(settings.get('watch_folders', []))
         
     def init_ui(self):
         self.setWindowTitle("📸 Generador de Metadatos de Imágenes")
@@ -67,6 +118,14 @@ class ImageMetadataApp(QMainWindow):
         
         main_container.addLayout(content_layout)
         
+        # Barra de estado con el progreso de las tareas en segundo plano
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(250)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().setStyleSheet("QStatusBar { background: white; }")
+        self.tasks.pending_changed.connect(self.on_pending_changed)
+        
     def create_header(self):
         header = QFrame()
         header.setStyleSheet("""
@@ -157,6 +216,22 @@ class ImageMetadataApp(QMainWindow):
         """)
         layout.addWidget(self.load_button)
         
+        # Botón cargar carpeta completa (modo por lotes)
+        self.load_folder_button = QPushButton("📂 Cargar Carpeta")
+        self.load_folder_button.clicked.connect(self.load_folder)
+        self.load_folder_button.setFont(QFont("Segoe UI", 12, QFont.Bold))
+        self.load_folder_button.setStyleSheet(self.load_button.styleSheet())
+        layout.addWidget(self.load_folder_button)
+        
+        # Carpetas vigiladas (el menú se arma al abrirlo)
+        self.watch_button = QPushButton("👁️ Vigilar Carpetas")
+        self.watch_menu = QMenu(self.watch_button)
+        self.watch_menu.aboutToShow.connect(self.update_watch_menu)
+        self.watch_button.setMenu(self.watch_menu)
+        self.watch_button.setFont(QFont("Segoe UI", 12, QFont.Bold))
+        self.watch_button.setStyleSheet(self.load_button.styleSheet())
+        layout.addWidget(self.watch_button)
+        
         # Información del archivo
         self.file_info_label = QLabel()
         self.file_info_label.setWordWrap(True)
@@ -232,7 +307,7 @@ class ImageMetadataApp(QMainWindow):
         """)
         button_layout.addWidget(self.save_button)
         
-        self.export_button = QPushButton("📤 Exportar JSON")
+        self.export_button = QPushButton("📤 Exportar")
         self.export_button.clicked.connect(self.export_json)
         self.export_button.setFont(QFont("Segoe UI", 11, QFont.Bold))
         self.export_button.setStyleSheet("""
@@ -252,6 +327,24 @@ class ImageMetadataApp(QMainWindow):
         """)
         button_layout.addWidget(self.export_button)
         
+        self.refresh_button = QPushButton("🔄 Actualizar")
+        self.refresh_button.clicked.connect(self.refresh_catalogue)
+        self.refresh_button.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        self.refresh_button.setStyleSheet(self.export_button.styleSheet())
+        button_layout.addWidget(self.refresh_button)
+        
+        self.duplicates_button = QPushButton("🔍 Duplicados")
+        self.duplicates_button.clicked.connect(self.show_duplicates)
+        self.duplicates_button.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        self.duplicates_button.setStyleSheet(self.export_button.styleSheet())
+        button_layout.addWidget(self.duplicates_button)
+        
+        self.diagnostics_button = QPushButton("📊 Rendimiento")
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)
+        self.diagnostics_button.setFont(QFont("Segoe UI", 11, QFont.Bold))
+        self.diagnostics_button.setStyleSheet(self.export_button.styleSheet())
+        button_layout.addWidget(self.diagnostics_button)
+        
         scroll_layout.addLayout(button_layout)
         
         # Imágenes guardadas
@@ -260,37 +353,78 @@ class ImageMetadataApp(QMainWindow):
         saved_title.setStyleSheet("color: #667eea; padding: 10px; margin-top: 20px;")
         scroll_layout.addWidget(saved_title)
         
-        self.saved_list = QListWidget()
-        self.saved_list.itemClicked.connect(self.load_saved_metadata)
+        # Búsqueda: texto libre o filtros (ext:png mp>10 modificada>30d) y facetas con conteos
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("🔎 Buscar: nombre, ext:png orientacion:vertical mp>10 modificada>30d")
+        self.search_edit.setStyleSheet("""
+            QLineEdit {
+                border: 2px solid #e0e0e0;
+                border-radius: 8px;
+                padding: 8px;
+            }
+        """)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        # Los conteos de las facetas se recalculan tras los guardados, agrupados
+        self.facets_timer = QTimer(self)
+        self.facets_timer.setSingleShot(True)
+        self.facets_timer.setInterval(500)
+        self.facets_timer.timeout.connect(self.update_facets)
+        scroll_layout.addWidget(self.search_edit)
+        
+        facet_layout = QHBoxLayout()
+        self.facet_boxes = {}
+        for facet, label in FACETS:
+            box = QComboBox()
+            box.setToolTip(label)
+            box.activated.connect(self.apply_search)
+            self.facet_boxes[facet] = box
+            facet_layout.addWidget(box)
+        scroll_layout.addLayout(facet_layout)
+        
+        self.search_label = QLabel()
+        self.search_label.setStyleSheet("color: #666; padding: 2px 10px;")
+        scroll_layout.addWidget(self.search_label)
+        
+        # Vista sobre el modelo: solo se dibujan las filas visibles
+        # La lista solo usa los resúmenes del índice
+        self.saved_model = SavedImagesModel(self.metadata_db.summaries, self)
+        self.saved_list = QListView()
+        self.saved_list.setModel(self.saved_model)
+        self.saved_list.setUniformItemSizes(True)
+        # Cambiar de fila con el ratón o con el teclado muestra la imagen
+        self.saved_list.selectionModel().currentChanged.connect(self.load_saved_metadata)
         self.saved_list.setMinimumHeight(300)
         self.saved_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 border: 2px solid #e0e0e0;
                 border-radius: 10px;
                 background-color: white;
                 padding: 10px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 15px;
                 border-radius: 8px;
                 margin-bottom: 8px;
                 background-color: #f8f9fa;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: #e3f2fd;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #667eea;
                 color: white;
             }
         """)
         scroll_layout.addWidget(self.saved_list)
+        self.update_facets()
         
         scroll.setWidget(scroll_content)
         layout.addWidget(scroll)
         
-        self.update_saved_list()
-        
         return panel
     
     def set_placeholder_image(self):
@@ -313,31 +447,8 @@ class ImageMetadataApp(QMainWindow):
         if file_name:
             self.current_image_path = file_name
             
-            # Mostrar imagen
-            pixmap = QPixmap(file_name)
-            scaled_pixmap = pixmap.scaled(
-                self.image_label.size(), 
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            )
-            self.image_label.setPixmap(scaled_pixmap)
-            self.image_label.setStyleSheet("""
-                QLabel {
-                    border: 3px dashed #667eea;
-                    border-radius: 15px;
-                    background-color: white;
-                    padding: 20px;
-                }
-            """)
-            
-            # Mostrar información del archivo
-            file_size = os.path.getsize(file_name)
-            file_info = f"<b>📄 Información del archivo:</b><br>"
-            file_info += f"<b>Nombre:</b> {os.path.basename(file_name)}<br>"
-            file_info += f"<b>Tamaño:</b> {file_size / 1024:.2f} KB<br>"
-            file_info += f"<b>Dimensiones:</b> {pixmap.width()}x{pixmap.height()} px"
-            self.file_info_label.setText(file_info)
-            self.file_info_label.show()
+            # Mostrar imagen e información del archivo
+            self.show_preview(file_name)
             
             # Habilitar botón de guardar
             self.save_button.setEnabled(True)
@@ -345,6 +456,353 @@ class ImageMetadataApp(QMainWindow):
             # Cargar metadatos si existen
             self.load_existing_metadata()
     
+    def show_preview(self, path, row=None):
+        """
+        Pide en segundo plano la miniatura y la información del archivo (se
+        muestran en on_preview_ready). row es la fila de la lista, para
+        precargar las filas vecinas.
+        """
+        neighbours = []
+        if row is not None:
+            for distance in range(1, self.previews.prefetch_distance + 1):
+                for neighbour_row in (row + distance, row - distance):
+                    neighbour = self.saved_model.path_at(neighbour_row)
+                    if neighbour is not None:
+                        neighbours.append((neighbour, self.metadata_db.summaries.get(neighbour)))
+        self.previews.request(
+            path, self.image_label.size(),
+            summary=self.metadata_db.summaries.get(path),
+            # El registro completo se lee del almacén en el hilo, salvo que ya esté en memoria
+            record=self.metadata_db.loaded(path),
+            load=self.store.get if path in self.metadata_db else None,
+            neighbours=neighbours
+        )
+    
+    def on_preview_ready(self, preview):
+        """Muestra la miniatura y la información del archivo"""
+        if preview["path"] in self.metadata_db:
+            self.views.touch(preview["path"])
+        with perf_trace.span("preview"):
+            self._show_preview(preview)
+    
+    def _show_preview(self, preview):
+        path = preview["path"]
+        metadata = preview["metadata"]
+        image = preview["image"]
+        if image is None:
+            self.image_label.clear()
+            self.image_label.setText("No se pudo mostrar la imagen")
+        else:
+            self.image_label.setPixmap(QPixmap.fromImage(image))
+        self.image_label.setStyleSheet("""
+            QLabel {
+                border: 3px dashed #667eea;
+                border-radius: 15px;
+                background-color: white;
+                padding: 20px;
+            }
+        """)
+        
+        width = preview["width"]
+        height = preview["height"]
+        file_info = f"<b>📄 Información del archivo:</b><br>"
+        file_info += f"<b>Nombre:</b> {os.path.basename(path)}<br>"
+        file_info += f"<b>Tamaño:</b> {preview['bytes'] / 1024:.2f} KB<br>"
+        file_info += f"<b>Dimensiones:</b> {width}x{height} px"
+        embedded = (metadata or {}).get('embedded_metadata') or {}
+        if embedded.get('title'):
+            file_info += f"<br><b>Título:</b> {html.escape(embedded['title'])}"
+        if embedded.get('camera'):
+            camera = " ".join(embedded['camera'].get(key, "") for key in ("make", "model")).strip()
+            if camera:
+                file_info += f"<br><b>Cámara:</b> {html.escape(camera)}"
+        if embedded.get('capture_date'):
+            file_info += f"<br><b>Fecha de captura:</b> {embedded['capture_date']}"
+        pixels = (metadata or {}).get('pixel_statistics') or {}
+        if pixels.get('brightness'):
+            file_info += (f"<br><b>Brillo:</b> {pixels['brightness']} "
+                          f"(luminancia {pixels['mean_luminance']}, contraste {pixels['contrast']})")
+        if pixels.get('dominant_colors'):
+            swatches = "".join(f"<span style='color:{item['color']}'>■</span>" for item in pixels['dominant_colors'])
+            file_info += f"<br><b>Colores dominantes:</b> {swatches}"
+        self.file_info_label.setText(file_info)
+        self.file_info_label.show()
+    
+    def on_preview_failed(self, path, message):
+        # Sin ventana de aviso: recorriendo la lista con el teclado no interrumpe
+        self.image_label.clear()
+        self.image_label.setText("La imagen no existe en la ruta especificada")
+        self.file_info_label.hide()
+        if self.current_image_path == path:
+            self.current_image_path = None
+            self.save_button.setEnabled(False)
+        self.statusBar().showMessage(f"No se pudo leer {os.path.basename(path)}: {message}")
+    
+    def load_folder(self):
+        """Genera los metadatos de todas las imágenes de una carpeta y sus subcarpetas"""
+        directory = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta")
+        if not directory:
+            return
+        self.ingest_folder(directory)
+    
+    def ingest_folder(self, directory):
+        # Las imágenes ya catalogadas y sin cambios no se vuelven a procesar.
+        # El worker recibe una copia de los resúmenes (tienen la huella de cada archivo)
+        self.statusBar().showMessage(f"Procesando {directory}...")
+        self.tasks.extract(
+            ingest_changed, directory, dict(self.metadata_db.summaries),
+            options=self.extraction_options(),
+            on_progress=self.show_progress,
+            on_finished=self.on_folder_loaded,
+            on_error=self.on_task_error
+        )
+    
+    def on_folder_loaded(self, outcome):
+        results, errors = outcome
+        if not results and not errors:
+            self.statusBar().showMessage("No hay imágenes nuevas o modificadas en la carpeta", 5000)
+            return
+        
+        # Una sola escritura de la base de datos para todo el lote
+        self.metadata_db.update(results)
+        self.duplicates.add_many(results)
+        self.search.add_many(results)
+        self.facets_timer.start()
+        self.saved_model.add_or_update(results)
+        self.persist_records(results)
+        self.watcher.add_files(results)
+        
+        message = f"Metadatos generados para {len(results)} imágenes"
+        duplicated = sum(1 for path in results if self.duplicates.duplicates_of(path))
+        if duplicated:
+            message += f"\n{duplicated} imágenes tienen copias idénticas en la base"
+        if errors:
+            message += f"\n{len(errors)} imágenes no se pudieron leer"
+        QMessageBox.information(self, "✅ Éxito", message)
+    
+    def refresh_catalogue(self):
+        """Revisa las imágenes guardadas y regenera solo las que cambiaron en disco"""
+        if not self.metadata_db:
+            QMessageBox.warning(self, "Error", "No hay imágenes guardadas")
+            return
+        
+        self.statusBar().showMessage("Revisando imágenes...")
+        # La revisión lee registros del almacén: primero se escriben los guardados pendientes
+        self.write_behind.flush()
+        self.tasks.extract(
+            refresh_records, dict(self.metadata_db.summaries),
+            options=self.extraction_options(), load=self.store.get,
+            on_progress=self.show_progress,
+            on_finished=self.on_catalogue_refreshed,
+            on_error=self.on_task_error
+        )
+    
+    def on_catalogue_refreshed(self, outcome):
+        updated, errors = outcome
+        self.metadata_db.update(updated)
+        self.duplicates.add_many(updated)
+        self.search.add_many(updated)
+        self.facets_timer.start()
+        self.saved_model.add_or_update(updated)
+        self.persist_records(updated)
+        
+        stale = sum(1 for metadata in updated.values() if is_stale(metadata))
+        message = f"{len(updated) - stale} imágenes actualizadas"
+        if stale:
+            message += f"\n{stale} imágenes ya no existen y se marcaron como obsoletas"
+        if errors:
+            message += f"\n{len(errors)} imágenes no se pudieron leer"
+        QMessageBox.information(self, "✅ Éxito", message)
+    
+    def update_watch_menu(self):
+        self.watch_menu.clear()
+        self.watch_menu.addAction("➕ Vigilar carpeta...", self.add_watch_folder)
+        if self.watcher.roots:
+            self.watch_menu.addSeparator()
+        for root in self.watcher.roots:
+            self.watch_menu.addAction(f"✖ Dejar de vigilar {root}", lambda root=root: self.stop_watching(root))
+    
+    def add_watch_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Seleccionar Carpeta a Vigilar")
+        if not directory:
+            return
+        self.start_watching([directory])
+        self.save_watch_folders()
+        # Una sola revisión completa al empezar; después solo se revisa lo que cambia
+        self.ingest_folder(directory)
+    
+    def stop_watching(self, root):
+        self.watcher.remove_root(root)
+        self.save_watch_folders()
+        self.statusBar().showMessage(f"Se dejó de vigilar {root}", 5000)
+    
+    def save_watch_folders(self):
+        # La escritura de settings va en el hilo de escritura, en orden con los guardados
+        self.tasks.persist(
+            self.store.update_settings, {"watch_folders": list(self.watcher.roots)},
+            on_error=self.on_task_error
+        )
+    
+    def start_watching(self, roots):
+        """Vigila carpetas raíz; sus subcarpetas e imágenes se listan en segundo plano"""
+        roots = [self.watcher.add_root(root) for root in roots if os.path.isdir(root)]
+        if not roots:
+            return
+        self.tasks.extract(
+            list_watch_paths, roots, list(self.metadata_db),
+            on_finished=self.on_watch_paths_listed,
+            on_error=self.on_task_error
+        )
+    
+    def on_watch_paths_listed(self, outcome):
+        directories, files = outcome
+        self.watcher.add_directories(directories)
+        self.watcher.add_files(files)
+    
+    def on_folders_changed(self, directories, files):
+        """Revisa solo las carpetas y archivos que cambiaron (sin recorrer todo el árbol)"""
+        if self.watch_running:
+            # Un lote a la vez: lo que llega mientras tanto se revisa después
+            self.watch_queued[0].update(directories)
+            self.watch_queued[1].update(files)
+            return
+        self.watch_running = True
+        self.write_behind.flush()
+        self.tasks.extract(
+            sync_changes, directories, files, dict(self.metadata_db.summaries),
+            watched=self.watcher.directories(), options=self.extraction_options(), load=self.store.get,
+            on_finished=self.on_folders_synced,
+            on_error=self.on_watch_error
+        )
+    
+    def on_folders_synced(self, outcome):
+        updated, removed, errors, new_directories = outcome
+        self.watcher.add_directories(new_directories)
+        
+        # Imágenes movidas o renombradas: el registro de la ruta anterior se elimina
+        removed = [path for path in removed if path in self.metadata_db]
+        if removed:
+            for path in removed:
+                del self.metadata_db[path]
+                self.duplicates.remove(path)
+                self.search.remove(path)
+            self.saved_model.remove(removed)
+            self.views.forget(removed)
+            self.facets_timer.start()
+            self.tasks.persist(self.store.remove_many, removed, on_error=self.on_task_error)
+        if updated:
+            self.metadata_db.update(updated)
+            self.duplicates.add_many(updated)
+            self.search.add_many(updated)
+            self.facets_timer.start()
+            self.saved_model.add_or_update(updated)
+            self.persist_records(updated)
+            self.watcher.add_files(path for path, metadata in updated.items() if not is_stale(metadata))
+        
+        stale = sum(1 for metadata in updated.values() if is_stale(metadata))
+        parts = []
+        if len(updated) - stale:
+            parts.append(f"{len(updated) - stale} actualizadas")
+        if removed:
+            parts.append(f"{len(removed)} movidas")
+        if stale:
+            parts.append(f"{stale} ya no existen")
+        if errors:
+            parts.append(f"{len(errors)} no se pudieron leer")
+        if parts:
+            self.statusBar().showMessage("👁️ Imágenes: " + ", ".join(parts), 8000)
+        self.run_queued_sync()
+    
+    def on_watch_error(self, message):
+        self.run_queued_sync()
+        self.on_task_error(message)
+    
+    def run_queued_sync(self):
+        self.watch_running = False
+        directories, files = self.watch_queued
+        if directories or files:
+            self.watch_queued = (set(), set())
+            self.on_folders_changed(directories, files)
+    
+    def persist_records(self, records):
+        """Escribe ya varios registros aplicados en metadata_db (un lote ya agrupado)"""
+        self.write_behind.add(records, immediate=True)
+    
+    def on_records_saved(self, records):
+        """Los registros ya están en disco: se confirman los guardados"""
+        self.metadata_db.release(records)
+        messages = [self.save_messages.pop(path) for path in records if path in self.save_messages]
+        if len(records) == 1 and messages:
+            self.statusBar().showMessage(messages[0], 8000)
+        elif messages:
+            self.statusBar().showMessage(f"✅ Metadatos de {len(records)} imágenes guardados", 8000)
+        self.enforce_image_limit(records)
+    
+    def enforce_image_limit(self, protect=()):
+        """Encola la eliminación de las imágenes que superan settings.max_images"""
+        max_images = self.store.settings().get('max_images')
+        if not max_images or len(self.metadata_db) <= max_images:
+            return
+        # El worker recibe copias: el índice solo se modifica en el hilo de la interfaz
+        self.tasks.persist(
+            enforce_limit, self.store, dict(self.metadata_db.summaries),
+            protect=list(protect), last_viewed=dict(self.views.last_viewed),
+            on_finished=self.on_images_evicted,
+            on_error=self.on_task_error
+        )
+    
+    def on_images_evicted(self, evicted):
+        removed = self.metadata_db.evict(evicted)
+        if not removed:
+            return
+        for path in removed:
+            self.duplicates.remove(path)
+            self.search.remove(path)
+        self.saved_model.remove(removed)
+        self.views.forget(removed)
+        self.facets_timer.start()
+        
+        message = f"Límite de {self.store.settings().get('max_images')} imágenes: {len(removed)} eliminadas"
+        if self.store.settings().get('archive_evicted', True):
+            message += " y movidas al archivo"
+        self.statusBar().showMessage(message, 8000)
+    
+    def show_progress(self, done, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+    
+    def on_pending_changed(self, pending):
+        self.progress_bar.setVisible(pending > 0)
+        if pending == 0:
+            self.progress_bar.reset()
+    
+    def on_task_error(self, message):
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Error", f"Error en segundo plano: {message}")
+    
+    def on_write_failed(self, message):
+        """Primer fallo de una racha: los reintentos siguientes no vuelven a avisar"""
+        self.statusBar().showMessage("⚠️ Guardados pendientes: se reintentará la escritura")
+        QMessageBox.warning(self, "Error",
+                            f"No se pudieron guardar los metadatos: {message}\n"
+                            "Se seguirá intentando en segundo plano.")
+    
+    def closeEvent(self, event):
+        # No se pierde ningún guardado encolado
+        self.write_behind.flush()
+        self.tasks.wait_for_writes()
+        # Entrega las confirmaciones; lo que falló se reintenta aquí mismo
+        QApplication.processEvents()
+        if self.write_behind.has_pending():
+            try:
+                self.write_behind.flush_now()
+            except Exception as e:
+                print(f"Error al guardar al cerrar: {e}")
+        self.previews.shutdown()
+        self.store.flush_backups()
+        self.views.save()
+        super().closeEvent(event)
+    
     def load_existing_metadata(self):
         pass
     
@@ -356,357 +814,144 @@ class ImageMetadataApp(QMainWindow):
             QMessageBox.warning(self, "Error", "No hay imagen cargada")
             return
         
-        # Obtener información de la imagen
-        pixmap = QPixmap(self.current_image_path)
-        file_size = os.path.getsize(self.current_image_path)
-        file_stats = os.stat(self.current_image_path)
-        
-        # Calcular información adicional
-        aspect_ratio = pixmap.width() / pixmap.height() if pixmap.height() > 0 else 0
-        megapixels = (pixmap.width() * pixmap.height()) / 1_000_000
-        
-        # Determinar formato y extensión
-        file_ext = os.path.splitext(self.current_image_path)[1].upper().replace('.', '')
-        file_name_without_ext = os.path.splitext(os.path.basename(self.current_image_path))[0]
-        
-        # Calcular aspect ratio común (ej: 16:9, 4:3, etc)
-        def gcd(a, b):
-            while b:
-                a, b = b, a % b
-            return a
-        
-        width_height_gcd = gcd(pixmap.width(), pixmap.height())
-        aspect_w = pixmap.width() // width_height_gcd if width_height_gcd > 0 else pixmap.width()
-        aspect_h = pixmap.height() // width_height_gcd if width_height_gcd > 0 else pixmap.height()
-        
-        # Determinar orientación descriptiva
-        if pixmap.width() > pixmap.height():
-            orientation = "Horizontal (Landscape)"
-        elif pixmap.height() > pixmap.width():
-            orientation = "Vertical (Portrait)"
-        else:
-            orientation = "Cuadrado (Square)"
-        
-        # Calcular tamaño en diferentes unidades
-        size_bytes = file_size
-        size_kb = round(file_size / 1024, 2)
-        size_mb = round(file_size / (1024 * 1024), 2)
-        size_gb = round(file_size / (1024 * 1024 * 1024), 4)
-        
-        # Determinar categoría de tamaño
-        if size_mb < 0.1:
-            size_category = "Muy pequeño"
-        elif size_mb < 1:
-            size_category = "Pequeño"
-        elif size_mb < 5:
-            size_category = "Mediano"
-        elif size_mb < 10:
-            size_category = "Grande"
-        else:
-            size_category = "Muy grande"
-        
-        # Determinar categoría de resolución
-        total_pixels = pixmap.width() * pixmap.height()
-        if total_pixels < 500_000:
-            resolution_category = "Baja resolución"
-        elif total_pixels < 2_000_000:
-            resolution_category = "Resolución estándar"
-        elif total_pixels < 8_000_000:
-            resolution_category = "Alta resolución (HD)"
-        elif total_pixels < 20_000_000:
-            resolution_category = "Muy alta resolución (Full HD/4K)"
-        else:
-            resolution_category = "Ultra alta resolución (8K+)"
-        
-        # Obtener información del directorio
-        directory = os.path.dirname(self.current_image_path)
-        drive = os.path.splitdrive(self.current_image_path)[0]
-        
-        # Calcular hash MD5 del archivo para verificación de integridad
-        import hashlib
-        md5_hash = hashlib.md5()
-        with open(self.current_image_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                md5_hash.update(chunk)
-        file_hash = md5_hash.hexdigest()
-        
-        # Información de bits por pixel (profundidad de color)
-        bits_per_pixel = pixmap.depth()
-        
-        # Recopilar metadatos completos y detallados
-        metadata = {
-            # Información básica del archivo
-            "file_info": {
-                "filename": os.path.basename(self.current_image_path),
-                "filename_without_extension": file_name_without_ext,
-                "filepath": self.current_image_path,
-                "directory": directory,
-                "drive": drive,
-                "file_extension": file_ext,
-                "file_format": file_ext or "UNKNOWN"
-            },
-            
-            # Tamaños en diferentes unidades
-            "file_size": {
-                "bytes": size_bytes,
-                "kilobytes": size_kb,
-                "megabytes": size_mb,
-                "gigabytes": size_gb,
-                "human_readable": f"{size_mb} MB" if size_mb >= 1 else f"{size_kb} KB",
-                "category": size_category
-            },
-            
-            # Dimensiones y resolución
-            "image_dimensions": {
-                "width_pixels": pixmap.width(),
-                "height_pixels": pixmap.height(),
-                "resolution": f"{pixmap.width()}x{pixmap.height()}",
-                "total_pixels": total_pixels,
-                "megapixels": round(megapixels, 2),
-                "resolution_category": resolution_category
-            },
-            
-            # Información de aspecto y orientación
-            "aspect_ratio": {
-                "decimal": round(aspect_ratio, 4),
-                "ratio": f"{aspect_w}:{aspect_h}",
-                "orientation": orientation,
-                "is_landscape": pixmap.width() > pixmap.height(),
-                "is_portrait": pixmap.height() > pixmap.width(),
-                "is_square": pixmap.width() == pixmap.height()
-            },
-            
-            # Información de color
-            "color_info": {
-                "bits_per_pixel": bits_per_pixel,
-                "has_alpha_channel": pixmap.hasAlphaChannel(),
-                "color_depth": f"{bits_per_pixel} bits"
-            },
-            
-            # Fechas y tiempos
-            "timestamps": {
-                "metadata_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "file_modified": datetime.fromtimestamp(file_stats.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
-                "file_accessed": datetime.fromtimestamp(file_stats.st_atime).strftime("%Y-%m-%d %H:%M:%S"),
-                "file_created_system": datetime.fromtimestamp(file_stats.st_ctime).strftime("%Y-%m-%d %H:%M:%S"),
-                "unix_timestamp_modified": int(file_stats.st_mtime),
-                "unix_timestamp_accessed": int(file_stats.st_atime)
-            },
-            
-            # Información del sistema
-            "system_info": {
-                "file_mode": oct(file_stats.st_mode),
-                "file_inode": file_stats.st_ino if hasattr(file_stats, 'st_ino') else None,
-                "operating_system": os.name,
-                "file_hash_md5": file_hash
-            },
-            
-            # Estadísticas adicionales
-            "statistics": {
-                "aspect_ratio_percentage": round((pixmap.width() / pixmap.height() * 100) if pixmap.height() > 0 else 0, 2),
-                "compression_ratio_estimate": "N/A",
-                "pixel_density_category": resolution_category,
-                "recommended_use": self.get_recommended_use(pixmap.width(), pixmap.height(), size_mb)
-            }
-        }
+        # La extracción corre en segundo plano; se pueden encolar varios guardados
+        path = self.current_image_path
+        self.statusBar().showMessage(f"Generando metadatos de {os.path.basename(path)}...")
+        self.tasks.extract(
+            build_metadata, path, **self.extraction_options(),
+            on_finished=lambda metadata: self.on_metadata_ready(path, metadata),
+            on_error=self.on_task_error
+        )
+    
+    def on_metadata_ready(self, path, metadata):
+        if metadata is None:
+            QMessageBox.warning(self, "Error", f"No se pudo leer la imagen {os.path.basename(path)}")
+            return
         
-        # Guardar en base de datos
-        self.metadata_db[self.current_image_path] = metadata
-        self.save_metadata_to_file()
+        # metadata_db solo se modifica en el hilo de la interfaz; el store recibe
+        # la misma clave, así que la escritura en segundo plano no cambia su tamaño
+        self.metadata_db[path] = metadata
+        self.duplicates.add(path, metadata)
+        self.search.add(path, metadata)
+        self.facets_timer.start()
+        self.saved_model.add_or_update([path])
+        self.select_path(path)
         
-        self.update_saved_list()
+        saved_message = "✅ Metadatos guardados correctamente"
+        copies = self.duplicates.duplicates_of(path)
+        if copies:
+            saved_message += f" · ⚠️ Duplicado de {copies[0]}"
+            if len(copies) > 1:
+                saved_message += f" y {len(copies) - 1} más"
         
-        QMessageBox.information(
-            self, 
-            "✅ Éxito", 
-            "Metadatos guardados correctamente"
-        )
+        # Se escribe junto con los demás guardados de los próximos instantes
+        self.save_messages[path] = saved_message
+        self.write_behind.add({path: metadata})
+    
+    def show_duplicates(self):
+        """Muestra los grupos de duplicados exactos y de imágenes parecidas"""
+        DuplicatesDialog(self.duplicates, self).exec_()
+    
+    def show_diagnostics(self):
+        """Abre el panel de tiempos (no bloquea la ventana principal)"""
+        if self.diagnostics is None:
+            self.diagnostics = DiagnosticsDialog(self)
+        self.diagnostics.show()
+        self.diagnostics.raise_()
+    
+    def extraction_options(self):
+        """Opciones de extracción configuradas en settings (algoritmo de hash, dHash)"""
+        return extraction_options(self.store.settings())
     
     def get_recommended_use(self, width, height, size_mb):
         """Recomienda el uso según las dimensiones y tamaño"""
-        total_pixels = width * height
-        
-        if total_pixels < 500_000:
-            return "Iconos, miniaturas, web pequeña"
-        elif total_pixels < 2_000_000:
-            return "Web estándar, redes sociales"
-        elif total_pixels < 8_000_000:
-            return "Impresión pequeña, pantallas HD"
-        elif total_pixels < 20_000_000:
-            return "Impresión grande, fotografía profesional"
-        else:
-            return "Impresión comercial, publicidad, arte digital"
+        return get_recommended_use(width, height, size_mb)
     
     def load_metadata(self):
-        """Carga la base de datos JSON"""
-        if os.path.exists(self.metadata_file):
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Si es el formato antiguo (sin estructura), convertir
-                    if not isinstance(data, dict) or 'images' not in data:
-                        return self.migrate_old_format(data)
-                    return data.get('images', {})
-            except Exception as e:
-                print(f"Error al cargar base de datos: {e}")
-                return {}
-        else:
-            # Crear base de datos inicial
-            self.initialize_database()
-            return {}
+        """Carga el índice de la base de datos (los registros completos se leen al usarlos)"""
+        return CatalogIndex(self.store)
     
     def initialize_database(self):
         """Inicializa la base de datos con estructura"""
-        initial_db = {
-            "metadata_version": "1.0",
-            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "total_images": 0,
-            "images": {},
-            "settings": {
-                "auto_backup": True,
-                "max_images": 1000
-            }
-        }
-        with open(self.metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(initial_db, f, indent=4, ensure_ascii=False)
+        self.store.initialize_database()
     
     def migrate_old_format(self, old_data):
         """Migra datos del formato antiguo al nuevo"""
-        if isinstance(old_data, dict):
-            return old_data
-        return {}
+        return self.store.migrate_old_format(old_data)
     
     def save_metadata_to_file(self):
         """Guarda la base de datos JSON con estructura completa"""
-        try:
-            # Cargar estructura completa
-            if os.path.exists(self.metadata_file):
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    full_db = json.load(f)
-            else:
-                full_db = {
-                    "metadata_version": "1.0",
-                    "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "total_images": 0,
-                    "images": {},
-                    "settings": {
-                        "auto_backup": True,
-                        "max_images": 1000
-                    }
-                }
-            
-            # Actualizar datos
-            full_db['images'] = self.metadata_db
-            full_db['total_images'] = len(self.metadata_db)
-            full_db['last_updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Guardar
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(full_db, f, indent=4, ensure_ascii=False)
-            
-            # Crear backup si está habilitado
-            if full_db.get('settings', {}).get('auto_backup', True):
-                self.create_backup()
-                
-        except Exception as e:
-            print(f"Error al guardar base de datos: {e}")
+        self.store.save(self.metadata_db)
     
     def create_backup(self):
         """Crea un backup de la base de datos"""
-        try:
-            backup_dir = "backups"
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = os.path.join(backup_dir, f"metadata_backup_{timestamp}.json")
-            
-            if os.path.exists(self.metadata_file):
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                with open(backup_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
-                
-                # Mantener solo los últimos 10 backups
-                self.cleanup_old_backups(backup_dir)
-        except Exception as e:
-            print(f"Error al crear backup: {e}")
+        self.store.create_backup()
     
     def cleanup_old_backups(self, backup_dir, max_backups=10):
         """Elimina backups antiguos manteniendo solo los más recientes"""
-        try:
-            backups = [f for f in os.listdir(backup_dir) if f.startswith("metadata_backup_")]
-            backups.sort(reverse=True)
-            
-            for old_backup in backups[max_backups:]:
-                os.remove(os.path.join(backup_dir, old_backup))
-        except Exception as e:
-            print(f"Error al limpiar backups: {e}")
+        self.store.cleanup_old_backups(backup_dir, max_backups)
     
     def update_saved_list(self):
-        self.saved_list.clear()
-        for path, metadata in self.metadata_db.items():
-            # Extraer información según la estructura
-            if isinstance(metadata.get('file_info'), dict):
-                filename = metadata['file_info'].get('filename', 'Sin nombre')
-                resolution = metadata['image_dimensions'].get('resolution', 'N/A')
-                date = metadata['timestamps'].get('metadata_created', '')
-            else:
-                # Compatibilidad con formato antiguo
-                filename = metadata.get('filename', 'Sin nombre')
-                resolution = metadata.get('resolution', 'N/A')
-                date = metadata.get('date_created', '')
-            
-            item_text = f"📷 {filename}\n"
-            item_text += f"   🖼️ {resolution}\n"
-            item_text += f"   📅 {date}"
-            self.saved_list.addItem(item_text)
+        """Vuelve a leer la lista completa (cuando cambia toda la base)"""
+        self.duplicates = DuplicateIndex(self.metadata_db.summaries)
+        self.search = SearchIndex(self.metadata_db.summaries)
+        self.saved_model.reload(self.metadata_db.summaries)
+        self.apply_search()
+    
+    def apply_search(self):
+        """Filtra la lista con la barra de búsqueda y las facetas elegidas"""
+        query = parse_query(self.search_edit.text())
+        for facet, box in self.facet_boxes.items():
+            if box.currentData() is not None:
+                query = query.with_facet(facet, [box.currentData()])
+        self.query = query
+        if query.is_empty():
+            self.saved_model.reload()
+        else:
+            with perf_trace.span("search") as timing:
+                paths = self.search.search(query)
+                timing.set(results=len(paths))
+            self.saved_model.set_filter(paths, lambda path: self.search.matches(query, path))
+        self.update_facets()
+    
+    def update_facets(self):
+        """Conteos de cada faceta con el resto de filtros aplicados"""
+        with perf_trace.span("search.facets"):
+            counts = self.search.facet_counts(self.query)
+        for facet, label in FACETS:
+            box = self.facet_boxes[facet]
+            selected = box.currentData()
+            box.clear()
+            box.addItem(f"{label}: todas", None)
+            for value, count in counts[facet].most_common():
+                box.addItem(f"{value} ({count})", value)
+            if selected is not None:
+                if box.findData(selected) < 0:
+                    box.addItem(f"{selected} (0)", selected)
+                box.setCurrentIndex(box.findData(selected))
+        
+        if self.query.is_empty():
+            self.search_label.setText(f"{len(self.metadata_db)} imágenes")
+        else:
+            self.search_label.setText(f"{len(self.saved_model.paths)} de {len(self.metadata_db)} imágenes")
+    
+    def select_path(self, path):
+        """Selecciona en la lista la fila de una imagen"""
+        index = self.saved_model.index_of(path)
+        if index.isValid():
+            self.saved_list.setCurrentIndex(index)
+            self.saved_list.scrollTo(index)
     
-    def load_saved_metadata(self, item):
-        index = self.saved_list.currentRow()
-        paths = list(self.metadata_db.keys())
+    def load_saved_metadata(self, index, previous=None):
+        # La fila lleva su ruta: no depende del orden del diccionario ni de la vista
+        selected_path = index.data(SavedImagesModel.PathRole)
         
-        if index < len(paths):
-            selected_path = paths[index]
+        if selected_path in self.metadata_db:
+            self.current_image_path = selected_path
+            self.save_button.setEnabled(True)
             
-            if os.path.exists(selected_path):
-                self.current_image_path = selected_path
-                
-                # Cargar imagen
-                pixmap = QPixmap(selected_path)
-                scaled_pixmap = pixmap.scaled(
-                    self.image_label.size(), 
-                    Qt.KeepAspectRatio, 
-                    Qt.SmoothTransformation
-                )
-                self.image_label.setPixmap(scaled_pixmap)
-                self.image_label.setStyleSheet("""
-                    QLabel {
-                        border: 3px dashed #667eea;
-                        border-radius: 15px;
-                        background-color: white;
-                        padding: 20px;
-                    }
-                """)
-                
-                # Cargar info
-                file_size = os.path.getsize(selected_path)
-                file_info = f"<b>📄 Información del archivo:</b><br>"
-                file_info += f"<b>Nombre:</b> {os.path.basename(selected_path)}<br>"
-                file_info += f"<b>Tamaño:</b> {file_size / 1024:.2f} KB<br>"
-                file_info += f"<b>Dimensiones:</b> {pixmap.width()}x{pixmap.height()} px"
-                self.file_info_label.setText(file_info)
-                self.file_info_label.show()
-                
-                self.save_button.setEnabled(True)
-            else:
-                QMessageBox.warning(
-                    self, 
-                    "Error", 
-                    "La imagen no existe en la ruta especificada"
-                )
+            # Cargar imagen e info en segundo plano, precargando las filas vecinas
+            self.show_preview(selected_path, index.row())
     
     def export_json(self):
         if not self.metadata_db:
@@ -717,37 +962,75 @@ class ImageMetadataApp(QMainWindow):
             )
             return
         
+        extensions = {metadata.get('file_info', {}).get('file_extension')
+                      for metadata in self.metadata_db.summaries.values()}
+        options = ExportDialog({extension for extension in extensions if extension}, self)
+        if options.exec_() != options.Accepted:
+            return
+        
+        export_format = options.export_format()
         file_name, _ = QFileDialog.getSaveFileName(
             self, 
             "Exportar Metadatos", 
-            "metadata_export.json", 
-            "JSON (*.json)"
+            f"metadata_export.{export_format}", 
+            options.file_filter()
         )
         
         if file_name:
-            with open(file_name, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata_db, f, indent=4, ensure_ascii=False)
-            
-            QMessageBox.information(
-                self, 
-                "✅ Éxito", 
-                f"Metadatos exportados a {file_name}"
+            # Se encola tras las escrituras pendientes y lee del almacén registro a registro
+            self.statusBar().showMessage(f"Exportando a {file_name}...")
+            self.write_behind.flush()
+            self.tasks.persist(
+                export_records, self.store.images, file_name, export_format,
+                fields=options.fields(), accept=options.record_filter(),
+                on_progress=self.show_progress,
+                on_finished=lambda count: self.on_exported(file_name, count),
+                on_error=self.on_task_error
             )
-
+    
+    def on_exported(self, file_name, count):
+        self.statusBar().clearMessage()
+        QMessageBox.information(
+            self, 
+            "✅ Éxito", 
+            f"Metadatos de {count} imágenes exportados a {file_name}"
+        )
 
 def main():
     """Función principal para ejecutar la aplicación"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generador de metadatos de imágenes")
+    parser.add_argument("--db", default="image_metadata.json",
+                        help="Archivo de la base de datos (.json o .db para SQLite)")
+    metadata_cli.add_trace_arguments(parser)
+    args, qt_args = parser.parse_known_args()
+    metadata_cli.start_tracing(args)
+    
     try:
-        app = QApplication(sys.argv)
+        app = QApplication(sys.argv[:1] + qt_args)
         app.setStyle('Fusion')  # Estilo moderno multiplataforma
         
         # Mostrar login primero
         login = LoginDialog()
         if login.exec_() == login.Accepted:
             # Si el login es exitoso, mostrar la aplicación principal
-            window = ImageMetadataApp()
+            window = ImageMetadataApp(args.db)
             window.show()
-            sys.exit(app.exec_())
+            
+            # Ante un error no controlado se escriben los guardados pendientes
+            previous_hook = sys.excepthook
+            def flush_on_error(*exc_info):
+                try:
+                    window.write_behind.flush_now()
+                except Exception as e:
+                    print(f"Error al guardar tras un fallo: {e}")
+                previous_hook(*exc_info)
+            sys.excepthook = flush_on_error
+            
+            status = app.exec_()
+            metadata_cli.finish_tracing(args)
+            sys.exit(status)
         else:
             # Si se cancela el login, salir
             sys.exit(0)
@@ -756,5 +1039,12 @@ def main():
         sys.exit(1)
 
 
+def main_batch(argv=None):
+    """Modo por lotes (ver metadata_cli, que no necesita PyQt5)"""
+    return metadata_cli.main_batch(argv)
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        sys.exit(main_batch(sys.argv[2:]))
     main()
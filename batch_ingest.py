@@ -0,0 +1,289 @@
+"""
+Ingesta por lotes de directorios completos de imágenes.
+
+Recorre un árbol de directorios, genera los metadatos de cada imagen en un
+pool de procesos (uno por núcleo) y devuelve los resultados para fusionarlos
+en la base de datos con una sola escritura al final.
+
+Las imágenes ya catalogadas se comparan por su huella (fecha de modificación,
+tamaño e inodo) y solo se vuelven a procesar las que cambiaron.
+sync_changes revisa solo las carpetas y archivos que cambiaron (modo de
+vigilancia de carpetas).
+"""
+import os
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from metadata_extractor import build_metadata
+from perf_trace import span
+
+
+# Extensiones admitidas, las mismas que ofrece el diálogo de carga
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
+
+# Cantidad de rutas que se envían juntas a cada proceso
+CHUNK_SIZE = 32
+
+
+def find_images(root):
+    """Devuelve las rutas de todas las imágenes bajo root, de forma recursiva"""
+    paths = []
+    for directory, _subdirs, files in os.walk(root):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                # Misma convención de separadores que QFileDialog
+                paths.append(os.path.join(directory, name).replace(os.sep, '/'))
+    paths.sort()
+    return paths
+
+
+def _extract_chunk(paths, options=None):
+    """Genera los metadatos de un grupo de rutas dentro de un proceso de trabajo"""
+    results = []
+    for path in paths:
+        try:
+            results.append((path, build_metadata(path, **(options or {})), None))
+        except Exception as e:
+            results.append((path, None, str(e)))
+    return results
+
+
+def iter_extract(paths, max_workers=None, options=None):
+    """
+    Genera los metadatos de las rutas indicadas repartiendo el trabajo entre
+    procesos y devuelve (ruta, metadatos, error) a medida que terminan los
+    grupos (en cualquier orden). Con un solo proceso o un solo grupo de rutas
+    se trabaja en este proceso, sin el costo de arrancar el pool.
+    """
+    if not paths:
+        return
+    if max_workers == 1 or len(paths) <= CHUNK_SIZE:
+        with span("extract_many", images=len(paths)):
+            for path in paths:
+                yield _extract_chunk([path], options)[0]
+        return
+
+    chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+    # "spawn" evita hacer fork de un proceso con hilos (la interfaz lanza el lote desde un worker)
+    context = multiprocessing.get_context("spawn")
+    # Los procesos de trabajo no registran tiempos en este proceso: se mide el lote completo
+    with span("extract_many", images=len(paths)), \
+            ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), mp_context=context) as executor:
+        futures = [executor.submit(_extract_chunk, chunk, options) for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
+
+
+def extract_many(paths, max_workers=None, progress=None, options=None):
+    """
+    Genera los metadatos de las rutas indicadas en paralelo (ver
+    iter_extract). progress, si se indica, recibe (procesadas, total);
+    options son los argumentos de build_metadata (ver extraction_options).
+    Devuelve (resultados, errores): un diccionario ruta -> metadatos y una
+    lista de (ruta, mensaje).
+    """
+    results = {}
+    errors = []
+    total = len(paths)
+    for done, (path, metadata, error) in enumerate(iter_extract(paths, max_workers, options), 1):
+        if metadata is not None:
+            results[path] = metadata
+        else:
+            errors.append((path, error or "No se pudo leer la imagen"))
+        if progress and (done % CHUNK_SIZE == 0 or done == total):
+            progress(done, total)
+    return results, errors
+
+
+def ingest_directory(root, max_workers=None, progress=None, options=None):
+    """Genera los metadatos de todas las imágenes bajo root"""
+    return extract_many(find_images(root), max_workers, progress, options)
+
+
+def has_changed(metadata, file_stats):
+    """
+    Compara la huella guardada (fecha de modificación, tamaño e inodo) con
+    os.stat del archivo. Devuelve True si hay que regenerar los metadatos.
+    """
+    if not isinstance(metadata.get('timestamps'), dict):
+        # Formato antiguo sin huella: siempre se regenera
+        return True
+    if metadata['timestamps'].get('unix_timestamp_modified') != int(file_stats.st_mtime):
+        return True
+    if metadata.get('file_size', {}).get('bytes') != file_stats.st_size:
+        return True
+    stored_inode = metadata.get('system_info', {}).get('file_inode')
+    # Algunos sistemas de archivos no tienen inodo (0 o None): no se compara
+    if stored_inode and file_stats.st_ino and stored_inode != file_stats.st_ino:
+        return True
+    return False
+
+
+def select_changed(paths, images):
+    """Devuelve las rutas nuevas o modificadas respecto a images"""
+    changed = []
+    for path in paths:
+        metadata = images.get(path)
+        if metadata is None:
+            changed.append(path)
+            continue
+        try:
+            if has_changed(metadata, os.stat(path)):
+                changed.append(path)
+        except OSError:
+            changed.append(path)
+    return changed
+
+
+def ingest_changed(root, images, max_workers=None, progress=None, options=None):
+    """
+    Genera los metadatos solo de las imágenes bajo root que son nuevas o
+    cambiaron respecto a images. Devuelve (resultados, errores).
+    """
+    paths = select_changed(find_images(root), images)
+    return extract_many(paths, max_workers, progress, options)
+
+
+def missing_similarity(metadata, options):
+    """Se activó el hash perceptual y el registro todavía no lo tiene"""
+    return bool((options or {}).get('perceptual_hash')) and 'similarity' not in metadata
+
+
+def refresh_records(images, max_workers=None, progress=None, options=None, load=None):
+    """
+    Revisa todas las imágenes catalogadas: regenera solo las modificadas (o
+    las que no tienen el hash perceptual activado en options) y marca como
+    obsoletas las que ya no existen.
+    Devuelve (actualizadas, errores): un diccionario ruta -> metadatos con
+    todos los registros que hay que guardar y una lista de (ruta, mensaje).
+    images puede contener solo los resúmenes del índice; en ese caso load
+    (ruta -> metadatos completos) lee los registros que se marcan o desmarcan.
+    """
+    updated = {}
+    changed = []
+    checked_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    for path, metadata in images.items():
+        status = metadata.get('catalog_status', {})
+        try:
+            file_stats = os.stat(path)
+        except OSError:
+            if not status.get('stale'):
+                full = load(path) if load else metadata
+                if full is not None:
+                    updated[path] = dict(full, catalog_status={"stale": True, "missing_since": checked_at})
+            continue
+
+        if has_changed(metadata, file_stats) or missing_similarity(metadata, options):
+            changed.append(path)
+        elif status.get('stale'):
+            # El archivo volvió a aparecer sin cambios
+            full = load(path) if load else metadata
+            if full is not None:
+                updated[path] = {key: value for key, value in full.items() if key != 'catalog_status'}
+
+    results, errors = extract_many(changed, max_workers, progress, options)
+    updated.update(results)
+    return updated, errors
+
+
+def is_stale(metadata):
+    """Indica si el archivo de la imagen ya no existe en disco"""
+    return bool(metadata.get('catalog_status', {}).get('stale'))
+
+
+def _list_directory(directory):
+    """Imágenes y subcarpetas directas de una carpeta (sin recorrer las subcarpetas)"""
+    images, subdirectories = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                path = entry.path.replace(os.sep, '/')
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    images.append(path)
+    except OSError:
+        pass
+    return images, subdirectories
+
+
+def _affected_records(directories, files, images):
+    """
+    Rutas catalogadas a revisar: las de los archivos indicados, las que están
+    directamente en las carpetas que cambiaron y las de subcarpetas que ya no
+    existen (carpetas borradas o movidas).
+    """
+    directories = [directory.rstrip('/') for directory in directories]
+    existing = {}
+    affected = set(path for path in files if path in images)
+    for path in images:
+        parent = os.path.dirname(path)
+        for directory in directories:
+            if parent == directory:
+                affected.add(path)
+            elif parent.startswith(directory + '/'):
+                # Subcarpeta de primer nivel que contiene la imagen
+                top = directory + '/' + parent[len(directory) + 1:].split('/', 1)[0]
+                if top not in existing:
+                    existing[top] = os.path.isdir(top)
+                if not existing[top]:
+                    affected.add(path)
+    return affected
+
+
+def _file_identity(metadata):
+    """(inodo, tamaño) de un registro, o None si el sistema de archivos no tiene inodos"""
+    inode = metadata.get('system_info', {}).get('file_inode')
+    size = metadata.get('file_size', {}).get('bytes')
+    return (inode, size) if inode and size is not None else None
+
+
+def sync_changes(directories, files, images, watched=(), max_workers=None, options=None, load=None):
+    """
+    Actualiza el catálogo tras cambios en disco sin recorrer todo el árbol:
+    revisa las imágenes catalogadas afectadas (como refresh_records), genera
+    las imágenes nuevas de las carpetas que cambiaron y recorre las
+    subcarpetas nuevas (las que no están en watched).
+
+    Un archivo movido o renombrado (mismo inodo y tamaño que uno que
+    desapareció) se trata como un cambio de ruta: el registro anterior se
+    elimina en lugar de marcarse como obsoleto.
+
+    Devuelve (actualizadas, eliminadas, errores, carpetas nuevas).
+    """
+    watched = set(watched)
+    new_images = []
+    new_directories = []
+    for directory in directories:
+        directory_images, subdirectories = _list_directory(directory)
+        new_images.extend(path for path in directory_images if path not in images)
+        for subdirectory in subdirectories:
+            if subdirectory not in watched:
+                new_directories.extend(
+                    walked.replace(os.sep, '/') for walked, _subdirs, _files in os.walk(subdirectory))
+                new_images.extend(path for path in find_images(subdirectory) if path not in images)
+    # Archivos creados directamente (por ejemplo, al reemplazar uno vigilado)
+    new_images.extend(path for path in files if path not in images and os.path.isfile(path))
+    new_images = list(dict.fromkeys(new_images))
+
+    affected = _affected_records(directories, files, images)
+    updated, errors = refresh_records({path: images[path] for path in affected}, max_workers, None, options, load)
+    extracted, extract_errors = extract_many(new_images, max_workers, None, options)
+    errors.extend(extract_errors)
+
+    # Movimientos: la imagen nueva es el mismo archivo que una que desapareció
+    missing = {}
+    for path, metadata in updated.items():
+        identity = _file_identity(images[path])
+        if is_stale(metadata) and identity is not None:
+            missing[identity] = path
+    removed = []
+    for metadata in extracted.values():
+        old_path = missing.pop(_file_identity(metadata) or (), None)
+        if old_path is not None:
+            del updated[old_path]
+            removed.append(old_path)
+    updated.update(extracted)
+    return updated, removed, errors, list(dict.fromkeys(new_directories))
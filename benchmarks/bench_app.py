@@ -0,0 +1,265 @@
+"""
+Benchmark de las etapas de la aplicación sobre un corpus sintético.
+
+Genera imágenes (cantidad, resolución y formatos configurables, con una
+semilla fija para que el corpus sea reproducible), abre la ventana principal
+sin pantalla y mide por separado las etapas siguientes. Las que llevan el
+nombre de un método de la ventana principal llaman a ese método:
+
+- extract: build_metadata de cada imagen, la extracción que save_metadata
+  (botón Guardar) ejecuta en segundo plano; no incluye la escritura diferida.
+- md5_loop: el bucle original de MD5 con bloques de 4096 bytes, y hash_file
+  con el algoritmo configurado.
+- save_metadata_to_file: reescritura completa de la base de datos.
+- create_backup: backup completo de la base.
+- update_saved_list: reconstrucción de la lista de imágenes guardadas.
+- load_metadata: carga de la base al abrir la aplicación.
+- export_json: exportación completa a JSON.
+
+De cada etapa se informa el rendimiento (imágenes por segundo) y las
+latencias p50/p99, y los resultados se guardan en JSON para compararlos
+entre commits. Con --compare se señalan las etapas cuya p50 empeoró más que
+--threshold respecto a un resultado anterior y el programa termina con
+código 1.
+
+Uso:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_app.py --count 500 --size 1920x1080 --formats jpg,png
+    python benchmarks/bench_app.py --output actual.json --compare base.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QColor
+from PyQt5.QtCore import Qt
+from metadata_extractor import build_metadata
+from metadata_export import export_records
+from file_hashing import hash_file
+from bench_hashing import legacy_md5
+
+
+# Etapas en el orden en que se ejecutan
+STAGES = ("extract", "md5_loop", "hash_file", "save_metadata_to_file", "create_backup",
+          "update_saved_list", "load_metadata", "export_json")
+
+# Nombres anteriores de las etapas, para comparar con resultados ya guardados
+RENAMED_STAGES = {"extract": "save_metadata"}
+
+
+def generate_corpus(directory, count, width, height, formats, seed=0):
+    """
+    Crea count imágenes de width x height alternando los formatos indicados.
+    Cada imagen es ruido de baja resolución ampliado, que se comprime como
+    una foto y no como ruido puro. Devuelve las rutas.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for number in range(count):
+        small = QImage(64, 36, QImage.Format_RGB32)
+        for y in range(36):
+            for x in range(64):
+                small.setPixelColor(x, y, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        image = small.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        path = os.path.join(directory, f"img{number:05d}.{formats[number % len(formats)]}")
+        if not image.save(path):
+            raise RuntimeError(f"No se pudo generar {path}")
+        paths.append(path)
+    return paths
+
+
+def percentile(samples, q):
+    """Percentil q (0-100) por rango más cercano"""
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(samples, items_per_sample):
+    """Rendimiento y latencias (en ms) de las muestras de una etapa"""
+    total = sum(samples)
+    return {
+        "samples": len(samples),
+        "items_per_sample": items_per_sample,
+        "throughput_per_s": round(items_per_sample * len(samples) / total, 2) if total else None,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(total / len(samples) * 1000, 3),
+    }
+
+
+def time_each(function, items):
+    """Una muestra por elemento"""
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def time_runs(function, repeat, setup=None):
+    """repeat muestras de una operación sobre toda la base"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(paths, work_dir, db_format, repeat, app):
+    """Ejecuta todas las etapas y devuelve {etapa: resumen}"""
+    import Image_metadata_app
+
+    # La aplicación usa rutas relativas (backups/, thumbnails/): todo queda en work_dir
+    os.chdir(work_dir)
+    window = Image_metadata_app.ImageMetadataApp(f"bench_metadata.{db_format}")
+    options = window.extraction_options()
+    results = {}
+
+    records = {}
+
+    def extract(path):
+        records[path] = build_metadata(path, **options)
+
+    results["extract"] = summarize(time_each(extract, paths), 1)
+    results["md5_loop"] = summarize(time_each(legacy_md5, paths), 1)
+    results["hash_file"] = summarize(
+        time_each(lambda path: hash_file(path, options['hash_algorithm']), paths), 1)
+
+    # La base se llena una vez con el corpus y se vuelve a cargar como al iniciar
+    window.store.save(records)
+    window.metadata_db = window.load_metadata()
+    count = len(records)
+
+    results["save_metadata_to_file"] = summarize(time_runs(window.save_metadata_to_file, repeat), count)
+    results["create_backup"] = summarize(
+        time_runs(window.create_backup, repeat, setup=window.store.backups.note_reset), count)
+
+    def update_saved_list():
+        window.update_saved_list()
+        app.processEvents()
+
+    results["update_saved_list"] = summarize(time_runs(update_saved_list, repeat), count)
+    results["load_metadata"] = summarize(time_runs(window.load_metadata, repeat), count)
+    export_file = os.path.join(work_dir, "bench_export.json")
+    results["export_json"] = summarize(
+        time_runs(lambda: export_records(window.store.images, export_file, "json"), repeat), count)
+
+    window.tasks.wait_for_writes()
+    window.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Imprime la variación de p50 respecto a baseline; devuelve las etapas que empeoraron"""
+    regressions = []
+    print(f"\n{'etapa':<24}{'p50 base (ms)':>15}{'p50 (ms)':>12}{'cambio':>10}")
+    for stage in STAGES:
+        base_stage = stage if stage in baseline else RENAMED_STAGES.get(stage)
+        if stage not in results or base_stage not in baseline:
+            continue
+        before = baseline[base_stage]["p50_ms"]
+        after = results[stage]["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = "  ⚠️" if change > threshold else ""
+        print(f"{stage:<24}{before:>15.3f}{after:>12.3f}{change:>+10.1%}{flag}")
+        if change > threshold:
+            regressions.append(stage)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de extracción, persistencia y lista de imágenes")
+    parser.add_argument("--count", type=int, default=200, help="Cantidad de imágenes del corpus")
+    parser.add_argument("--size", default="1920x1080", help="Resolución de las imágenes (ANCHOxALTO)")
+    parser.add_argument("--formats", default="jpg,png", help="Formatos separados por comas (jpg, png, bmp...)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del corpus")
+    parser.add_argument("--corpus", help="Carpeta donde generar (o reutilizar) el corpus")
+    parser.add_argument("--db-format", choices=("json", "db"), default="json",
+                        help="Base de datos JSON con diario o SQLite")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones de las etapas sobre toda la base")
+    parser.add_argument("--output", default="bench_app_results.json", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", metavar="BASE.json", help="Resultados anteriores para comparar")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Empeoramiento de p50 que se considera regresión (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    formats = [fmt.strip().lower() for fmt in args.formats.split(",") if fmt.strip()]
+    output = os.path.abspath(args.output)
+    baseline_file = os.path.abspath(args.compare) if args.compare else None
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    with tempfile.TemporaryDirectory() as work_dir:
+        corpus_dir = os.path.abspath(args.corpus) if args.corpus else os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir, exist_ok=True)
+        expected = [f"img{number:05d}.{formats[number % len(formats)]}" for number in range(args.count)]
+        if all(os.path.exists(os.path.join(corpus_dir, name)) for name in expected):
+            paths = [os.path.join(corpus_dir, name) for name in expected]
+        else:
+            print(f"Generando {args.count} imágenes de {width}x{height} ({', '.join(formats)})...")
+            paths = generate_corpus(corpus_dir, args.count, width, height, formats, args.seed)
+
+        previous_dir = os.getcwd()
+        try:
+            stages = run_benchmark(paths, work_dir, args.db_format, args.repeat, app)
+        finally:
+            os.chdir(previous_dir)
+
+    report = {
+        "commit": current_commit(),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {"count": args.count, "width": width, "height": height,
+                   "formats": formats, "seed": args.seed},
+        "db_format": args.db_format,
+        "repeat": args.repeat,
+        "stages": stages,
+    }
+
+    print(f"\n{'etapa':<24}{'img/s':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for stage in STAGES:
+        result = stages[stage]
+        print(f"{stage:<24}{result['throughput_per_s']:>12.1f}{result['p50_ms']:>12.3f}{result['p99_ms']:>12.3f}")
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"\nResultados guardados en {output}")
+
+    if baseline_file:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if (baseline.get("corpus"), baseline.get("db_format")) != (report["corpus"], report["db_format"]):
+            print("\nAviso: la base de comparación usó otro corpus o formato de base de datos")
+        regressions = compare(stages, baseline.get("stages", {}), args.threshold)
+        if regressions:
+            print(f"\nRegresiones: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Benchmark de los algoritmos de hash sobre tamaños de imagen reales.
+
+Toma los tamaños de archivo de una base de datos de metadatos (por defecto
+Image_metadata.json), genera archivos aleatorios de esos tamaños y compara el
+bucle original de MD5 con bloques de 4096 bytes contra hash_file con cada
+algoritmo, en un hilo y en paralelo.
+
+Uso:
+    python benchmarks/bench_hashing.py [--db Image_metadata.json] [--repeat 5]
+"""
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_hashing import available_algorithms, hash_file, hash_files
+from metadata_store import open_store
+
+
+# Tamaños por defecto si la base de datos no tiene registros (de 4 KB a 32 MB)
+DEFAULT_SIZES = [4_503, 20_095, 191_141, 305_357, 6_502_087, 32_000_000]
+
+
+def sizes_from_database(db_file):
+    """Tamaños en bytes de las imágenes guardadas en la base de datos"""
+    if not os.path.exists(db_file):
+        return []
+    # Se abre una copia: cargar la base puede migrarla o compactarla en disco,
+    # y el benchmark no debe modificar la original
+    with tempfile.TemporaryDirectory() as directory:
+        copy = os.path.join(directory, os.path.basename(db_file))
+        base = os.path.splitext(db_file)[0]
+        for source, target in ((db_file, copy),
+                               (base + ".journal.jsonl", os.path.splitext(copy)[0] + ".journal.jsonl"),
+                               (db_file + "-wal", copy + "-wal")):
+            if os.path.exists(source):
+                shutil.copyfile(source, target)
+        store = open_store(copy, backup_dir=os.path.join(directory, "backups"))
+        # El índice basta: los resúmenes incluyen file_size.bytes
+        index = store.load_index()
+        if hasattr(store, 'close'):
+            store.close()
+    sizes = []
+    for metadata in index.values():
+        file_size = metadata.get('file_size')
+        if isinstance(file_size, dict) and file_size.get('bytes'):
+            sizes.append(file_size['bytes'])
+    return sorted(set(sizes))
+
+
+def legacy_md5(path):
+    """Bucle original de save_metadata"""
+    md5_hash = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            md5_hash.update(chunk)
+    return md5_hash.hexdigest()
+
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de algoritmos de hash")
+    parser.add_argument("--db", default="Image_metadata.json", help="Base de datos de donde tomar los tamaños")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por medición (se toma la mejor)")
+    parser.add_argument("--copies", type=int, default=4, help="Copias de cada tamaño para la prueba en paralelo")
+    args = parser.parse_args()
+
+    sizes = sizes_from_database(args.db) or DEFAULT_SIZES
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for size in sizes:
+            for copy in range(args.copies):
+                path = os.path.join(directory, f"sample_{size}_{copy}.bin")
+                with open(path, 'wb') as f:
+                    f.write(os.urandom(size))
+                paths.append(path)
+        total_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+
+        print(f"{len(sizes)} tamaños x {args.copies} copias = {total_mb:.1f} MB")
+        print(f"{'algoritmo':<22}{'1 hilo (MB/s)':>16}{'paralelo (MB/s)':>18}")
+
+        elapsed = best_time(lambda: [legacy_md5(p) for p in paths], args.repeat)
+        print(f"{'md5 (bucle 4096 B)':<22}{total_mb / elapsed:>16.1f}{'-':>18}")
+
+        for algorithm in available_algorithms():
+            sequential = best_time(lambda: [hash_file(p, algorithm) for p in paths], args.repeat)
+            parallel = best_time(lambda: hash_files(paths, algorithm), args.repeat)
+            print(f"{algorithm:<22}{total_mb / sequential:>16.1f}{total_mb / parallel:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
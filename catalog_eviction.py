@@ -0,0 +1,166 @@
+"""
+Límite de tamaño de la base de datos (settings.max_images).
+
+Cuando la base supera max_images se eliminan las imágenes sobrantes según
+settings.eviction_policy:
+
+- "oldest": primero las de metadata_created más antiguo.
+- "least_viewed": primero las que hace más tiempo que no se abren en la
+  aplicación (las nunca abiertas van primero, de la más antigua a la más nueva).
+- "missing_first": primero las que ya no existen en disco (o están marcadas
+  como obsoletas), luego las más antiguas.
+
+Con settings.archive_evicted (activado por defecto) los registros
+eliminados se añaden al archivo frío "<base>.archive.jsonl" en lugar de
+perderse. Sin max_images (null o 0) no hay límite.
+
+Las decisiones se toman con los resúmenes del índice (catalog_index), así
+que no hace falta leer los registros completos salvo para archivarlos.
+"""
+import os
+import json
+from datetime import datetime
+from metadata_extractor import compact_record, expand_record
+
+EVICTION_POLICIES = ("oldest", "least_viewed", "missing_first")
+DEFAULT_POLICY = "oldest"
+
+
+def archive_file_for(metadata_file):
+    """Archivo frío que corresponde a una base de datos"""
+    return os.path.splitext(metadata_file)[0] + ".archive.jsonl"
+
+
+def views_file_for(metadata_file):
+    """Archivo con la última vez que se abrió cada imagen"""
+    return os.path.splitext(metadata_file)[0] + ".views.json"
+
+
+def _created(summary):
+    return summary.get('timestamps', {}).get('metadata_created', '')
+
+
+def _is_missing(path, summary):
+    return bool(summary.get('catalog_status', {}).get('stale')) or not os.path.exists(path)
+
+
+def eviction_order(summaries, policy=DEFAULT_POLICY, last_viewed=None, protect=()):
+    """
+    Rutas ordenadas de la primera a la última que se eliminaría. Las rutas
+    de protect (por ejemplo, las recién guardadas) quedan al final.
+    """
+    if policy not in EVICTION_POLICIES:
+        raise ValueError(f"Política de eliminación desconocida: {policy}")
+    last_viewed = last_viewed or {}
+    protect = set(protect)
+
+    if policy == "least_viewed":
+        def key(path):
+            return path in protect, last_viewed.get(path, ""), _created(summaries[path])
+    elif policy == "missing_first":
+        def key(path):
+            return path in protect, not _is_missing(path, summaries[path]), _created(summaries[path])
+    else:
+        def key(path):
+            return path in protect, _created(summaries[path])
+    return sorted(summaries, key=key)
+
+
+def select_evictions(summaries, max_images, policy=DEFAULT_POLICY, last_viewed=None, protect=()):
+    """Rutas que hay que eliminar para que queden como mucho max_images"""
+    excess = len(summaries) - max_images if max_images else 0
+    if excess <= 0:
+        return []
+    return eviction_order(summaries, policy, last_viewed, protect)[:excess]
+
+
+def enforce_limit(store, summaries, protect=(), last_viewed=None):
+    """
+    Aplica settings.max_images al almacén. summaries es el índice
+    {ruta: resumen} de todas las imágenes guardadas. Devuelve las rutas
+    eliminadas.
+    """
+    settings = store.settings()
+    evicted = select_evictions(
+        summaries, settings.get('max_images'),
+        settings.get('eviction_policy', DEFAULT_POLICY), last_viewed, protect
+    )
+    if not evicted:
+        return []
+
+    if settings.get('archive_evicted', True):
+        archive = ColdArchive(archive_file_for(store.metadata_file))
+        records = {path: store.get(path) for path in evicted}
+        if not archive.add({path: metadata for path, metadata in records.items() if metadata}):
+            # Sin archivo frío no se borra nada: se reintenta en el próximo guardado
+            return []
+    store.remove_many(evicted)
+    return evicted
+
+
+class ColdArchive:
+    """
+    Archivo frío de registros eliminados por el límite de tamaño (JSON Lines,
+    una imagen por línea en formato compacto). Solo se añade al final; si
+    una imagen se archiva varias veces vale la última.
+    """
+
+    def __init__(self, archive_file):
+        self.archive_file = archive_file
+
+    def add(self, records):
+        """Añade los registros al archivo; devuelve False si no se pudo escribir"""
+        archived_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with open(self.archive_file, 'a', encoding='utf-8') as f:
+                for path, metadata in records.items():
+                    entry = {"path": path, "archived_at": archived_at, "metadata": compact_record(metadata)}
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n")
+            return True
+        except Exception as e:
+            print(f"Error al archivar imágenes: {e}")
+            return False
+
+    def load(self):
+        """Devuelve {ruta: metadatos completos} de las imágenes archivadas"""
+        records = {}
+        if not os.path.exists(self.archive_file):
+            return records
+        with open(self.archive_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                records[entry['path']] = entry['metadata']
+        return {path: expand_record(path, record) for path, record in records.items()}
+
+
+class ViewLog:
+    """Última vez que se abrió cada imagen (para la política least_viewed)"""
+
+    def __init__(self, views_file):
+        self.views_file = views_file
+        self.last_viewed = {}
+        if os.path.exists(views_file):
+            try:
+                with open(views_file, 'r', encoding='utf-8') as f:
+                    self.last_viewed = json.load(f)
+            except Exception as e:
+                print(f"Error al leer el historial de imágenes abiertas: {e}")
+
+    def touch(self, path):
+        self.last_viewed[path] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def forget(self, paths):
+        for path in paths:
+            self.last_viewed.pop(path, None)
+
+    def save(self):
+        try:
+            temp_file = self.views_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.last_viewed, f, ensure_ascii=False)
+            os.replace(temp_file, self.views_file)
+        except Exception as e:
+            print(f"Error al guardar el historial de imágenes abiertas: {e}")
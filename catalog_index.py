@@ -0,0 +1,91 @@
+"""
+Índice de la base de datos para la ventana principal.
+
+Al iniciar solo se carga el resumen de cada imagen (nombre, resolución,
+fecha, huella y hash: lo que necesitan la lista, la detección de cambios,
+el índice de duplicados y la búsqueda). Los registros completos se leen del almacén al
+acceder a ellos, con una caché pequeña de los últimos consultados, de modo
+que la memoria no crece con el tamaño completo de los registros.
+
+Se usa como un diccionario ruta -> metadatos completos. summaries es el
+diccionario ruta -> resumen, que se puede copiar para los trabajos en
+segundo plano sin leer ningún registro.
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from metadata_extractor import summary_record
+
+
+class CatalogIndex(MutableMapping):
+    # Registros completos que se conservan en memoria tras leerlos
+    CACHE_SIZE = 64
+
+    def __init__(self, store):
+        self.store = store
+        self.summaries = store.load_index()
+        # Registros guardados en esta sesión que el almacén aún no escribió
+        self.recent = {}
+        self.cache = OrderedDict()
+
+    def __getitem__(self, path):
+        if path in self.recent:
+            return self.recent[path]
+        if path not in self.summaries:
+            raise KeyError(path)
+        metadata = self.cache.get(path)
+        if metadata is not None:
+            self.cache.move_to_end(path)
+            return metadata
+        metadata = self.store.get(path)
+        if metadata is None:
+            raise KeyError(path)
+        self.cache[path] = metadata
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return metadata
+
+    def loaded(self, path):
+        """Registro completo si ya está en memoria (sin leer el almacén), o None"""
+        if path in self.recent:
+            return self.recent[path]
+        return self.cache.get(path)
+
+    def __setitem__(self, path, metadata):
+        self.recent[path] = metadata
+        self.summaries[path] = summary_record(path, metadata)
+        self.cache.pop(path, None)
+
+    def __delitem__(self, path):
+        del self.summaries[path]
+        self.recent.pop(path, None)
+        self.cache.pop(path, None)
+
+    def __contains__(self, path):
+        return path in self.summaries
+
+    def __iter__(self):
+        return iter(self.summaries)
+
+    def __len__(self):
+        return len(self.summaries)
+
+    def release(self, records):
+        """
+        Deja de retener los registros que el almacén ya escribió; se volverán
+        a leer del disco si hacen falta. Si un registro se guardó otra vez
+        mientras tanto, se conserva la versión más nueva.
+        """
+        for path, metadata in records.items():
+            if self.recent.get(path) is metadata:
+                del self.recent[path]
+
+    def evict(self, paths):
+        """
+        Quita del índice las imágenes que el almacén eliminó por el límite de
+        tamaño. Las que se volvieron a guardar mientras tanto se conservan
+        (su escritura llega al almacén después). Devuelve las que se quitaron.
+        """
+        removed = [path for path in paths if path in self.summaries and path not in self.recent]
+        for path in removed:
+            del self[path]
+        return removed
@@ -0,0 +1,532 @@
+"""
+Búsqueda por facetas sobre el índice de la base de datos.
+
+SearchIndex mantiene índices secundarios en memoria sobre los resúmenes del
+índice (o registros completos, tienen la misma estructura):
+
+- Cada imagen tiene una posición fija (en el orden del catálogo) y los
+  conjuntos de imágenes son mapas de bits: enteros de Python con un bit por
+  posición. Intersecar filtros es un & y contar, contar bits.
+- Facetas (extensión, orientación, categoría de resolución, categoría de
+  tamaño y canal alfa): valor -> mapa de bits.
+- Rangos (megapíxeles, tamaño en bytes, fecha de modificación y fecha de
+  guardado): lista ordenada de valores que se recorta con bisect.
+- Nombres: lista ordenada de las partes de cada nombre que empiezan en una
+  palabra ("img_2024.jpg": img_2024.jpg, 2024.jpg, jpg). Cada palabra suelta
+  de la consulta debe ser el comienzo de alguna, y se busca con bisect.
+
+Así una consulta como "PNG verticales de más de 10 MP modificadas el último
+mes" no recorre los registros, y los conteos de cada faceta con el resto de
+filtros aplicados cuestan un & por valor.
+
+Las posiciones de las imágenes quitadas quedan libres hasta que son más de
+la mitad; entonces se vuelven a numerar todas en el mismo orden.
+
+Sintaxis de la barra de búsqueda (parse_query):
+    playa ext:png,jpg orientacion:vertical resolucion:alta tamano:grande alfa:si
+    mp>10 mb<=5 kb>100 modificada>30d modificada:2026-09 guardada>=2026-01-01
+"""
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, timedelta
+from metadata_extractor import orientation_of, size_category_of, resolution_category_of
+
+
+# Facetas por valor y su nombre en la interfaz
+FACETS = (
+    ("extension", "Extensión"),
+    ("orientation", "Orientación"),
+    ("resolution", "Resolución"),
+    ("size", "Tamaño"),
+    ("alpha", "Canal alfa"),
+)
+
+# Campos ordenados para consultas por rango
+RANGES = ("megapixels", "bytes", "modified", "created")
+
+# Nombres que acepta la barra de búsqueda (sin tildes, en minúsculas)
+FIELD_ALIASES = {
+    "ext": "extension", "extension": "extension", "formato": "extension",
+    "orientacion": "orientation", "orientation": "orientation",
+    "resolucion": "resolution", "resolution": "resolution",
+    "tamano": "size", "size": "size",
+    "alfa": "alpha", "alpha": "alpha", "transparencia": "alpha",
+    "mp": "megapixels", "megapixeles": "megapixels", "megapixels": "megapixels",
+    "b": "bytes", "bytes": "bytes", "kb": "bytes", "mb": "bytes", "gb": "bytes",
+    "modificada": "modified", "modified": "modified",
+    "guardada": "created", "created": "created",
+}
+
+# Multiplicador de las unidades de tamaño
+SIZE_UNITS = {"b": 1, "bytes": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+
+# Operadores de comparación, los de dos caracteres primero
+OPERATORS = (">=", "<=", ">", "<", ":", "=")
+
+# Posiciones libres a partir de las que se renumera (si además son más de la mitad)
+COMPACT_MIN_FREE = 1024
+
+# Mayor que cualquier carácter de un nombre: límite superior de un prefijo
+PREFIX_END = "\U0010ffff"
+
+# Tramos de números o de letras: donde empieza cada uno empieza una palabra
+WORD_RUN = re.compile(r"\d+|[^\W\d_]+")
+
+
+def normalize(text):
+    """Minúsculas y sin tildes, para comparar lo que escribe el usuario"""
+    text = str(text).lower()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def name_parts(name):
+    """
+    Partes de un nombre que empiezan en una palabra: el nombre completo y lo
+    que sigue a cada separador o a cada cambio entre letras y números.
+    """
+    if not name:
+        return []
+    return [name] + [name[match.start():] for match in WORD_RUN.finditer(name) if match.start()]
+
+
+def alpha_label(value):
+    return {True: "Sí", False: "No"}.get(value, "Desconocido")
+
+
+def index_values(path, metadata):
+    """
+    Valores indexados de un registro: (nombre en minúsculas, {faceta: valor},
+    {rango: valor}). Los rangos sin dato se omiten.
+    """
+    if not isinstance(metadata.get('file_info'), dict):
+        # Formato antiguo sin secciones: solo se busca por nombre
+        return normalize(metadata.get('filename', path)), {}, {}
+
+    file_info = metadata['file_info']
+    dimensions = metadata.get('image_dimensions', {})
+    size = metadata.get('file_size', {}).get('bytes')
+    timestamps = metadata.get('timestamps', {})
+    width = dimensions.get('width_pixels')
+    height = dimensions.get('height_pixels')
+
+    facets = {
+        "extension": file_info.get('file_extension') or "?",
+        "alpha": alpha_label(metadata.get('color_info', {}).get('has_alpha_channel')),
+    }
+    ranges = {}
+    if width is not None and height is not None:
+        facets["orientation"] = orientation_of(width, height)
+        facets["resolution"] = resolution_category_of(width * height)
+        ranges["megapixels"] = width * height / 1_000_000
+    if size is not None:
+        facets["size"] = size_category_of(round(size / (1024 * 1024), 2))
+        ranges["bytes"] = size
+    if timestamps.get('unix_timestamp_modified') is not None:
+        ranges["modified"] = timestamps['unix_timestamp_modified']
+    if timestamps.get('metadata_created'):
+        ranges["created"] = timestamps['metadata_created']
+    return normalize(file_info.get('filename', '')), facets, ranges
+
+
+class SortedField:
+    """Valores ordenados de un campo con la posición de cada imagen"""
+
+    def __init__(self):
+        self.keys = []
+        self.items = []
+
+    def build(self, values, slots):
+        self.items = sorted(zip(values, slots))
+        self.keys = [value for value, _slot in self.items]
+
+    def add(self, slot, value):
+        position = bisect_left(self.items, (value, slot))
+        self.items.insert(position, (value, slot))
+        self.keys.insert(position, value)
+
+    def discard(self, slot, value):
+        position = bisect_left(self.items, (value, slot))
+        if position < len(self.items) and self.items[position] == (value, slot):
+            del self.items[position]
+            del self.keys[position]
+
+    def bitmap(self, low, low_inclusive, high, high_inclusive, everything):
+        """
+        Mapa de bits de las posiciones con low <(=) valor <(=) high (None: sin
+        límite). everything son todas las imágenes: si el rango abarca más de
+        la mitad se arma el complemento, que es más corto.
+        """
+        start = 0 if low is None else (
+            bisect_left(self.keys, low) if low_inclusive else bisect_right(self.keys, low))
+        end = len(self.keys) if high is None else (
+            bisect_right(self.keys, high) if high_inclusive else bisect_left(self.keys, high))
+        if (end - start) * 2 <= len(self.items):
+            return to_bitmap(slot for _value, slot in self.items[start:end])
+        outside = self.items[:start] + self.items[end:]
+        return everything & ~to_bitmap(slot for _value, slot in outside)
+
+    def prefix_bitmap(self, prefix):
+        """Mapa de bits de las posiciones con algún valor que empieza por prefix"""
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + PREFIX_END)
+        return to_bitmap(slot for _value, slot in self.items[start:end])
+
+
+def to_bitmap(slots):
+    """Mapa de bits con las posiciones indicadas"""
+    slots = list(slots)
+    if not slots:
+        return 0
+    data = bytearray((max(slots) >> 3) + 1)
+    for slot in slots:
+        data[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(data, 'little')
+
+
+def bit_count(bitmap):
+    return bin(bitmap).count("1")
+
+
+class Query:
+    """Filtros de una búsqueda; todos deben cumplirse"""
+
+    def __init__(self):
+        # faceta -> textos buscados (coincide el valor que contenga alguno)
+        self.facets = {}
+        # rango -> [(mínimo, incluido, máximo, incluido)]
+        self.ranges = {}
+        # Palabras que deben aparecer en el nombre del archivo
+        self.words = []
+
+    def is_empty(self):
+        return not (self.facets or self.ranges or self.words)
+
+    def with_facet(self, facet, values):
+        """Copia de la consulta con una faceta elegida en la interfaz (valores exactos)"""
+        query = Query()
+        query.facets = dict(self.facets)
+        query.ranges = self.ranges
+        query.words = self.words
+        query.facets[facet] = [("=", value) for value in values]
+        return query
+
+
+def _parse_number(text):
+    try:
+        return float(text.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _parse_period(text):
+    """
+    Periodo de una fecha escrita como AAAA, AAAA-MM, AAAA-MM-DD o Nd (hace N
+    días). Devuelve (inicio, fin) como datetime, o None si no es una fecha.
+    """
+    if text.endswith("d") and text[:-1].isdigit():
+        moment = datetime.now() - timedelta(days=int(text[:-1]))
+        return moment, None
+    for fmt, step in (("%Y-%m-%d", "day"), ("%Y-%m", "month"), ("%Y", "year")):
+        try:
+            start = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if step == "day":
+            end = start + timedelta(days=1)
+        elif step == "month":
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            end = start.replace(year=start.year + 1)
+        return start, end
+    return None
+
+
+def _range_filter(field, unit, operator, text):
+    """(mínimo, incluido, máximo, incluido) de un término de rango, o None"""
+    if field in ("modified", "created"):
+        period = _parse_period(text)
+        if period is None:
+            return None
+        # Fechas de modificación en segundos Unix; de guardado, como texto ordenable
+        if field == "modified":
+            start, end = (moment.timestamp() if moment else None for moment in period)
+        else:
+            start, end = (moment.strftime("%Y-%m-%d %H:%M:%S") if moment else None for moment in period)
+        if end is None:
+            # Un instante (Nd): ":" es desde entonces
+            if operator in (":", "="):
+                return (start, True, None, True)
+            if operator in (">", ">="):
+                return (start, operator == ">=", None, True)
+            return (None, True, start, operator == "<=")
+        # Un periodo [inicio, fin): ">" es después del periodo y "<" antes
+        if operator in (":", "="):
+            return (start, True, end, False)
+        if operator == ">":
+            return (end, True, None, True)
+        if operator == ">=":
+            return (start, True, None, True)
+        if operator == "<":
+            return (None, True, start, False)
+        return (None, True, end, False)
+
+    value = _parse_number(text)
+    if value is None:
+        return None
+    value *= SIZE_UNITS.get(unit, 1)
+    if operator in (":", "="):
+        return (value, True, value, True)
+    if operator in (">", ">="):
+        return (value, operator == ">=", None, True)
+    return (None, True, value, operator == "<=")
+
+
+def parse_query(text):
+    """Convierte el texto de la barra de búsqueda en una consulta"""
+    query = Query()
+    for term in text.split():
+        normalized = normalize(term)
+        for operator in OPERATORS:
+            name, found, value = normalized.partition(operator)
+            if found and name in FIELD_ALIASES and value:
+                break
+        else:
+            query.words.append(normalized)
+            continue
+
+        field = FIELD_ALIASES[name]
+        if field in RANGES:
+            condition = _range_filter(field, name, operator, value)
+            if condition is None:
+                query.words.append(normalized)
+            else:
+                query.ranges.setdefault(field, []).append(condition)
+        else:
+            query.facets.setdefault(field, []).extend(
+                (":", option) for option in value.split(",") if option)
+    return query
+
+
+def _facet_matches(value, options):
+    """Indica si un valor de faceta cumple alguna de las opciones de la consulta"""
+    for kind, option in options:
+        if kind == "=":
+            if value == option:
+                return True
+        elif option in ("si", "yes", "true") and value == "Sí":
+            return True
+        elif option in ("no", "false") and value == "No":
+            return True
+        elif option not in ("si", "yes", "true", "no", "false") and option in normalize(value):
+            return True
+    return False
+
+
+def _in_range(value, condition):
+    low, low_inclusive, high, high_inclusive = condition
+    if low is not None and (value < low or (value == low and not low_inclusive)):
+        return False
+    if high is not None and (value > high or (value == high and not high_inclusive)):
+        return False
+    return True
+
+
+class SearchIndex:
+    def __init__(self, images=None):
+        # Nombre de cada imagen en minúsculas, en el orden del catálogo
+        self.names = {}
+        # Partes de los nombres ordenadas (ver name_parts)
+        self.name_index = SortedField()
+        # Posición de cada ruta (en el orden del catálogo) y ruta de cada posición
+        self.slots = {}
+        self.slot_paths = []
+        # Posiciones de imágenes quitadas (None en slot_paths)
+        self.free = 0
+        # Mapa de bits de las imágenes indexadas
+        self.all = 0
+        # faceta -> {ruta: valor} y faceta -> {valor: mapa de bits}
+        self.values = {facet: {} for facet, _label in FACETS}
+        self.by_value = {facet: {} for facet, _label in FACETS}
+        # rango -> {ruta: valor} y sus valores ordenados
+        self.range_values = {field: {} for field in RANGES}
+        self.sorted = {field: SortedField() for field in RANGES}
+        # Cambia con cada imagen indexada o quitada (invalida los filtros calculados)
+        self.version = 0
+        self.cached_filters = (None, None, None)
+        if images:
+            self.build(images)
+
+    def build(self, images):
+        """Indexa todas las imágenes de una vez (cada mapa de bits se arma una sola vez)"""
+        for path, metadata in images.items():
+            name, facets, ranges = index_values(path, metadata)
+            self.slots[path] = len(self.slot_paths)
+            self.slot_paths.append(path)
+            self.names[path] = name
+            for facet, value in facets.items():
+                self.values[facet][path] = value
+            for field, value in ranges.items():
+                self.range_values[field][path] = value
+        self._build_bitmaps()
+
+    def _build_bitmaps(self):
+        """Arma los mapas de bits y las listas ordenadas a partir de los valores indexados"""
+        slots = self.slots
+        self.all = to_bitmap(slots.values())
+        for facet, _label in FACETS:
+            value_slots = {}
+            for path, value in self.values[facet].items():
+                found = value_slots.get(value)
+                if found is None:
+                    value_slots[value] = [slots[path]]
+                else:
+                    found.append(slots[path])
+            self.by_value[facet] = {value: to_bitmap(found) for value, found in value_slots.items()}
+        for field in RANGES:
+            values = self.range_values[field]
+            self.sorted[field].build(values.values(), map(slots.__getitem__, values))
+        parts = [(part, slots[path]) for path, name in self.names.items() for part in name_parts(name)]
+        self.name_index.build((part for part, _slot in parts), (slot for _part, slot in parts))
+
+    def _compact(self):
+        """Vuelve a numerar las posiciones sin huecos, en el mismo orden"""
+        self.slot_paths = [path for path in self.slot_paths if path is not None]
+        self.slots = {path: slot for slot, path in enumerate(self.slot_paths)}
+        self.free = 0
+        self._build_bitmaps()
+
+    def add(self, path, metadata):
+        """Indexa (o vuelve a indexar) una imagen; conserva su posición"""
+        self.version += 1
+        slot = self.slots.get(path)
+        if slot is None:
+            slot = len(self.slot_paths)
+            self.slot_paths.append(path)
+            self.slots[path] = slot
+            self.all |= 1 << slot
+        else:
+            self._unindex(path, slot)
+        name, facets, ranges = index_values(path, metadata)
+        self.names[path] = name
+        for part in name_parts(name):
+            self.name_index.add(slot, part)
+        bit = 1 << slot
+        for facet, value in facets.items():
+            self.values[facet][path] = value
+            self.by_value[facet][value] = self.by_value[facet].get(value, 0) | bit
+        for field, value in ranges.items():
+            self.range_values[field][path] = value
+            self.sorted[field].add(slot, value)
+
+    def add_many(self, records):
+        for path, metadata in records.items():
+            self.add(path, metadata)
+
+    def remove(self, path):
+        slot = self.slots.pop(path, None)
+        if slot is None:
+            return
+        self.version += 1
+        self._unindex(path, slot)
+        del self.names[path]
+        self.slot_paths[slot] = None
+        self.all &= ~(1 << slot)
+        self.free += 1
+        if self.free >= COMPACT_MIN_FREE and self.free * 2 > len(self.slot_paths):
+            self._compact()
+
+    def _unindex(self, path, slot):
+        bit = 1 << slot
+        for part in name_parts(self.names[path]):
+            self.name_index.discard(slot, part)
+        for facet, _label in FACETS:
+            value = self.values[facet].pop(path, None)
+            if value is not None:
+                bitmap = self.by_value[facet][value] & ~bit
+                if bitmap:
+                    self.by_value[facet][value] = bitmap
+                else:
+                    del self.by_value[facet][value]
+        for field in RANGES:
+            value = self.range_values[field].pop(path, None)
+            if value is not None:
+                self.sorted[field].discard(slot, value)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _facet_bitmap(self, facet, options):
+        bitmap = 0
+        for value, value_bitmap in self.by_value[facet].items():
+            if _facet_matches(value, options):
+                bitmap |= value_bitmap
+        return bitmap
+
+    def _name_bitmap(self, words):
+        """Imágenes cuyo nombre tiene una palabra que empieza por cada una de words"""
+        return self._intersect(self.name_index.prefix_bitmap(word) for word in words)
+
+    def _filters(self, query):
+        """Mapa de bits de cada filtro: [(faceta o None, mapa de bits)]"""
+        # search y facet_counts suelen pedir la misma consulta seguidas
+        if self.cached_filters[0] is query and self.cached_filters[1] == self.version:
+            return self.cached_filters[2]
+        filters = [(facet, self._facet_bitmap(facet, options)) for facet, options in query.facets.items()]
+        for field, conditions in query.ranges.items():
+            filters.extend((None, self.sorted[field].bitmap(*condition, self.all))
+                           for condition in conditions)
+        if query.words:
+            filters.append((None, self._name_bitmap(query.words)))
+        self.cached_filters = (query, self.version, filters)
+        return filters
+
+    def _intersect(self, bitmaps):
+        result = self.all
+        for bitmap in bitmaps:
+            result &= bitmap
+        return result
+
+    def search(self, query):
+        """Rutas que cumplen la consulta, en el orden del catálogo"""
+        if query.is_empty():
+            return list(self.names)
+        result = self._intersect(bitmap for _facet, bitmap in self._filters(query))
+        # Las posiciones siguen el orden del catálogo: se recorren los bits de menor a mayor
+        bits = bin(result)[:1:-1]
+        slot_paths = self.slot_paths
+        return [slot_paths[slot] for slot, bit in enumerate(bits) if bit == "1"]
+
+    def matches(self, query, path):
+        """Indica si una imagen cumple la consulta (para las imágenes que se guardan después)"""
+        if path not in self.names:
+            return False
+        for facet, options in query.facets.items():
+            value = self.values[facet].get(path)
+            if value is None or not _facet_matches(value, options):
+                return False
+        for field, conditions in query.ranges.items():
+            value = self.range_values[field].get(path)
+            if value is None or not all(_in_range(value, condition) for condition in conditions):
+                return False
+        parts = name_parts(self.names[path])
+        return all(any(part.startswith(word) for part in parts) for word in query.words)
+
+    def facet_counts(self, query):
+        """
+        {faceta: Counter(valor -> imágenes)}: cada faceta se cuenta con el
+        resto de filtros aplicados, para que se vea cuántas imágenes quedarían
+        al elegir otro valor.
+        """
+        filters = self._filters(query)
+        counts = {}
+        for facet, _label in FACETS:
+            base = self._intersect(bitmap for other, bitmap in filters if other != facet)
+            counts[facet] = Counter({
+                value: bit_count(bitmap & base) for value, bitmap in self.by_value[facet].items()
+            })
+        return counts
@@ -0,0 +1,108 @@
+import threading
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QTreeWidget, QTreeWidgetItem, QFileDialog, QMessageBox, QSplitter)
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QTimer
+from perf_trace import tracer
+
+
+class DiagnosticsDialog(QDialog):
+    """Tiempos de las operaciones principales, contadores y últimos eventos"""
+
+    # Intervalo de actualización del panel (ms)
+    REFRESH_INTERVAL = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_ui()
+        self.refresh()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(self.REFRESH_INTERVAL)
+
+    def init_ui(self):
+        self.setWindowTitle("📊 Rendimiento")
+        self.resize(900, 650)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        title = QLabel("📊 Diagnóstico de Rendimiento")
+        title.setFont(QFont("Segoe UI", 16, QFont.Bold))
+        title.setStyleSheet("color: #667eea; padding: 10px;")
+        layout.addWidget(title)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.stats_tree = QTreeWidget()
+        self.stats_tree.setHeaderLabels(["Operación", "Veces", "Total (ms)", "Media (ms)", "Máx. (ms)", "Última (ms)"])
+        self.stats_tree.setColumnWidth(0, 250)
+        self.stats_tree.setRootIsDecorated(False)
+        splitter.addWidget(self.stats_tree)
+
+        self.events_tree = QTreeWidget()
+        self.events_tree.setHeaderLabels(["Operación", "Inicio (s)", "Duración (ms)", "Hilo", "Detalles"])
+        self.events_tree.setColumnWidth(0, 200)
+        self.events_tree.setRootIsDecorated(False)
+        splitter.addWidget(self.events_tree)
+        layout.addWidget(splitter)
+
+        self.counters_label = QLabel()
+        self.counters_label.setWordWrap(True)
+        layout.addWidget(self.counters_label)
+
+        button_layout = QHBoxLayout()
+        trace_button = QPushButton("Guardar traza (Chrome)")
+        trace_button.clicked.connect(self.save_trace)
+        button_layout.addWidget(trace_button)
+        reset_button = QPushButton("Reiniciar")
+        reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(reset_button)
+        button_layout.addStretch()
+        close_button = QPushButton("Cerrar")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def refresh(self):
+        stats, counters, events = tracer.snapshot()
+
+        self.stats_tree.clear()
+        for name in sorted(stats, key=lambda name: stats[name][1], reverse=True):
+            calls, total, longest, last = stats[name]
+            self.stats_tree.addTopLevelItem(QTreeWidgetItem([
+                name, str(calls), f"{total / 1e6:.1f}", f"{total / calls / 1e6:.2f}",
+                f"{longest / 1e6:.2f}", f"{last / 1e6:.2f}"
+            ]))
+
+        main_thread = threading.main_thread().ident
+        self.events_tree.clear()
+        for name, start, duration, thread_id, args in reversed(events):
+            details = ", ".join(f"{key}={value}" for key, value in args.items())
+            thread = "interfaz" if thread_id == main_thread else str(thread_id)
+            self.events_tree.addTopLevelItem(QTreeWidgetItem([
+                name, f"{start / 1e9:.3f}", f"{duration / 1e6:.2f}", thread, details
+            ]))
+
+        if counters:
+            self.counters_label.setText("Contadores: " + " · ".join(
+                f"{name}: {value}" for name, value in sorted(counters.items())))
+        else:
+            self.counters_label.setText("Contadores: -")
+
+    def save_trace(self):
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Traza", "image_metadata_trace.json", "Traza de Chrome (*.json)")
+        if not file_name:
+            return
+        try:
+            count = tracer.write_chrome_trace(file_name)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"No se pudo guardar la traza: {e}")
+            return
+        QMessageBox.information(
+            self, "✅ Éxito",
+            f"{count} eventos guardados en {file_name}\nSe puede abrir en chrome://tracing o ui.perfetto.dev")
+
+    def reset(self):
+        tracer.reset()
+        self.refresh()
@@ -0,0 +1,179 @@
+"""
+Detección de imágenes duplicadas y casi duplicadas.
+
+- DuplicateIndex mantiene un índice hash -> rutas con el hash de contenido que
+  ya está guardado en cada registro, así que detectar un duplicado exacto no
+  vuelve a leer ningún archivo.
+- Opcionalmente cada registro guarda un hash perceptual (dHash de 64 bits
+  calculado sobre una miniatura). Los hashes se indexan en un árbol BK para
+  buscar imágenes parecidas por distancia de Hamming sin recorrer toda la
+  biblioteca.
+"""
+from file_hashing import stored_hash
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Árbol BK sobre enteros con distancia de Hamming"""
+
+    def __init__(self):
+        # Cada nodo: [hash, rutas, {distancia: nodo hijo}]
+        self.root = None
+
+    def add(self, value, path):
+        if self.root is None:
+            self.root = [value, {path}, {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].add(path)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, {path}, {}]
+                return
+            node = child
+
+    def discard(self, value, path):
+        """Quita una ruta; el nodo queda aunque no tenga rutas"""
+        node = self.root
+        while node is not None:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].discard(path)
+                return
+            node = node[2].get(distance)
+
+    def search(self, value, max_distance):
+        """Devuelve [(distancia, ruta)] con distancia <= max_distance"""
+        results = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, path) for path in node[1])
+            # Desigualdad triangular: solo los hijos en este rango pueden coincidir
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        results.sort()
+        return results
+
+
+def perceptual_hash(metadata):
+    """dHash guardado en los metadatos como entero, o None"""
+    value = metadata.get('similarity', {}).get('dhash')
+    return int(value, 16) if value else None
+
+
+class DuplicateIndex:
+    def __init__(self, images=None):
+        self.by_hash = {}
+        self.hash_of = {}
+        self.similar = BKTree()
+        self.dhash_of = {}
+        if images:
+            for path, metadata in images.items():
+                self.add(path, metadata)
+
+    def add(self, path, metadata):
+        """Indexa (o vuelve a indexar) una imagen con los hashes de su registro"""
+        self.remove(path)
+        content_hash = stored_hash(metadata)
+        if content_hash[1]:
+            self.hash_of[path] = content_hash
+            self.by_hash.setdefault(content_hash, set()).add(path)
+        dhash = perceptual_hash(metadata)
+        if dhash is not None:
+            self.dhash_of[path] = dhash
+            self.similar.add(dhash, path)
+
+    def add_many(self, records):
+        for path, metadata in records.items():
+            self.add(path, metadata)
+
+    def remove(self, path):
+        content_hash = self.hash_of.pop(path, None)
+        if content_hash is not None:
+            paths = self.by_hash.get(content_hash)
+            paths.discard(path)
+            if not paths:
+                del self.by_hash[content_hash]
+        dhash = self.dhash_of.pop(path, None)
+        if dhash is not None:
+            self.similar.discard(dhash, path)
+
+    def duplicates_of(self, path):
+        """Otras rutas con exactamente el mismo contenido"""
+        content_hash = self.hash_of.get(path)
+        if content_hash is None:
+            return []
+        return sorted(self.by_hash[content_hash] - {path})
+
+    def duplicate_groups(self):
+        """Grupos de rutas con el mismo contenido (solo los de 2 o más)"""
+        return [sorted(paths) for paths in self.by_hash.values() if len(paths) > 1]
+
+    def similar_to(self, path, max_distance=6):
+        """[(distancia, ruta)] de imágenes parecidas según el dHash"""
+        dhash = self.dhash_of.get(path)
+        if dhash is None:
+            return []
+        return [(d, p) for d, p in self.similar.search(dhash, max_distance) if p != path]
+
+    def similar_groups(self, max_distance=6):
+        """Grupos de imágenes parecidas (unión de vecinos dentro de max_distance)"""
+        parent = {}
+
+        def find(path):
+            while parent.setdefault(path, path) != path:
+                parent[path] = parent[parent[path]]
+                path = parent[path]
+            return path
+
+        for path, dhash in self.dhash_of.items():
+            for _distance, other in self.similar.search(dhash, max_distance):
+                if other != path:
+                    parent[find(other)] = find(path)
+
+        groups = {}
+        for path in parent:
+            groups.setdefault(find(path), []).append(path)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def dhash_file(path, hash_size=8):
+    """
+    Calcula el dHash de una imagen: se reduce a (hash_size+1) x hash_size en
+    escala de grises y cada bit indica si un píxel es más claro que su vecino
+    derecho. Devuelve el hash en hexadecimal o None si no se puede leer.
+    """
+    # Importación tardía: el índice no necesita Qt
+    from PyQt5.QtGui import QImage, QImageReader
+    from PyQt5.QtCore import Qt, QSize
+
+    reader = QImageReader(path)
+    # En JPEG la reducción ocurre durante la decodificación
+    reader.setScaledSize(QSize(64, 64))
+    image = reader.read()
+    if image.isNull():
+        return None
+    image = image.scaled(hash_size + 1, hash_size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    data = bytes(bits)
+    stride = image.bytesPerLine()
+    value = 0
+    for y in range(hash_size):
+        row = data[y * stride:y * stride + hash_size + 1]
+        for x in range(hash_size):
+            value = (value << 1) | (1 if row[x] > row[x + 1] else 0)
+    return f"{value:0{hash_size * hash_size // 4}x}"
@@ -0,0 +1,83 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                             QTreeWidget, QTreeWidgetItem, QSpinBox)
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt
+
+
+class DuplicatesDialog(QDialog):
+    """Ventana con los grupos de imágenes duplicadas y parecidas"""
+
+    def __init__(self, duplicates, parent=None):
+        super().__init__(parent)
+        self.duplicates = duplicates
+        self.init_ui()
+        self.fill_groups()
+
+    def init_ui(self):
+        self.setWindowTitle("🔍 Duplicados")
+        self.resize(800, 600)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        title = QLabel("🔍 Imágenes Duplicadas")
+        title.setFont(QFont("Segoe UI", 16, QFont.Bold))
+        title.setStyleSheet("color: #667eea; padding: 10px;")
+        layout.addWidget(title)
+
+        # Distancia máxima de Hamming entre dHash para considerar dos imágenes parecidas
+        distance_layout = QHBoxLayout()
+        distance_label = QLabel("Distancia máxima para imágenes parecidas:")
+        self.distance_input = QSpinBox()
+        self.distance_input.setRange(0, 32)
+        self.distance_input.setValue(6)
+        self.distance_input.valueChanged.connect(self.fill_groups)
+        distance_layout.addWidget(distance_label)
+        distance_layout.addWidget(self.distance_input)
+        distance_layout.addStretch()
+        layout.addLayout(distance_layout)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Imagen", "Distancia"])
+        self.tree.setColumnWidth(0, 650)
+        layout.addWidget(self.tree)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        close_button = QPushButton("Cerrar")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button, alignment=Qt.AlignRight)
+
+    def fill_groups(self):
+        self.tree.clear()
+
+        exact_groups = self.duplicates.duplicate_groups()
+        exact_root = QTreeWidgetItem([f"Duplicados exactos ({len(exact_groups)} grupos)"])
+        for group in exact_groups:
+            group_item = QTreeWidgetItem([f"{len(group)} copias"])
+            for path in group:
+                group_item.addChild(QTreeWidgetItem([path, "0"]))
+            exact_root.addChild(group_item)
+        self.tree.addTopLevelItem(exact_root)
+
+        max_distance = self.distance_input.value()
+        similar_groups = self.duplicates.similar_groups(max_distance)
+        similar_root = QTreeWidgetItem([f"Imágenes parecidas ({len(similar_groups)} grupos)"])
+        for group in similar_groups:
+            group_item = QTreeWidgetItem([f"{len(group)} imágenes"])
+            reference = group[0]
+            distances = dict((path, distance) for distance, path in
+                             self.duplicates.similar_to(reference, max_distance))
+            for path in group:
+                distance = "" if path == reference else str(distances.get(path, ""))
+                group_item.addChild(QTreeWidgetItem([path, distance]))
+            similar_root.addChild(group_item)
+        self.tree.addTopLevelItem(similar_root)
+        self.tree.expandToDepth(0)
+
+        if not self.duplicates.dhash_of:
+            self.summary_label.setText(
+                "Para buscar imágenes parecidas activa settings.perceptual_hash y actualiza el catálogo")
+        else:
+            self.summary_label.setText(f"{len(self.duplicates.dhash_of)} imágenes con hash perceptual")
@@ -0,0 +1,583 @@
+"""
+Lectura de los metadatos incrustados en la imagen (EXIF, GPS, IPTC y XMP).
+
+Igual que image_probe, se recorren solo las cabeceras sin decodificar los
+píxeles:
+
+- JPEG: se avanza de marcador en marcador leyendo solo los segmentos APP1
+  (EXIF y XMP) y APP13 (IPTC dentro de los recursos de Photoshop); el resto
+  se salta con seek y la lectura termina en el inicio de los datos (SOS).
+- PNG: bloques eXIf (EXIF), iTXt XML:com.adobe.xmp (XMP) y tEXt/iTXt con
+  título, autor, descripción o copyright, hasta el primer IDAT.
+
+El EXIF es una estructura TIFF: se leen IFD0 (cámara, orientación, autor),
+el IFD Exif (exposición, objetivo, fecha de captura) y el IFD GPS. Los
+textos descriptivos (título, autor, descripción, palabras clave) se toman de
+XMP, después IPTC y por último EXIF, que es el orden de preferencia habitual
+de los programas de catalogación. Un segmento dañado solo se omite.
+
+El resultado es la sección "embedded_metadata" del registro; solo contiene
+los campos que la imagen trae.
+"""
+import os
+import re
+import math
+import struct
+import xml.etree.ElementTree as ElementTree
+
+
+# ---------- TIFF / EXIF ----------
+
+# Tamaño en bytes de cada tipo de valor TIFF
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+# Entradas que se leen como máximo por IFD (protege de archivos dañados)
+MAX_IFD_ENTRIES = 512
+
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+# IFD0: etiqueta -> campo
+IFD0_TAGS = {
+    0x010E: "description",
+    0x010F: "make",
+    0x0110: "model",
+    0x0112: "orientation",
+    0x0131: "software",
+    0x0132: "modified_date",
+    0x013B: "artist",
+    0x8298: "copyright",
+    # Etiquetas de Windows en UCS-2
+    0x9C9B: "xp_title",
+    0x9C9C: "xp_comment",
+    0x9C9D: "xp_author",
+    0x9C9E: "xp_keywords",
+    0x9C9F: "xp_subject",
+}
+
+# IFD Exif: etiqueta -> campo
+EXIF_TAGS = {
+    0x829A: "exposure_time",
+    0x829D: "f_number",
+    0x8822: "exposure_program",
+    0x8827: "iso",
+    0x9003: "capture_date",
+    0x9004: "digitized_date",
+    0x9011: "offset_time",
+    0x9204: "exposure_bias",
+    0x9207: "metering_mode",
+    0x9209: "flash",
+    0x920A: "focal_length",
+    0xA403: "white_balance",
+    0xA405: "focal_length_35mm",
+    0xA433: "lens_make",
+    0xA434: "lens_model",
+}
+
+# IFD GPS: etiqueta -> campo
+GPS_TAGS = {
+    1: "latitude_ref",
+    2: "latitude",
+    3: "longitude_ref",
+    4: "longitude",
+    5: "altitude_ref",
+    6: "altitude",
+}
+
+# Nombres de EXIF para algunos valores numéricos
+EXPOSURE_PROGRAMS = {
+    1: "Manual", 2: "Normal", 3: "Prioridad de apertura", 4: "Prioridad de velocidad",
+    5: "Creativo", 6: "Acción", 7: "Retrato", 8: "Paisaje",
+}
+METERING_MODES = {
+    1: "Promedio", 2: "Ponderado al centro", 3: "Puntual", 4: "Multipunto", 5: "Matricial", 6: "Parcial",
+}
+
+
+def _tiff_value(data, order, value_type, count, value_offset, base):
+    """Valor de una entrada de IFD (los datos de más de 4 bytes están en otra posición)"""
+    size = TIFF_TYPE_SIZES.get(value_type)
+    if size is None or count <= 0:
+        return None
+    total = size * count
+    if total > 4:
+        start = base + struct.unpack(order + 'I', value_offset)[0]
+        raw = data[start:start + total]
+        if len(raw) < total:
+            return None
+    else:
+        raw = value_offset[:total]
+
+    if value_type == 2:
+        return raw.split(b'\x00', 1)[0].decode('utf-8', 'replace').strip()
+    if value_type in (1, 7):
+        return raw
+    if value_type in (5, 10):
+        fmt = order + ('II' if value_type == 5 else 'ii') * count
+        numbers = struct.unpack(fmt, raw)
+        values = [(numbers[i], numbers[i + 1]) for i in range(0, len(numbers), 2)]
+    else:
+        fmt = {3: 'H', 4: 'I', 6: 'b', 8: 'h', 9: 'i', 11: 'f', 12: 'd'}[value_type]
+        values = list(struct.unpack(order + fmt * count, raw))
+    return values[0] if count == 1 else values
+
+
+def _read_ifd(data, order, offset, base, tags):
+    """Lee las entradas conocidas de un IFD; devuelve ({campo: valor}, {etiqueta: puntero})"""
+    values = {}
+    pointers = {}
+    start = base + offset
+    if offset <= 0 or start + 2 > len(data):
+        return values, pointers
+    count = min(struct.unpack(order + 'H', data[start:start + 2])[0], MAX_IFD_ENTRIES)
+    for index in range(count):
+        entry = data[start + 2 + index * 12:start + 14 + index * 12]
+        if len(entry) < 12:
+            break
+        tag, value_type, value_count = struct.unpack(order + 'HHI', entry[:8])
+        if tag in (EXIF_IFD_POINTER, GPS_IFD_POINTER):
+            pointers[tag] = struct.unpack(order + 'I', entry[8:12])[0]
+        elif tag in tags:
+            try:
+                value = _tiff_value(data, order, value_type, value_count, entry[8:12], base)
+            except (struct.error, KeyError, ValueError):
+                continue
+            if value is not None and value != "":
+                values[tags[tag]] = value
+    return values, pointers
+
+
+def parse_tiff(data, base=0):
+    """Campos EXIF y GPS de una estructura TIFF (contenido de APP1 Exif o eXIf)"""
+    header = data[base:base + 8]
+    if len(header) < 8 or header[:2] not in (b'II', b'MM'):
+        return {}, {}
+    order = '<' if header[:2] == b'II' else '>'
+    if struct.unpack(order + 'H', header[2:4])[0] != 42:
+        return {}, {}
+    ifd0, pointers = _read_ifd(data, order, struct.unpack(order + 'I', header[4:8])[0], base, IFD0_TAGS)
+    exif = {}
+    gps = {}
+    if EXIF_IFD_POINTER in pointers:
+        exif, _ = _read_ifd(data, order, pointers[EXIF_IFD_POINTER], base, EXIF_TAGS)
+    if GPS_IFD_POINTER in pointers:
+        gps, _ = _read_ifd(data, order, pointers[GPS_IFD_POINTER], base, GPS_TAGS)
+    exif.update(ifd0)
+    return exif, gps
+
+
+def _rational(value):
+    """Número de un valor TIFF escalar (racional o entero); None si es otro tipo o no es finito"""
+    if isinstance(value, tuple):
+        numerator, denominator = value
+        return numerator / denominator if denominator else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return value
+    return None
+
+
+def _text(value):
+    """Texto de un campo ASCII; None si la etiqueta llegó con otro tipo (bytes, números)"""
+    if isinstance(value, str) and value:
+        return value
+    return None
+
+
+def _integer(value):
+    """Entero de un campo escalar; None si llegó como lista, bytes o racional"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def _exif_date(text):
+    """'2024:05:01 12:30:00' -> '2024-05-01 12:30:00'"""
+    if not isinstance(text, str) or len(text) < 10 or text.startswith("0000"):
+        return None
+    return text[:10].replace(":", "-") + text[10:19]
+
+
+def _xp_text(value):
+    """Texto de las etiquetas XP de Windows (UCS-2 little endian)"""
+    if isinstance(value, bytes):
+        return value.decode('utf-16-le', 'replace').rstrip('\x00').strip() or None
+    return None
+
+
+def _gps_coordinate(value, reference):
+    if not isinstance(value, list) or len(value) != 3:
+        return None
+    degrees, minutes, seconds = (_rational(part) for part in value)
+    if None in (degrees, minutes, seconds):
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    if reference in ("S", "W"):
+        coordinate = -coordinate
+    return round(coordinate, 7)
+
+
+def _exposure_time(value):
+    """Tiempo de exposición como texto ("1/125 s") y en segundos"""
+    seconds = _rational(value)
+    if not seconds or seconds < 0:
+        return None, None
+    if seconds < 1:
+        return f"1/{round(1 / seconds)} s", round(seconds, 6)
+    return f"{round(seconds, 1):g} s", round(seconds, 6)
+
+
+# ---------- IPTC ----------
+
+# Registro 2 de IPTC-IIM: dataset -> campo
+IPTC_DATASETS = {
+    5: "title",
+    25: "keywords",
+    55: "date",
+    80: "author",
+    116: "copyright",
+    120: "description",
+}
+
+
+def _decode_text(raw):
+    try:
+        return raw.decode('utf-8').strip()
+    except UnicodeDecodeError:
+        return raw.decode('latin-1').strip()
+
+
+def parse_iptc(data):
+    """Campos IPTC de los datos IIM (recurso 0x0404 de Photoshop)"""
+    values = {}
+    position = 0
+    while position + 5 <= len(data):
+        if data[position] != 0x1C:
+            break
+        record, dataset, size = struct.unpack('>BBH', data[position + 1:position + 5])
+        position += 5
+        if size & 0x8000:
+            # Longitud extendida: no se usa en los campos de texto
+            break
+        raw = data[position:position + size]
+        position += size
+        if record != 2 or dataset not in IPTC_DATASETS:
+            continue
+        field = IPTC_DATASETS[dataset]
+        text = _decode_text(raw)
+        if not text:
+            continue
+        if field == "keywords":
+            values.setdefault(field, []).append(text)
+        elif field == "date" and len(text) == 8 and text.isdigit():
+            values[field] = f"{text[:4]}-{text[4:6]}-{text[6:]}"
+        else:
+            values[field] = text
+    return values
+
+
+def parse_photoshop(data):
+    """IPTC dentro de los recursos de imagen de Photoshop (segmento APP13)"""
+    position = 0
+    while position + 12 <= len(data):
+        if data[position:position + 4] != b'8BIM':
+            break
+        resource_id = struct.unpack('>H', data[position + 4:position + 6])[0]
+        # Nombre en formato Pascal, con relleno hasta longitud par
+        name_length = data[position + 6]
+        position += 6 + name_length + 1 + ((name_length + 1) & 1)
+        if position + 4 > len(data):
+            break
+        size = struct.unpack('>I', data[position:position + 4])[0]
+        position += 4
+        if resource_id == 0x0404:
+            return parse_iptc(data[position:position + size])
+        position += size + (size & 1)
+    return {}
+
+
+# ---------- XMP ----------
+
+XMP_NAMESPACES = {
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "xmp": "http://ns.adobe.com/xap/1.0/",
+    "photoshop": "http://ns.adobe.com/photoshop/1.0/",
+}
+
+# Propiedades XMP: (espacio, nombre) -> campo
+XMP_PROPERTIES = {
+    ("dc", "title"): "title",
+    ("dc", "creator"): "author",
+    ("dc", "description"): "description",
+    ("dc", "subject"): "keywords",
+    ("dc", "rights"): "copyright",
+    ("xmp", "Rating"): "rating",
+    ("xmp", "CreateDate"): "capture_date",
+    ("photoshop", "DateCreated"): "capture_date",
+}
+
+
+def parse_xmp(data):
+    """Campos descriptivos de un paquete XMP (RDF/XML)"""
+    text = data.decode('utf-8', 'replace')
+    # Solo el bloque x:xmpmeta o rdf:RDF; el relleno del paquete se ignora
+    match = re.search(r'<x:xmpmeta.*?</x:xmpmeta>|<rdf:RDF.*?</rdf:RDF>', text, re.S)
+    if not match:
+        return {}
+    try:
+        root = ElementTree.fromstring(match.group(0))
+    except ElementTree.ParseError:
+        return {}
+
+    values = {}
+    for description in root.iter(f"{{{XMP_NAMESPACES['rdf']}}}Description"):
+        for (prefix, name), field in XMP_PROPERTIES.items():
+            if field in values:
+                continue
+            qualified = f"{{{XMP_NAMESPACES[prefix]}}}{name}"
+            # Propiedad simple como atributo de rdf:Description
+            if qualified in description.attrib:
+                values[field] = description.attrib[qualified].strip()
+                continue
+            element = description.find(qualified)
+            if element is None:
+                continue
+            # rdf:Alt, rdf:Seq o rdf:Bag con elementos rdf:li
+            items = [item.text.strip() for item in element.iter(f"{{{XMP_NAMESPACES['rdf']}}}li")
+                     if item.text and item.text.strip()]
+            if field == "keywords":
+                if items:
+                    values[field] = items
+            elif items:
+                values[field] = ", ".join(items) if field == "author" else items[0]
+            elif element.text and element.text.strip():
+                values[field] = element.text.strip()
+
+    if "rating" in values:
+        try:
+            values["rating"] = int(float(values["rating"]))
+        except ValueError:
+            del values["rating"]
+    if "capture_date" in values:
+        # 2024-05-01T12:30:00+02:00 -> 2024-05-01 12:30:00
+        values["capture_date"] = values["capture_date"][:19].replace("T", " ")
+    return values
+
+
+# ---------- Lectura de segmentos ----------
+
+XMP_JPEG_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+XMP_PNG_KEYWORD = b'XML:com.adobe.xmp'
+# Claves de texto PNG que se usan como campos descriptivos
+PNG_TEXT_KEYS = {b'Title': "title", b'Author': "author", b'Description': "description",
+                 b'Copyright': "copyright", b'Software': "software"}
+
+
+def _jpeg_segments(f):
+    """Devuelve [(tipo, bytes)] de los segmentos EXIF, XMP e IPTC de un JPEG"""
+    segments = []
+    f.seek(2)
+    while True:
+        header = f.read(2)
+        if len(header) < 2 or header[0] != 0xFF:
+            break
+        marker = header[1]
+        while marker == 0xFF:
+            byte = f.read(1)
+            if not byte:
+                return segments
+            marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue
+        if marker in (0xD9, 0xDA):
+            # Fin de imagen o inicio de los datos comprimidos
+            break
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            break
+        length = struct.unpack('>H', length_bytes)[0] - 2
+        if length < 0:
+            break
+        if marker == 0xE1:
+            data = f.read(length)
+            if data.startswith(b'Exif\x00'):
+                segments.append(("exif", data[6:]))
+            elif data.startswith(XMP_JPEG_HEADER):
+                segments.append(("xmp", data[len(XMP_JPEG_HEADER):]))
+        elif marker == 0xED:
+            data = f.read(length)
+            if data.startswith(b'Photoshop 3.0\x00'):
+                segments.append(("iptc", data[14:]))
+        else:
+            f.seek(length, os.SEEK_CUR)
+    return segments
+
+
+def _png_segments(f):
+    """Devuelve [(tipo, bytes)] de los bloques de metadatos de un PNG"""
+    segments = []
+    f.seek(8)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+        if chunk_type == b'eXIf':
+            segments.append(("exif", f.read(length)))
+            f.seek(4, os.SEEK_CUR)
+        elif chunk_type in (b'iTXt', b'tEXt'):
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)
+            keyword, _, rest = data.partition(b'\x00')
+            if chunk_type == b'iTXt':
+                # Compresión, método, idioma y clave traducida antes del texto
+                compressed = rest[:1] == b'\x01'
+                parts = rest[2:].split(b'\x00', 2)
+                if compressed or len(parts) < 3:
+                    continue
+                rest = parts[2]
+            if keyword == XMP_PNG_KEYWORD:
+                segments.append(("xmp", rest))
+            elif keyword in PNG_TEXT_KEYS:
+                segments.append(("text", (PNG_TEXT_KEYS[keyword], _decode_text(rest))))
+        else:
+            f.seek(length + 4, os.SEEK_CUR)
+    return segments
+
+
+def read_segments(path):
+    """Segmentos de metadatos de la imagen; lista vacía si el formato no tiene lector"""
+    with open(path, 'rb') as f:
+        head = f.read(8)
+        if head.startswith(b'\xff\xd8'):
+            return _jpeg_segments(f)
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            return _png_segments(f)
+    return []
+
+
+# ---------- Sección del registro ----------
+
+def build_section(segments):
+    """Combina los segmentos leídos en la sección embedded_metadata"""
+    exif, gps, iptc, xmp, text = {}, {}, {}, {}, {}
+    sources = []
+    for kind, data in segments:
+        try:
+            if kind == "exif":
+                exif, gps = parse_tiff(data)
+                found = exif or gps
+            elif kind == "xmp":
+                xmp = found = parse_xmp(data)
+            elif kind == "iptc":
+                iptc = found = parse_photoshop(data)
+            else:
+                found = data[1]
+                text.setdefault(data[0], data[1])
+                kind = "png_text"
+        except (struct.error, ValueError, IndexError, TypeError, KeyError):
+            continue
+        if found and kind not in sources:
+            sources.append(kind)
+
+    section = {}
+    # Campos descriptivos: XMP, IPTC (o texto PNG) y EXIF
+    descriptive = (
+        ("title", (xmp.get("title"), iptc.get("title"), text.get("title"), _xp_text(exif.get("xp_title")))),
+        ("author", (xmp.get("author"), iptc.get("author"), text.get("author"), _text(exif.get("artist")),
+                    _xp_text(exif.get("xp_author")))),
+        ("description", (xmp.get("description"), iptc.get("description"), text.get("description"),
+                         _text(exif.get("description")), _xp_text(exif.get("xp_subject")),
+                         _xp_text(exif.get("xp_comment")))),
+        ("copyright", (xmp.get("copyright"), iptc.get("copyright"), text.get("copyright"),
+                       _text(exif.get("copyright")))),
+    )
+    for field, candidates in descriptive:
+        value = next((candidate for candidate in candidates if candidate), None)
+        if value:
+            section[field] = value
+
+    xp_keywords = _xp_text(exif.get("xp_keywords"))
+    keywords = xmp.get("keywords") or iptc.get("keywords") or (
+        [word.strip() for word in xp_keywords.split(";") if word.strip()] if xp_keywords else None)
+    if keywords:
+        section["keywords"] = keywords
+    if "rating" in xmp:
+        section["rating"] = xmp["rating"]
+
+    capture_date = _exif_date(exif.get("capture_date")) or _exif_date(exif.get("digitized_date")) \
+        or xmp.get("capture_date") or iptc.get("date")
+    if capture_date:
+        section["capture_date"] = capture_date
+        if _text(exif.get("offset_time")):
+            section["capture_offset"] = exif["offset_time"]
+    if _integer(exif.get("orientation")) is not None:
+        section["orientation"] = exif["orientation"]
+    software = _text(exif.get("software")) or text.get("software")
+    if software:
+        section["software"] = software
+
+    camera = {key: exif[source] for key, source in
+              (("make", "make"), ("model", "model"), ("lens_make", "lens_make"), ("lens", "lens_model"))
+              if _text(exif.get(source))}
+    if camera:
+        section["camera"] = camera
+
+    exposure = {}
+    exposure_text, exposure_seconds = _exposure_time(exif.get("exposure_time"))
+    if exposure_text:
+        exposure["exposure_time"] = exposure_text
+        exposure["exposure_seconds"] = exposure_seconds
+    for key in ("f_number", "focal_length", "exposure_bias"):
+        value = _rational(exif.get(key))
+        if value is not None:
+            exposure[key] = round(value, 2)
+    iso = exif.get("iso")
+    if isinstance(iso, list):
+        iso = iso[0] if iso else None
+    if _integer(iso):
+        exposure["iso"] = iso
+    if _integer(exif.get("focal_length_35mm")):
+        exposure["focal_length_35mm"] = exif["focal_length_35mm"]
+    if _integer(exif.get("flash")) is not None:
+        exposure["flash"] = bool(exif["flash"] & 0x01)
+    if _integer(exif.get("exposure_program")) in EXPOSURE_PROGRAMS:
+        exposure["program"] = EXPOSURE_PROGRAMS[exif["exposure_program"]]
+    if _integer(exif.get("metering_mode")) in METERING_MODES:
+        exposure["metering"] = METERING_MODES[exif["metering_mode"]]
+    if _integer(exif.get("white_balance")) is not None:
+        exposure["white_balance"] = "Manual" if exif["white_balance"] else "Automático"
+    if exposure:
+        section["exposure"] = exposure
+
+    latitude = _gps_coordinate(gps.get("latitude"), gps.get("latitude_ref"))
+    longitude = _gps_coordinate(gps.get("longitude"), gps.get("longitude_ref"))
+    if latitude is not None and longitude is not None:
+        section["gps"] = {"latitude": latitude, "longitude": longitude}
+        altitude = _rational(gps.get("altitude"))
+        if altitude is not None:
+            below = gps.get("altitude_ref") in (b'\x01', 1)
+            section["gps"]["altitude"] = round(-altitude if below else altitude, 2)
+
+    if sources:
+        section["sources"] = sources
+    return section
+
+
+def read_embedded(path):
+    """
+    Sección embedded_metadata de una imagen (diccionario vacío si no trae
+    metadatos incrustados o el formato no tiene lector).
+    """
+    try:
+        segments = read_segments(path)
+    except (OSError, struct.error, ValueError):
+        return {}
+    try:
+        return build_section(segments)
+    except Exception as e:
+        # Un valor inesperado en un archivo dañado no debe impedir el resto de la extracción
+        print(f"Metadatos incrustados ilegibles en {path}: {e}")
+        return {}
@@ -0,0 +1,88 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QLabel, QLineEdit,
+                             QComboBox, QDoubleSpinBox, QCheckBox, QDialogButtonBox)
+from PyQt5.QtGui import QFont
+from metadata_export import available_formats, record_filter
+
+
+class ExportDialog(QDialog):
+    """Opciones de exportación: formato, campos y filtro de imágenes"""
+
+    FORMAT_LABELS = {
+        "json": "JSON (*.json)",
+        "jsonl": "JSON Lines (*.jsonl)",
+        "csv": "CSV (*.csv)",
+        "parquet": "Parquet (*.parquet)"
+    }
+
+    ORIENTATIONS = ("Horizontal (Landscape)", "Vertical (Portrait)", "Cuadrado (Square)")
+
+    def __init__(self, extensions, parent=None):
+        super().__init__(parent)
+        self.extensions = sorted(extensions)
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle("📤 Exportar")
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        title = QLabel("📤 Exportar Metadatos")
+        title.setFont(QFont("Segoe UI", 16, QFont.Bold))
+        title.setStyleSheet("color: #667eea; padding: 10px;")
+        layout.addWidget(title)
+
+        form = QFormLayout()
+        self.format_input = QComboBox()
+        for name in available_formats():
+            self.format_input.addItem(self.FORMAT_LABELS[name], name)
+        form.addRow("Formato:", self.format_input)
+
+        self.fields_input = QLineEdit()
+        self.fields_input.setPlaceholderText("Todos (ej: file_info.filename, image_dimensions, file_size.bytes)")
+        form.addRow("Campos:", self.fields_input)
+
+        self.extension_input = QComboBox()
+        self.extension_input.addItem("Todas", None)
+        for extension in self.extensions:
+            self.extension_input.addItem(extension, extension)
+        form.addRow("Extensión:", self.extension_input)
+
+        self.orientation_input = QComboBox()
+        self.orientation_input.addItem("Todas", None)
+        for orientation in self.ORIENTATIONS:
+            self.orientation_input.addItem(orientation, orientation)
+        form.addRow("Orientación:", self.orientation_input)
+
+        self.megapixels_input = QDoubleSpinBox()
+        self.megapixels_input.setRange(0, 1000)
+        self.megapixels_input.setSuffix(" MP")
+        form.addRow("Megapíxeles mínimos:", self.megapixels_input)
+
+        self.stale_input = QCheckBox("Incluir imágenes que ya no existen")
+        self.stale_input.setChecked(True)
+        form.addRow("", self.stale_input)
+        layout.addLayout(form)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def export_format(self):
+        return self.format_input.currentData()
+
+    def file_filter(self):
+        return self.FORMAT_LABELS[self.export_format()]
+
+    def fields(self):
+        """Campos seleccionados, o None para exportar los registros completos"""
+        fields = [field.strip() for field in self.fields_input.text().split(",") if field.strip()]
+        return fields or None
+
+    def record_filter(self):
+        return record_filter(
+            extension=self.extension_input.currentData(),
+            orientation=self.orientation_input.currentData(),
+            min_megapixels=self.megapixels_input.value() or None,
+            include_stale=self.stale_input.isChecked()
+        )
@@ -0,0 +1,101 @@
+"""
+Hash de contenido de los archivos de imagen.
+
+Lee los archivos con un búfer grande y reutilizable (o con mmap) para que el
+bucle de Python haga pocas llamadas. hashlib libera el GIL al procesar
+bloques grandes, así que varios archivos se pueden calcular en paralelo con
+hilos.
+
+Algoritmos disponibles: md5 (compatibilidad con las bases existentes),
+sha256, blake2b y, si está instalado el paquete xxhash, xxh3_64/xxh64
+(no criptográficos, mucho más rápidos).
+"""
+import os
+import mmap
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from perf_trace import span
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+DEFAULT_ALGORITHM = "md5"
+
+# Tamaño del búfer de lectura (1 MiB)
+BUFFER_SIZE = 1024 * 1024
+
+# A partir de este tamaño se usa mmap en lugar de lecturas con búfer
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+_HASHLIB_ALGORITHMS = {
+    "md5": hashlib.md5,
+    "sha256": hashlib.sha256,
+    "blake2b": hashlib.blake2b,
+}
+
+
+def available_algorithms():
+    """Algoritmos de hash que se pueden usar en este equipo"""
+    algorithms = list(_HASHLIB_ALGORITHMS)
+    if xxhash is not None:
+        algorithms += ["xxh3_64", "xxh64"]
+    return algorithms
+
+
+def new_hasher(algorithm=DEFAULT_ALGORITHM):
+    """Crea el objeto de hash del algoritmo indicado"""
+    if algorithm in _HASHLIB_ALGORITHMS:
+        return _HASHLIB_ALGORITHMS[algorithm]()
+    if xxhash is not None and algorithm == "xxh3_64":
+        return xxhash.xxh3_64()
+    if xxhash is not None and algorithm == "xxh64":
+        return xxhash.xxh64()
+    raise ValueError(f"Algoritmo de hash no disponible: {algorithm}")
+
+
+def hash_file(path, algorithm=DEFAULT_ALGORITHM, buffer_size=BUFFER_SIZE):
+    """Devuelve el hash hexadecimal del contenido del archivo"""
+    hasher = new_hasher(algorithm)
+    with span("hash", algorithm=algorithm) as timing, open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        timing.set(bytes=size)
+        if size >= MMAP_THRESHOLD:
+            # Una sola llamada sobre el archivo mapeado en memoria
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+        else:
+            # Búfer reutilizable: readinto no crea un objeto bytes por bloque
+            buffer = bytearray(buffer_size)
+            view = memoryview(buffer)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                hasher.update(view[:read])
+    return hasher.hexdigest()
+
+
+def hash_files(paths, algorithm=DEFAULT_ALGORITHM, max_workers=None):
+    """
+    Calcula el hash de varios archivos en paralelo con hilos.
+    Devuelve un diccionario ruta -> hash (None si el archivo no se pudo leer).
+    """
+    def safe_hash(path):
+        try:
+            return hash_file(path, algorithm)
+        except OSError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 1) * 2)) as executor:
+        return dict(zip(paths, executor.map(safe_hash, paths)))
+
+
+def stored_hash(metadata):
+    """Devuelve (algoritmo, hash) guardados en los metadatos de una imagen"""
+    system_info = metadata.get('system_info', {})
+    if system_info.get('file_hash'):
+        return system_info.get('hash_algorithm', DEFAULT_ALGORITHM), system_info['file_hash']
+    return "md5", system_info.get('file_hash_md5')
@@ -0,0 +1,116 @@
+"""
+Vigilancia de carpetas para mantener el catálogo al día sin recorrer todo el árbol.
+
+FolderWatcher vigila las carpetas raíz elegidas y todas sus subcarpetas
+(altas, bajas y renombrados de archivos) y las imágenes catalogadas dentro
+de ellas (modificaciones). Los avisos del sistema se acumulan durante
+settings.watch_delay_ms, de modo que copiar cien archivos o guardar una
+imagen varias veces produce un solo lote, y la señal changed entrega las
+carpetas y archivos afectados para revisar solo esos (batch_ingest.sync_changes).
+"""
+import os
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+# Espera por defecto desde el último aviso antes de procesar un lote (ms)
+DEFAULT_WATCH_DELAY = 1000
+
+
+def list_watch_paths(roots, catalogued):
+    """
+    Carpetas raíz con todas sus subcarpetas y las imágenes catalogadas que
+    existen dentro de ellas: lo que hay que vigilar (recorre el disco, se
+    ejecuta en segundo plano).
+    """
+    directories = []
+    for root in roots:
+        for directory, _subdirs, _files in os.walk(root):
+            directories.append(directory.replace(os.sep, '/'))
+    files = [path for path in catalogued if is_under(path, roots) and os.path.isfile(path)]
+    return directories, files
+
+
+def is_under(path, roots):
+    """Indica si path está dentro de alguna de las carpetas raíz"""
+    return any(path == root or path.startswith(root.rstrip('/') + '/') for root in roots)
+
+
+class FolderWatcher(QObject):
+    # (carpetas, archivos) que cambiaron desde el último lote
+    changed = pyqtSignal(set, set)
+
+    def __init__(self, delay=DEFAULT_WATCH_DELAY, parent=None):
+        super().__init__(parent)
+        self.delay = delay
+        self.roots = []
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.changed_directories = set()
+        self.changed_files = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def add_root(self, root):
+        """Empieza a vigilar una carpeta raíz (sus subcarpetas se añaden con add_directories)"""
+        root = root.replace(os.sep, '/').rstrip('/') or '/'
+        if root not in self.roots:
+            self.roots.append(root)
+        return root
+
+    def remove_root(self, root):
+        """Deja de vigilar una carpeta raíz con sus subcarpetas y archivos"""
+        if root in self.roots:
+            self.roots.remove(root)
+        watched = [path for path in self.watcher.directories() + self.watcher.files()
+                   if is_under(path, [root]) and not is_under(path, self.roots)]
+        if watched:
+            self.watcher.removePaths(watched)
+
+    def directories(self):
+        return set(self.watcher.directories())
+
+    def add_directories(self, directories):
+        known = self.directories()
+        directories = [directory for directory in directories if directory not in known]
+        if directories:
+            self.watcher.addPaths(directories)
+
+    def add_files(self, files):
+        """Vigila archivos que existen (los que se borran dejan de vigilarse solos)"""
+        known = set(self.watcher.files())
+        files = [path for path in files if path not in known and is_under(path, self.roots)]
+        if files:
+            self.watcher.addPaths(files)
+
+    def remove_files(self, files):
+        known = set(self.watcher.files())
+        files = [path for path in files if path in known]
+        if files:
+            self.watcher.removePaths(files)
+
+    def on_directory_changed(self, directory):
+        self.changed_directories.add(directory)
+        self.schedule()
+
+    def on_file_changed(self, path):
+        self.changed_files.add(path)
+        self.schedule()
+
+    def schedule(self):
+        # La espera cuenta desde el primer aviso del lote: una copia larga
+        # produce un lote cada delay ms y no retrasa el catálogo indefinidamente
+        if not self.timer.isActive():
+            self.timer.start(self.delay)
+
+    def has_changes(self):
+        return bool(self.changed_directories or self.changed_files)
+
+    def flush(self):
+        """Entrega el lote acumulado"""
+        self.timer.stop()
+        if not self.has_changes():
+            return
+        directories, files = self.changed_directories, self.changed_files
+        self.changed_directories, self.changed_files = set(), set()
+        self.changed.emit(directories, files)
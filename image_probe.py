@@ -0,0 +1,247 @@
+"""
+Lectura de propiedades de imagen a partir de las cabeceras del archivo.
+
+Para generar los metadatos solo se necesitan ancho, alto, profundidad de
+color, canal alfa y formato. Estos datos están en las primeras cabeceras
+del archivo (IHDR en PNG, marcadores SOFn en JPEG, cabecera DIB en BMP y
+descriptor lógico de pantalla en GIF), así que no hace falta decodificar
+los píxeles. Solo si ninguna cabecera se reconoce se decodifica la imagen
+con Qt como último recurso.
+
+Los lectores son intercambiables: cada uno se registra con una función que
+reconoce la firma del archivo y otra que lee la cabecera.
+"""
+import os
+import struct
+from perf_trace import span
+
+
+# Bytes iniciales que se leen para reconocer la firma del archivo
+SIGNATURE_BYTES = 32
+
+# Lectores registrados: lista de (formato, reconoce(cabecera), lee(archivo, cabecera))
+PROBES = []
+
+
+def register_probe(image_format, matches, parse):
+    """Registra un lector de cabeceras para un formato de imagen"""
+    PROBES.append((image_format, matches, parse))
+
+
+def probe_image(path, fallback=True):
+    """
+    Devuelve un diccionario con width, height, bits_per_pixel, has_alpha y
+    format leyendo solo las cabeceras. Si no se reconoce ninguna cabecera y
+    fallback es True, decodifica la imagen con Qt. Devuelve None si no se
+    pudo leer la imagen.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SIGNATURE_BYTES)
+            for image_format, matches, parse in PROBES:
+                if not matches(head):
+                    continue
+                f.seek(0)
+                try:
+                    info = parse(f, head)
+                except (struct.error, ValueError):
+                    info = None
+                if info and info["width"] > 0 and info["height"] > 0:
+                    info["format"] = image_format
+                    return info
+    except OSError:
+        return None
+
+    if fallback:
+        return decode_fallback(path)
+    return None
+
+
+def decode_fallback(path):
+    """Obtiene las propiedades decodificando la imagen completa con Qt"""
+    # Importación tardía: los lectores de cabeceras no necesitan Qt
+    from PyQt5.QtGui import QImage
+
+    with span("decode"):
+        image = QImage(path)
+    if image.isNull():
+        return None
+    return {
+        "width": image.width(),
+        "height": image.height(),
+        "bits_per_pixel": image.depth(),
+        "has_alpha": image.hasAlphaChannel(),
+        "format": os.path.splitext(path)[1].upper().replace('.', '') or "UNKNOWN"
+    }
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Cabecera truncada")
+    return data
+
+
+# ---------- PNG ----------
+
+# Canales por tipo de color de PNG (el tipo 3 usa paleta)
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _png_matches(head):
+    return head.startswith(b'\x89PNG\r\n\x1a\n')
+
+
+def _parse_png(f, head):
+    f.seek(8)
+    length, chunk_type = struct.unpack('>I4s', _read_exact(f, 8))
+    if chunk_type != b'IHDR' or length < 13:
+        raise ValueError("PNG sin IHDR")
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', _read_exact(f, 10))
+    if color_type not in PNG_CHANNELS:
+        raise ValueError("Tipo de color PNG desconocido")
+
+    has_alpha = color_type in (4, 6)
+    if not has_alpha:
+        # La transparencia de paleta o gris viene en un bloque tRNS antes de IDAT;
+        # se recorren solo las cabeceras de los bloques
+        f.seek(8 + 8 + length + 4)
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                break
+            chunk_length, chunk_type = struct.unpack('>I4s', chunk_header)
+            if chunk_type == b'tRNS':
+                has_alpha = True
+                break
+            if chunk_type in (b'IDAT', b'IEND'):
+                break
+            f.seek(chunk_length + 4, os.SEEK_CUR)
+
+    return {
+        "width": width,
+        "height": height,
+        "bits_per_pixel": bit_depth * PNG_CHANNELS[color_type],
+        "has_alpha": has_alpha
+    }
+
+
+# ---------- JPEG ----------
+
+# Marcadores SOFn (C0-CF salvo DHT, JPG y DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Marcadores sin longitud: TEM, RSTn, SOI
+JPEG_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD9))
+
+
+def _jpeg_matches(head):
+    return head.startswith(b'\xff\xd8')
+
+
+def _parse_jpeg(f, head):
+    f.seek(2)
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b'\xff':
+            raise ValueError("Flujo de marcadores JPEG inválido")
+        marker = _read_exact(f, 1)[0]
+        # Bytes de relleno 0xFF entre marcadores
+        while marker == 0xFF:
+            marker = _read_exact(f, 1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            # EOI o inicio de datos sin haber encontrado SOF
+            raise ValueError("JPEG sin marcador SOF")
+        segment_length = struct.unpack('>H', _read_exact(f, 2))[0]
+        if marker in JPEG_SOF_MARKERS:
+            precision, height, width, components = struct.unpack('>BHHB', _read_exact(f, 6))
+            return {
+                "width": width,
+                "height": height,
+                "bits_per_pixel": precision * components,
+                "has_alpha": False
+            }
+        # Saltar el segmento completo (APPn, DQT, DHT...) sin leerlo
+        f.seek(segment_length - 2, os.SEEK_CUR)
+
+
+# ---------- BMP ----------
+
+def _bmp_matches(head):
+    return head.startswith(b'BM')
+
+
+def _parse_bmp(f, head):
+    f.seek(14)
+    dib_size = struct.unpack('<I', _read_exact(f, 4))[0]
+    if dib_size == 12:
+        # BITMAPCOREHEADER (OS/2)
+        width, height, _planes, bits = struct.unpack('<HHHH', _read_exact(f, 8))
+        return {"width": width, "height": height, "bits_per_pixel": bits, "has_alpha": False}
+
+    width, height, _planes, bits, compression = struct.unpack('<iiHHI', _read_exact(f, 16))
+    has_alpha = False
+    if bits == 32 and dib_size >= 56:
+        # Máscara alfa de BITMAPV3INFOHEADER o posteriores
+        f.seek(14 + 52)
+        has_alpha = struct.unpack('<I', _read_exact(f, 4))[0] != 0
+    return {
+        "width": abs(width),
+        # Altura negativa indica filas de arriba hacia abajo
+        "height": abs(height),
+        "bits_per_pixel": bits,
+        "has_alpha": has_alpha
+    }
+
+
+# ---------- GIF ----------
+
+def _gif_matches(head):
+    return head[:6] in (b'GIF87a', b'GIF89a')
+
+
+def _skip_gif_sub_blocks(f):
+    while True:
+        size = _read_exact(f, 1)[0]
+        if size == 0:
+            return
+        f.seek(size, os.SEEK_CUR)
+
+
+def _parse_gif(f, head):
+    f.seek(6)
+    width, height, packed = struct.unpack('<HHB', _read_exact(f, 5))
+    f.seek(2, os.SEEK_CUR)
+    if packed & 0x80:
+        # Saltar la tabla global de colores
+        f.seek(3 * (2 << (packed & 0x07)), os.SEEK_CUR)
+
+    # La transparencia se declara en la extensión de control gráfico
+    # que precede al primer descriptor de imagen
+    has_alpha = False
+    while True:
+        introducer = f.read(1)
+        if introducer != b'\x21':
+            break
+        label = _read_exact(f, 1)[0]
+        if label == 0xF9:
+            block = _read_exact(f, 5)
+            has_alpha = bool(block[1] & 0x01)
+            _skip_gif_sub_blocks(f)
+            break
+        _skip_gif_sub_blocks(f)
+
+    return {
+        "width": width,
+        "height": height,
+        # GIF usa paleta: bits por píxel según el tamaño de la tabla de colores
+        "bits_per_pixel": (packed & 0x07) + 1 if packed & 0x80 else 8,
+        "has_alpha": has_alpha
+    }
+
+
+register_probe("PNG", _png_matches, _parse_png)
+register_probe("JPEG", _jpeg_matches, _parse_jpeg)
+register_probe("BMP", _bmp_matches, _parse_bmp)
+register_probe("GIF", _gif_matches, _parse_gif)
@@ -0,0 +1,278 @@
+"""
+Backups incrementales y deduplicados de la base de datos de metadatos.
+
+Cada registro de imagen se guarda comprimido en backups/objects/ con el
+hash de su contenido como nombre, así que un registro que no cambió nunca se
+vuelve a escribir. Cada backup es un manifiesto en backups/manifests/:
+
+- "full": todas las rutas con el hash de su registro.
+- "delta": solo las rutas que cambiaron o se eliminaron desde el manifiesto
+  anterior de la cadena.
+
+Restaurar un momento consiste en tomar el último manifiesto completo
+anterior a esa fecha y aplicar los deltas siguientes hasta ella.
+
+Los backups no se hacen en cada guardado sino según la política de
+settings.backup_policy (cada N cambios o cada cierto tiempo). Los cambios
+pendientes solo están en memoria; el primero después de un backup deja el
+archivo backups/pending_changes, que se borra al hacer el siguiente. Si el
+proceso termina sin hacerlo, al volver a abrir la base se encuentra el
+archivo y el próximo backup es completo, de modo que ningún delta omite
+cambios perdidos.
+
+pack/unpack permiten guardar los registros en otro formato (el almacén usa
+el formato compacto) y recuperarlos completos al restaurar.
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+from datetime import datetime
+from perf_trace import span
+
+
+DEFAULT_POLICY = {
+    # Hacer backup al acumular esta cantidad de cambios...
+    "every_n_changes": 50,
+    # ...o si pasó este tiempo desde el último y hay cambios pendientes
+    "min_interval_seconds": 600,
+    # Deltas entre dos backups completos
+    "full_every": 20,
+    # Cadenas (backup completo + sus deltas) que se conservan
+    "keep_full": 5
+}
+
+MANIFEST_PREFIX = "metadata_backup_"
+
+
+def record_digest(metadata):
+    """Serializa un registro de forma canónica y devuelve (hash, bytes)"""
+    data = json.dumps(metadata, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(data).hexdigest(), data
+
+
+class IncrementalBackup:
+    def __init__(self, backup_dir="backups", pack=None, unpack=None):
+        self.backup_dir = backup_dir
+        self.pack = pack or (lambda metadata: metadata)
+        self.unpack = unpack or (lambda path, record: record)
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.manifests_dir = os.path.join(backup_dir, "manifests")
+        self.pending_file = os.path.join(backup_dir, "pending_changes")
+        # Cambios pendientes desde el último backup
+        self.changed = set()
+        self.removed = set()
+        # Una sesión anterior terminó con cambios sin backup: los deltas no los conocen
+        self.marked = os.path.exists(self.pending_file)
+        self.needs_full = self.marked
+        self.last_backup_time = time.monotonic()
+
+    # ---------- Registro de cambios ----------
+
+    def note_changes(self, changed=(), removed=()):
+        for path in changed:
+            self.changed.add(path)
+            self.removed.discard(path)
+        for path in removed:
+            self.removed.add(path)
+            self.changed.discard(path)
+        if self.changed or self.removed:
+            self._mark_pending()
+
+    def note_reset(self):
+        """La base se reemplazó completa: el próximo backup será completo"""
+        self.needs_full = True
+        self._mark_pending()
+
+    def _mark_pending(self):
+        """Deja constancia en disco de que hay cambios sin backup (una vez por backup)"""
+        if self.marked:
+            return
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            with open(self.pending_file, 'w', encoding='utf-8') as f:
+                f.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            self.marked = True
+        except OSError as e:
+            print(f"Error al registrar cambios pendientes de backup: {e}")
+
+    def _clear_pending(self):
+        if not self.marked:
+            return
+        try:
+            os.remove(self.pending_file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error al borrar el registro de cambios pendientes: {e}")
+            return
+        self.marked = False
+
+    def pending(self):
+        return len(self.changed) + len(self.removed) + (1 if self.needs_full else 0)
+
+    def after_change(self, images, header, changed=(), removed=()):
+        """Registra cambios y hace backup si la política de settings lo indica"""
+        self.note_changes(changed, removed)
+        settings = header.get('settings', {})
+        if not settings.get('auto_backup', True):
+            return None
+        policy = dict(DEFAULT_POLICY, **settings.get('backup_policy', {}))
+        elapsed = time.monotonic() - self.last_backup_time
+        if self.pending() >= policy['every_n_changes'] or (
+                self.pending() and elapsed >= policy['min_interval_seconds']):
+            return self.backup(images, header, policy)
+        return None
+
+    # ---------- Creación ----------
+
+    def backup(self, images, header, policy=None):
+        """Crea un backup (delta o completo) y devuelve el nombre del manifiesto"""
+        with span("backup") as timing:
+            name = self._backup(images, header, policy)
+            timing.set(manifest=name)
+        return name
+
+    def _backup(self, images, header, policy):
+        policy = dict(DEFAULT_POLICY, **(policy or {}))
+        try:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            os.makedirs(self.manifests_dir, exist_ok=True)
+
+            manifests = self.list_manifests()
+            previous = self.read_manifest(manifests[-1]) if manifests else None
+            chain_length = previous.get('chain_length', 0) + 1 if previous else 0
+            full = previous is None or self.needs_full or chain_length > policy['full_every']
+
+            manifest = {
+                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "header": {k: v for k, v in header.items() if k != 'images'},
+                "total_images": len(images)
+            }
+            if full:
+                manifest["type"] = "full"
+                manifest["chain_length"] = 0
+                manifest["records"] = {path: self.store_object(metadata) for path, metadata in images.items()}
+            else:
+                manifest["type"] = "delta"
+                manifest["base"] = manifests[-1]
+                manifest["chain_length"] = chain_length
+                manifest["changed"] = {
+                    path: self.store_object(images[path]) for path in self.changed if path in images
+                }
+                manifest["removed"] = sorted(self.removed)
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            name = f"{MANIFEST_PREFIX}{timestamp}.{manifest['type']}.json.gz"
+            self._write_gzip(os.path.join(self.manifests_dir, name),
+                             json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+
+            self.changed.clear()
+            self.removed.clear()
+            self.needs_full = False
+            self.last_backup_time = time.monotonic()
+            self._clear_pending()
+
+            if full:
+                self.cleanup(policy['keep_full'])
+            return name
+        except Exception as e:
+            print(f"Error al crear backup: {e}")
+            return None
+
+    def store_object(self, metadata):
+        """Guarda un registro comprimido si no existe ya y devuelve su hash"""
+        digest, data = record_digest(self.pack(metadata))
+        object_file = self._object_path(digest)
+        if not os.path.exists(object_file):
+            os.makedirs(os.path.dirname(object_file), exist_ok=True)
+            self._write_gzip(object_file, data)
+        return digest
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:] + ".json.gz")
+
+    def _write_gzip(self, target, data):
+        # Escritura atómica: un backup interrumpido no deja archivos a medias
+        temp_file = target + ".tmp"
+        with gzip.open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, target)
+
+    # ---------- Lectura y restauración ----------
+
+    def list_manifests(self):
+        """Nombres de los manifiestos, del más antiguo al más reciente"""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return sorted(f for f in os.listdir(self.manifests_dir)
+                      if f.startswith(MANIFEST_PREFIX) and f.endswith(".json.gz"))
+
+    def read_manifest(self, name):
+        with gzip.open(os.path.join(self.manifests_dir, name), 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def read_object(self, digest):
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def resolve(self, until=None):
+        """
+        Devuelve (header, {ruta: hash}) del estado en el último backup con
+        fecha menor o igual a until ("YYYYMMDD_HHMMSS"); sin until, el último.
+        """
+        manifests = self.list_manifests()
+        if until is not None:
+            manifests = [m for m in manifests if m[len(MANIFEST_PREFIX):][:len(until)] <= until]
+        if not manifests:
+            return None, None
+
+        # Retroceder hasta el backup completo de la cadena
+        chain = []
+        for name in reversed(manifests):
+            manifest = self.read_manifest(name)
+            chain.append(manifest)
+            if manifest['type'] == 'full':
+                break
+        else:
+            raise ValueError("No hay backup completo para restaurar")
+
+        chain.reverse()
+        records = dict(chain[0]['records'])
+        for delta in chain[1:]:
+            records.update(delta['changed'])
+            for path in delta['removed']:
+                records.pop(path, None)
+        return chain[-1]['header'], records
+
+    def restore(self, until=None):
+        """Devuelve (header, images) tal como estaban en el backup indicado"""
+        header, records = self.resolve(until)
+        if records is None:
+            return None, None
+        return header, {path: self.unpack(path, self.read_object(digest)) for path, digest in records.items()}
+
+    # ---------- Limpieza ----------
+
+    def cleanup(self, keep_full):
+        """Elimina las cadenas antiguas y los objetos que ya nadie referencia"""
+        manifests = self.list_manifests()
+        full_positions = [i for i, name in enumerate(manifests) if ".full." in name]
+        if len(full_positions) <= keep_full:
+            return
+        first_kept = full_positions[-keep_full]
+        for name in manifests[:first_kept]:
+            os.remove(os.path.join(self.manifests_dir, name))
+
+        referenced = set()
+        for name in manifests[first_kept:]:
+            manifest = self.read_manifest(name)
+            referenced.update(manifest.get('records', {}).values())
+            referenced.update(manifest.get('changed', {}).values())
+
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for object_name in os.listdir(prefix_dir):
+                if prefix + object_name[:-len(".json.gz")] not in referenced:
+                    os.remove(os.path.join(prefix_dir, object_name))
@@ -0,0 +1,461 @@
+"""
+Línea de comandos sin interfaz gráfica (no importa PyQt5).
+
+    python -m metadata_cli scan C:\\ruta\\fotos [--db image_metadata.json] [--workers 8]
+    python -m metadata_cli scan fotos/ --stdout | jq .file_size.bytes
+    python -m metadata_cli scan --refresh
+    python -m metadata_cli show C:\\ruta\\fotos\\paisaje.jpg
+    python -m metadata_cli search ext:png orientacion:vertical mp>10 modificada>30d
+    python -m metadata_cli export catalogo.csv --fields file_info.filename,file_size.bytes
+    python -m metadata_cli verify
+    python -m metadata_cli backups [--restore YYYYMMDD_HHMMSS]
+
+- scan genera los metadatos de carpetas o archivos en un pool de procesos.
+  Por defecto guarda en la base solo las imágenes nuevas o modificadas (con
+  una sola escritura); con --stdout no usa la base y escribe una línea JSON
+  por imagen a medida que terminan, para encadenar con otros programas.
+- show muestra los metadatos guardados de una o varias imágenes (o los
+  genera si no están en la base).
+- search busca en la base con la misma sintaxis que la barra de búsqueda
+  de la aplicación (una ruta por línea, o los conteos de cada faceta).
+- export exporta la base (formato según la extensión del archivo).
+- verify recalcula el hash de las imágenes guardadas y avisa de las que
+  cambiaron o ya no existen (código de salida 1).
+- backups lista los backups o restaura uno.
+
+El progreso y los errores se escriben en stderr, así que stdout solo lleva
+datos. Las PyQt5 solo se cargan si alguna imagen necesita decodificarse
+(formato sin lector de cabeceras, --perceptual o --pixel-stats).
+"""
+import os
+import sys
+import json
+import argparse
+from metadata_store import open_store
+from metadata_extractor import build_metadata, extraction_options
+from metadata_export import export_records, pick_fields
+from batch_ingest import (find_images, iter_extract, extract_many, select_changed, refresh_records,
+                          is_stale, IMAGE_EXTENSIONS)
+from catalog_eviction import enforce_limit, ViewLog, views_file_for
+from duplicate_index import DuplicateIndex
+from catalog_search import SearchIndex, FACETS, parse_query
+from file_hashing import available_algorithms, hash_files, stored_hash
+import perf_trace
+
+
+# ---------- Opciones comunes ----------
+
+def add_trace_arguments(parser):
+    parser.add_argument("--trace", metavar="ARCHIVO",
+                        help="Guardar al terminar una traza de tiempos en formato Chrome (chrome://tracing)")
+    parser.add_argument("--trace-log", metavar="ARCHIVO",
+                        help="Registrar el tiempo de cada operación como una línea JSON")
+
+
+def start_tracing(args):
+    if args.trace_log:
+        perf_trace.enable_log(args.trace_log)
+
+
+def finish_tracing(args):
+    if args.trace:
+        try:
+            count = perf_trace.write_chrome_trace(args.trace)
+            print(f"Traza con {count} eventos guardada en {args.trace}", file=sys.stderr)
+        except OSError as e:
+            print(f"Error al guardar la traza: {e}", file=sys.stderr)
+
+
+def progress_printer(quiet=False):
+    """Función de progreso que escribe en stderr (o None con quiet)"""
+    if quiet:
+        return None
+
+    def report_progress(done, total):
+        print(f"\r{done}/{total} imágenes procesadas", end="", file=sys.stderr, flush=True)
+    return report_progress
+
+
+def end_progress(progress):
+    if progress is not None:
+        print(file=sys.stderr)
+
+
+def normalize_path(path):
+    """Ruta absoluta con la misma convención de separadores que la base"""
+    return os.path.abspath(path).replace(os.sep, '/')
+
+
+def key_finder(index):
+    """
+    Función que da la clave con la que está guardada una imagen en index, o
+    None. scan guarda rutas absolutas y --batch las guarda tal como se indicó
+    la carpeta, así que también se buscan las claves relativas que apuntan
+    al mismo archivo ("fotos/a.jpg" para "./fotos/a.jpg" o la ruta absoluta).
+    """
+    relative = None
+
+    def find(target):
+        nonlocal relative
+        absolute = normalize_path(target)
+        for key in (absolute, target.replace(os.sep, '/')):
+            if key in index:
+                return key
+        if relative is None:
+            # Solo se calcula la primera vez que hace falta
+            relative = {normalize_path(key): key for key in index if not os.path.isabs(key)}
+        return relative.get(absolute)
+    return find
+
+
+def collect_images(targets, absolute=True):
+    """Imágenes de una lista de carpetas (recursivas) y archivos"""
+    paths = []
+    for target in targets:
+        if absolute:
+            target = normalize_path(target)
+        if os.path.isdir(target):
+            paths.extend(find_images(target))
+        elif os.path.splitext(target)[1].lower() in IMAGE_EXTENSIONS:
+            paths.append(target)
+        else:
+            print(f"Se ignora {target}: no es una carpeta ni una imagen", file=sys.stderr)
+    return list(dict.fromkeys(paths))
+
+
+def parse_fields(fields):
+    return [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+
+def save_results(store, index, results, metadata_file):
+    """
+    Guarda los resultados con una sola escritura, aplica settings.max_images
+    y hace backup de lo pendiente. Actualiza index y devuelve las rutas
+    eliminadas por el límite.
+    """
+    store.put_many(results)
+    index.update(results)
+    # Límite settings.max_images (las imágenes de este lote se eliminan las últimas)
+    evicted = enforce_limit(store, index, protect=results,
+                            last_viewed=ViewLog(views_file_for(metadata_file)).last_viewed)
+    for path in evicted:
+        del index[path]
+    store.flush_backups()
+    return evicted
+
+
+def report_saved(store, index, results, errors, evicted, metadata_file):
+    for path, error in errors:
+        print(f"Error en {path}: {error}", file=sys.stderr)
+    stale = sum(1 for metadata in results.values() if is_stale(metadata))
+    print(f"Metadatos guardados para {len(results) - stale} imágenes en {metadata_file}")
+    if stale:
+        print(f"{stale} imágenes ya no existen y se marcaron como obsoletas")
+    if evicted:
+        print(f"{len(evicted)} imágenes eliminadas por el límite de {store.settings().get('max_images')}")
+    # Duplicados exactos entre lo procesado y lo que ya estaba catalogado
+    duplicates = DuplicateIndex(index)
+    duplicated = [path for path in results if path in index and duplicates.duplicates_of(path)]
+    if duplicated:
+        print(f"{len(duplicated)} imágenes tienen copias idénticas en la base")
+
+
+# ---------- Comandos ----------
+
+def cmd_scan(args):
+    progress = progress_printer(args.quiet)
+    if args.stdout:
+        # Sin base de datos: una línea JSON por imagen a medida que terminan
+        options = {"hash_algorithm": args.hash or "md5", "perceptual_hash": args.perceptual,
+                   "embedded_metadata": not args.no_embedded, "pixel_statistics": args.pixel_stats}
+        paths = collect_images(args.paths)
+        errors = 0
+        for done, (path, metadata, error) in enumerate(iter_extract(paths, args.workers, options), 1):
+            if metadata is None:
+                errors += 1
+                print(f"Error en {path}: {error or 'No se pudo leer la imagen'}", file=sys.stderr)
+            else:
+                sys.stdout.write(json.dumps(dict({"path": path}, **pick_fields(metadata, parse_fields(args.fields))),
+                                            ensure_ascii=False) + "\n")
+                sys.stdout.flush()
+            if progress:
+                progress(done, len(paths))
+        end_progress(progress)
+        return 1 if errors and errors == len(paths) else 0
+
+    if not args.paths and not args.refresh:
+        print("Indica carpetas o archivos, o --refresh", file=sys.stderr)
+        return 2
+
+    store = open_store(args.db)
+    # Solo los resúmenes: los registros completos se leen al necesitarlos
+    index = store.load_index()
+    options = extraction_options(store.settings())
+    if args.hash:
+        options['hash_algorithm'] = args.hash
+    if args.perceptual:
+        options['perceptual_hash'] = True
+    if args.no_embedded:
+        options['embedded_metadata'] = False
+    if args.pixel_stats:
+        options['pixel_statistics'] = True
+    results = {}
+    errors = []
+
+    if args.refresh:
+        updated, refresh_errors = refresh_records(index, args.workers, progress, options, store.get)
+        end_progress(progress)
+        results.update(updated)
+        errors.extend(refresh_errors)
+
+    if args.paths:
+        paths = collect_images(args.paths, args.absolute)
+        if not args.all:
+            # Solo se procesan las imágenes nuevas o modificadas
+            paths = select_changed(paths, index)
+        paths = [path for path in paths if path not in results]
+        extracted, extract_errors = extract_many(paths, args.workers, progress, options)
+        end_progress(progress)
+        results.update(extracted)
+        errors.extend(extract_errors)
+
+    evicted = save_results(store, index, results, args.db)
+    report_saved(store, index, results, errors, evicted, args.db)
+    return 1 if errors and not results else 0
+
+
+def cmd_show(args):
+    store = open_store(args.db)
+    index = store.load_index()
+    fields = parse_fields(args.fields)
+    missing = 0
+    shown = {}
+    find_key = key_finder(index)
+    for target in args.paths:
+        key = find_key(target)
+        path = key or normalize_path(target)
+        metadata = store.get(key) if key is not None and not args.fresh else None
+        if metadata is None and os.path.isfile(path):
+            metadata = build_metadata(path, **extraction_options(store.settings()))
+        if metadata is None:
+            missing += 1
+            print(f"No hay metadatos de {target}", file=sys.stderr)
+            continue
+        if args.jsonl:
+            print(json.dumps(dict({"path": path}, **pick_fields(metadata, fields)), ensure_ascii=False))
+        else:
+            shown[path] = pick_fields(metadata, fields)
+    if not args.jsonl and shown:
+        print(json.dumps(shown, indent=2, ensure_ascii=False))
+    return 1 if missing else 0
+
+
+def cmd_search(args):
+    store = open_store(args.db)
+    search = SearchIndex(store.load_index())
+    query = parse_query(" ".join(args.query))
+    if args.facets:
+        counts = search.facet_counts(query)
+        for facet, label in FACETS:
+            print(f"{label}:")
+            for value, count in counts[facet].most_common():
+                print(f"  {value}: {count}")
+        return 0
+    paths = search.search(query)
+    for path in paths[:args.limit] if args.limit else paths:
+        print(path)
+    print(f"{len(paths)} de {len(search)} imágenes", file=sys.stderr)
+    return 0
+
+
+def cmd_export(args):
+    store = open_store(args.db)
+    store.load_index()
+    progress = progress_printer(args.quiet)
+    try:
+        count = export_records(store.images, args.file, args.format, parse_fields(args.fields), progress=progress)
+    except (OSError, ValueError) as e:
+        end_progress(progress)
+        print(f"Error al exportar: {e}", file=sys.stderr)
+        return 1
+    end_progress(progress)
+    print(f"Metadatos de {count} imágenes exportados a {args.file}")
+    return 0
+
+
+def cmd_verify(args):
+    store = open_store(args.db)
+    index = store.load_index()
+    # Se agrupan por algoritmo para calcular cada grupo en paralelo
+    by_algorithm = {}
+    missing = []
+    for path, summary in index.items():
+        algorithm, expected = stored_hash(summary)
+        if not os.path.exists(path):
+            missing.append(path)
+        elif expected:
+            by_algorithm.setdefault(algorithm, {})[path] = expected
+
+    changed = []
+    unreadable = []
+    for algorithm, expected in by_algorithm.items():
+        for path, actual in hash_files(list(expected), algorithm, args.workers).items():
+            if actual is None:
+                unreadable.append(path)
+            elif actual != expected[path]:
+                changed.append(path)
+
+    for label, paths in (("NO EXISTE", missing), ("MODIFICADA", changed), ("ILEGIBLE", unreadable)):
+        for path in sorted(paths):
+            print(f"{label}\t{path}")
+    checked = sum(len(expected) for expected in by_algorithm.values())
+    print(f"{checked} imágenes verificadas: {len(changed)} modificadas, {len(missing)} no existen, "
+          f"{len(unreadable)} no se pudieron leer", file=sys.stderr)
+    return 1 if missing or changed or unreadable else 0
+
+
+def cmd_backups(args):
+    store = open_store(args.db)
+    store.load_index()
+    if args.restore is None:
+        for name in store.backups.list_manifests():
+            print(name)
+        return 0
+    images = store.restore_backup(args.restore or None)
+    if images is None:
+        print("No hay backups para restaurar", file=sys.stderr)
+        return 1
+    print(f"Base restaurada con {len(images)} imágenes")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="metadata_cli", description="Metadatos de imágenes sin interfaz gráfica")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, function, help_text):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--db", default="image_metadata.json",
+                             help="Archivo de la base de datos (.json o .db para SQLite)")
+        add_trace_arguments(command)
+        command.set_defaults(function=function)
+        return command
+
+    scan = add_command("scan", cmd_scan, "Generar metadatos de carpetas o archivos")
+    scan.add_argument("paths", nargs="*", help="Carpetas (se recorren de forma recursiva) o imágenes")
+    scan.add_argument("--workers", type=int, default=None, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    scan.add_argument("--hash", choices=available_algorithms(), default=None,
+                      help="Algoritmo de hash (por defecto, el de settings o md5)")
+    scan.add_argument("--perceptual", action="store_true", help="Calcular también el dHash")
+    scan.add_argument("--no-embedded", action="store_true",
+                      help="No leer los metadatos incrustados (EXIF, IPTC, XMP)")
+    scan.add_argument("--pixel-stats", action="store_true",
+                      help="Calcular histogramas, brillo y colores dominantes (requiere numpy)")
+    scan.add_argument("--refresh", action="store_true",
+                      help="Revisar también las imágenes ya catalogadas y regenerar las modificadas")
+    scan.add_argument("--all", action="store_true", help="Procesar también las imágenes sin cambios")
+    scan.add_argument("--stdout", action="store_true",
+                      help="Escribir una línea JSON por imagen en lugar de guardar en la base")
+    scan.add_argument("--fields", help="Con --stdout, campos a escribir separados por comas")
+    scan.add_argument("--quiet", action="store_true", help="No mostrar el progreso")
+    scan.set_defaults(absolute=True)
+
+    show = add_command("show", cmd_show, "Mostrar los metadatos de imágenes")
+    show.add_argument("paths", nargs="+", help="Imágenes")
+    show.add_argument("--fields", help="Campos a mostrar separados por comas")
+    show.add_argument("--fresh", action="store_true", help="Generar los metadatos aunque estén guardados")
+    show.add_argument("--jsonl", action="store_true", help="Una línea JSON por imagen")
+
+    search = add_command("search", cmd_search, "Buscar imágenes en la base por facetas, rangos o nombre")
+    search.add_argument("query", nargs="*",
+                        help="Filtros (ext:png orientacion:vertical mp>10 mb<5 modificada>30d) y palabras del nombre")
+    search.add_argument("--facets", action="store_true", help="Mostrar los conteos de cada faceta")
+    search.add_argument("--limit", type=int, default=None, help="Rutas a mostrar como máximo")
+
+    export = add_command("export", cmd_export, "Exportar la base de datos")
+    export.add_argument("file", help="Archivo de destino (.json, .jsonl, .csv, .parquet)")
+    export.add_argument("--format", choices=("json", "jsonl", "csv", "parquet"), default=None,
+                        help="Formato (por defecto, según la extensión)")
+    export.add_argument("--fields", help="Campos a exportar separados por comas")
+    export.add_argument("--quiet", action="store_true", help="No mostrar el progreso")
+
+    verify = add_command("verify", cmd_verify, "Comprobar el hash de las imágenes guardadas")
+    verify.add_argument("--workers", type=int, default=None, help="Hilos de cálculo del hash")
+
+    backups = add_command("backups", cmd_backups, "Listar o restaurar backups")
+    backups.add_argument("--restore", metavar="YYYYMMDD_HHMMSS", nargs="?", const="",
+                         help="Restaurar la base al último backup anterior a la fecha (sin fecha, el último)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start_tracing(args)
+    try:
+        return args.function(args)
+    except BrokenPipeError:
+        # La salida se cerró antes de terminar (por ejemplo, "| head")
+        sys.stderr.close()
+        return 0
+    finally:
+        finish_tracing(args)
+
+
+# ---------- Modo por lotes anterior (Image_metadata_app.py --batch) ----------
+
+def main_batch(argv=None):
+    """Genera los metadatos de un árbol de directorios sin interfaz gráfica"""
+    parser = argparse.ArgumentParser(description="Ingesta por lotes de imágenes")
+    parser.add_argument("directory", nargs="?", help="Carpeta raíz que se recorre de forma recursiva")
+    parser.add_argument("--db", default="image_metadata.json",
+                        help="Archivo de la base de datos (.json o .db para SQLite)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    parser.add_argument("--hash", choices=available_algorithms(), default=None,
+                        help="Algoritmo de hash (por defecto, el de settings o md5)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Revisar las imágenes ya catalogadas y regenerar solo las modificadas")
+    parser.add_argument("--export", metavar="ARCHIVO",
+                        help="Exportar la base (formato según la extensión: .json, .jsonl, .csv, .parquet)")
+    parser.add_argument("--fields", help="Campos a exportar separados por comas (ej: file_info.filename,file_size.bytes)")
+    parser.add_argument("--list-backups", action="store_true", help="Listar los backups disponibles")
+    parser.add_argument("--restore", metavar="YYYYMMDD_HHMMSS", nargs="?", const="",
+                        help="Restaurar la base al último backup anterior a la fecha (sin fecha, el último)")
+    add_trace_arguments(parser)
+    args = parser.parse_args(argv)
+    if not args.directory and not args.refresh and not args.export and not args.list_backups and args.restore is None:
+        parser.error("Indica una carpeta, --refresh, --export, --list-backups o --restore")
+
+    start_tracing(args)
+    try:
+        return run_batch(args)
+    finally:
+        finish_tracing(args)
+
+
+def run_batch(args):
+    """Ejecuta las acciones del modo por lotes indicadas en args"""
+    if args.list_backups or args.restore is not None:
+        args.restore = None if args.list_backups else args.restore
+        return cmd_backups(args)
+
+    def export():
+        export_args = argparse.Namespace(db=args.db, file=args.export, format=None, fields=args.fields, quiet=False)
+        return cmd_export(export_args)
+
+    if args.export and not args.directory and not args.refresh:
+        return export()
+
+    scan_args = argparse.Namespace(
+        db=args.db, paths=[args.directory] if args.directory else [], workers=args.workers, hash=args.hash,
+        perceptual=False, no_embedded=False, pixel_stats=False, refresh=args.refresh, all=False, stdout=False, fields=None, quiet=False,
+        # Las rutas se guardan como se indicaron, igual que en versiones anteriores
+        absolute=False
+    )
+    status = cmd_scan(scan_args)
+    if args.export and export():
+        return 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Exportación de la base de datos de metadatos.
+
+Los registros se escriben de uno en uno, sin construir el documento completo
+en memoria:
+
+- json: el mismo objeto {ruta: metadatos} que exportaba la aplicación.
+- jsonl: una línea JSON por imagen con la ruta en el campo "path".
+- csv: una fila por imagen con los campos aplanados ("image_dimensions.width_pixels").
+- parquet: las mismas columnas que el CSV, por bloques (requiere pyarrow).
+
+fields limita la exportación a una lista de campos con notación de puntos
+("file_size.bytes" o secciones completas como "timestamps"), y record_filter
+construye el filtro de imágenes.
+"""
+import csv
+import json
+from perf_trace import span
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Filas por bloque al escribir Parquet
+PARQUET_BATCH = 5000
+
+EXPORT_FORMATS = ("json", "jsonl", "csv", "parquet")
+
+
+def available_formats():
+    """Formatos de exportación disponibles con los paquetes instalados"""
+    return [name for name in EXPORT_FORMATS if name != "parquet" or pyarrow is not None]
+
+
+def format_from_filename(file_name):
+    """Formato según la extensión del archivo (json por defecto)"""
+    extension = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
+    if extension == "ndjson":
+        return "jsonl"
+    return extension if extension in EXPORT_FORMATS else "json"
+
+
+def record_filter(extension=None, orientation=None, min_megapixels=None, include_stale=True):
+    """Devuelve una función (ruta, metadatos) -> bool con los filtros indicados"""
+    def accept(path, metadata):
+        if not include_stale and metadata.get('catalog_status', {}).get('stale'):
+            return False
+        if extension and metadata.get('file_info', {}).get('file_extension') != extension.upper():
+            return False
+        if orientation and metadata.get('aspect_ratio', {}).get('orientation') != orientation:
+            return False
+        if min_megapixels is not None and (
+                metadata.get('image_dimensions', {}).get('megapixels') or 0) < min_megapixels:
+            return False
+        return True
+    return accept
+
+
+def pick_fields(metadata, fields):
+    """Copia de metadata con solo los campos indicados (notación de puntos)"""
+    if not fields:
+        return metadata
+    picked = {}
+    for field in fields:
+        value = metadata
+        for part in field.split("."):
+            if not isinstance(value, dict) or part not in value:
+                value = None
+                break
+            value = value[part]
+        if value is None:
+            continue
+        target = picked
+        parts = field.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return picked
+
+
+def flatten_record(metadata, prefix=""):
+    """Aplana un registro en {"seccion.campo": valor}; las listas quedan en JSON"""
+    flat = {}
+    for key, value in metadata.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, name + "."))
+        elif isinstance(value, list):
+            flat[name] = json.dumps(value, ensure_ascii=False)
+        else:
+            flat[name] = value
+    return flat
+
+
+def iter_records(images, fields=None, accept=None, progress=None):
+    """
+    Recorre (ruta, metadatos) aplicando el filtro y la selección de campos.
+    progress recibe (revisadas, total) cada 1% de las imágenes.
+    """
+    total = len(images)
+    step = max(1, total // 100)
+    for done, (path, metadata) in enumerate(images.items(), 1):
+        if progress and (done % step == 0 or done == total):
+            progress(done, total)
+        if accept is not None and not accept(path, metadata):
+            continue
+        yield path, pick_fields(metadata, fields)
+
+
+def export_records(images, file_name, export_format=None, fields=None, accept=None, progress=None):
+    """
+    Exporta las imágenes a file_name y devuelve cuántas se escribieron.
+    progress, si se indica, recibe (procesadas, total).
+    """
+    export_format = export_format or format_from_filename(file_name)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación desconocido: {export_format}")
+    if export_format == "parquet" and pyarrow is None:
+        raise ValueError("La exportación a Parquet requiere el paquete pyarrow")
+
+    with span("export", format=export_format) as timing:
+        count = _export(images, file_name, export_format, fields, accept, progress)
+        timing.set(records=count)
+    return count
+
+
+def _export(images, file_name, export_format, fields, accept, progress):
+    records = iter_records(images, fields, accept, progress)
+
+    if export_format == "json":
+        return _write_json(records, file_name)
+    if export_format == "jsonl":
+        return _write_jsonl(records, file_name)
+
+    # CSV y Parquet necesitan las columnas antes de la primera fila
+    columns = _flat_columns(iter_records(images, fields, accept))
+    if export_format == "csv":
+        return _write_csv(records, file_name, columns)
+    return _write_parquet(records, file_name, columns)
+
+
+def _write_json(records, file_name):
+    count = 0
+    with open(file_name, 'w', encoding='utf-8') as f:
+        f.write("{")
+        for path, metadata in records:
+            f.write("," if count else "")
+            f.write("\n    " + json.dumps(path, ensure_ascii=False) + ": ")
+            f.write(json.dumps(metadata, ensure_ascii=False))
+            count += 1
+        f.write("\n}\n")
+    return count
+
+
+def _write_jsonl(records, file_name):
+    count = 0
+    with open(file_name, 'w', encoding='utf-8') as f:
+        for path, metadata in records:
+            f.write(json.dumps(dict({"path": path}, **metadata), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def _flat_columns(records):
+    """Columnas (en orden de aparición) y tipo de cada una para CSV y Parquet"""
+    columns = {"path": str}
+    for _path, metadata in records:
+        for name, value in flatten_record(metadata).items():
+            if value is None:
+                columns.setdefault(name, None)
+            elif columns.get(name) is None:
+                columns[name] = type(value)
+            elif columns[name] is not type(value):
+                if {columns[name], type(value)} == {int, float}:
+                    columns[name] = float
+                else:
+                    # Tipos mezclados (por ejemplo "N/A" y números): texto
+                    columns[name] = str
+    return columns
+
+
+def _write_csv(records, file_name, columns):
+    count = 0
+    # utf-8-sig para que Excel reconozca los acentos
+    with open(file_name, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(columns))
+        writer.writeheader()
+        for path, metadata in records:
+            writer.writerow(dict(flatten_record(metadata), path=path))
+            count += 1
+    return count
+
+
+def _write_parquet(records, file_name, columns):
+    arrow_types = {bool: pyarrow.bool_(), int: pyarrow.int64(), float: pyarrow.float64()}
+    schema = pyarrow.schema([
+        (name, arrow_types.get(column_type, pyarrow.string())) for name, column_type in columns.items()
+    ])
+    text_columns = [name for name, column_type in columns.items() if column_type not in arrow_types]
+
+    count = 0
+    batch = []
+    with pyarrow.parquet.ParquetWriter(file_name, schema) as writer:
+        for path, metadata in records:
+            row = flatten_record(metadata)
+            row["path"] = path
+            for name in text_columns:
+                if row.get(name) is not None:
+                    row[name] = str(row[name])
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH:
+                writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
@@ -0,0 +1,420 @@
+"""
+Construcción del diccionario de metadatos de una imagen.
+
+No depende de la interfaz gráfica, de modo que se puede usar tanto desde la
+ventana principal como desde procesos de trabajo en lotes.
+
+Desde la versión 2.0 de la base de datos en disco solo se guardan los datos
+primarios de cada imagen (compact_record). Los campos de presentación
+(tamaño en KB/MB, resolución, orientación, categorías, rutas...) se calculan
+al leer con expand_record, que usa las mismas reglas que la extracción.
+"""
+import os
+import ntpath
+import posixpath
+from datetime import datetime
+from image_probe import probe_image
+from embedded_metadata import read_embedded
+from file_hashing import hash_file, stored_hash, DEFAULT_ALGORITHM
+from perf_trace import span
+
+# Versión del formato de los registros guardados en disco
+RECORD_VERSION = "2.0"
+
+
+def extraction_options(settings):
+    """Opciones de build_metadata tomadas de settings de la base de datos"""
+    return {
+        "hash_algorithm": settings.get('hash_algorithm', DEFAULT_ALGORITHM),
+        "perceptual_hash": settings.get('perceptual_hash', False),
+        "embedded_metadata": settings.get('embedded_metadata', True),
+        "pixel_statistics": settings.get('pixel_statistics', False)
+    }
+
+
+def build_metadata(path, hash_algorithm=DEFAULT_ALGORITHM, perceptual_hash=False, embedded_metadata=True,
+                   pixel_statistics=False):
+    """
+    Genera los metadatos completos de la imagen indicada.
+    Devuelve None si la imagen no se puede leer.
+    """
+    with span("extract"):
+        return _build_metadata(path, hash_algorithm, perceptual_hash, embedded_metadata, pixel_statistics)
+
+
+def _build_metadata(path, hash_algorithm, perceptual_hash, embedded_metadata, pixel_statistics):
+    # Obtener información de la imagen leyendo solo las cabeceras
+    with span("probe"):
+        image_info = probe_image(path)
+    if image_info is None:
+        return None
+    file_stats = os.stat(path)
+
+    # Datos primarios; el resto de campos se calcula a partir de ellos
+    facts = {
+        "detected_format": image_info["format"],
+        "bytes": file_stats.st_size,
+        "width": image_info["width"],
+        "height": image_info["height"],
+        "bits_per_pixel": image_info["bits_per_pixel"],
+        "has_alpha": image_info["has_alpha"],
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "mtime": int(file_stats.st_mtime),
+        "atime": int(file_stats.st_atime),
+        "ctime": datetime.fromtimestamp(file_stats.st_ctime).strftime("%Y-%m-%d %H:%M:%S"),
+        "mode": file_stats.st_mode,
+        "inode": file_stats.st_ino if hasattr(file_stats, 'st_ino') else None,
+        "os": os.name,
+        # Hash del archivo para verificación de integridad
+        "hash": hash_file(path, hash_algorithm),
+        "hash_algorithm": hash_algorithm
+    }
+    metadata = expand_record(path, facts)
+
+    # EXIF, GPS, IPTC y XMP leyendo solo los segmentos de metadatos
+    if embedded_metadata:
+        with span("embedded"):
+            metadata["embedded_metadata"] = read_embedded(path)
+
+    # Hash perceptual opcional para buscar imágenes parecidas (requiere decodificar)
+    if perceptual_hash:
+        from duplicate_index import dhash_file
+        with span("dhash"):
+            metadata["similarity"] = {"dhash": dhash_file(path)}
+
+    # Estadísticas de los píxeles opcionales (requiere decodificar y numpy)
+    if pixel_statistics:
+        from pixel_statistics import pixel_statistics as compute_pixel_statistics
+        with span("pixels"):
+            statistics = compute_pixel_statistics(path)
+        if statistics is not None:
+            metadata["pixel_statistics"] = statistics
+
+    return metadata
+
+
+# Secciones que se calculan a partir de los datos primarios y no se guardan
+DERIVED_SECTIONS = ("file_info", "file_size", "image_dimensions", "aspect_ratio",
+                    "color_info", "timestamps", "system_info", "statistics")
+
+
+def is_compact(record):
+    """Indica si un registro está en el formato compacto (versión 2)"""
+    return "bytes" in record and not isinstance(record.get('file_info'), dict)
+
+
+def compact_record(metadata):
+    """
+    Reduce un registro completo a sus datos primarios (formato guardado en
+    disco desde la versión 2.0). Las secciones que no se calculan, como
+    similarity o catalog_status, se conservan tal cual.
+    Los registros del formato antiguo sin secciones se devuelven sin cambios.
+    """
+    if not isinstance(metadata.get('file_info'), dict):
+        return metadata
+
+    file_info = metadata['file_info']
+    dimensions = metadata.get('image_dimensions', {})
+    color_info = metadata.get('color_info', {})
+    timestamps = metadata.get('timestamps', {})
+    system_info = metadata.get('system_info', {})
+    algorithm, digest = stored_hash(metadata)
+    file_mode = system_info.get('file_mode')
+
+    facts = {
+        "detected_format": file_info.get('detected_format'),
+        "bytes": metadata.get('file_size', {}).get('bytes'),
+        "width": dimensions.get('width_pixels'),
+        "height": dimensions.get('height_pixels'),
+        "bits_per_pixel": color_info.get('bits_per_pixel'),
+        "has_alpha": color_info.get('has_alpha_channel'),
+        "created": timestamps.get('metadata_created'),
+        "mtime": timestamps.get('unix_timestamp_modified'),
+        "atime": timestamps.get('unix_timestamp_accessed'),
+        "ctime": timestamps.get('file_created_system'),
+        "mode": int(file_mode, 8) if file_mode else None,
+        "inode": system_info.get('file_inode'),
+        "os": system_info.get('operating_system'),
+        "hash": digest,
+        "hash_algorithm": algorithm
+    }
+    # Fechas generadas en otra zona horaria: se conserva el texto original
+    for field, key, unix_key in (("modified", 'file_modified', 'unix_timestamp_modified'),
+                                 ("accessed", 'file_accessed', 'unix_timestamp_accessed')):
+        if timestamps.get(key) != _format_time(timestamps.get(unix_key)):
+            facts[field] = timestamps.get(key)
+    # La relación de compresión se calcula al leer; solo se guarda si no coincide
+    compression_ratio = metadata.get('statistics', {}).get('compression_ratio_estimate', "N/A")
+    if compression_ratio not in ("N/A", compression_ratio_of(facts["bytes"], facts["width"], facts["height"],
+                                                             facts["bits_per_pixel"])):
+        facts["compression_ratio"] = compression_ratio
+
+    for key, value in metadata.items():
+        if key not in DERIVED_SECTIONS:
+            facts[key] = value
+    return facts
+
+
+def _format_time(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def expand_record(path, record):
+    """
+    Genera el registro completo a partir de los datos primarios de un
+    registro compacto. Los registros que ya están completos (o en el formato
+    antiguo) se devuelven sin cambios.
+    """
+    if not is_compact(record):
+        return record
+
+    width = record["width"] or 0
+    height = record["height"] or 0
+    file_size = record["bytes"] or 0
+
+    # Las rutas se separan según el sistema donde se generó el registro
+    path_module = ntpath if record.get("os") == "nt" else posixpath
+
+    # Calcular información adicional
+    aspect_ratio = width / height if height > 0 else 0
+    megapixels = (width * height) / 1_000_000
+
+    # Determinar formato y extensión
+    file_ext = path_module.splitext(path)[1].upper().replace('.', '')
+    file_name_without_ext = path_module.splitext(path_module.basename(path))[0]
+
+    # Calcular aspect ratio común (ej: 16:9, 4:3, etc)
+    def gcd(a, b):
+        while b:
+            a, b = b, a % b
+        return a
+
+    width_height_gcd = gcd(width, height)
+    aspect_w = width // width_height_gcd if width_height_gcd > 0 else width
+    aspect_h = height // width_height_gcd if width_height_gcd > 0 else height
+
+    # Determinar orientación descriptiva
+    orientation = orientation_of(width, height)
+
+    # Calcular tamaño en diferentes unidades
+    size_kb = round(file_size / 1024, 2)
+    size_mb = round(file_size / (1024 * 1024), 2)
+    size_gb = round(file_size / (1024 * 1024 * 1024), 4)
+
+    # Determinar categorías de tamaño y de resolución
+    size_category = size_category_of(size_mb)
+    total_pixels = width * height
+    resolution_category = resolution_category_of(total_pixels)
+
+    bits_per_pixel = record.get("bits_per_pixel")
+
+    file_info = {
+        "filename": path_module.basename(path),
+        "filename_without_extension": file_name_without_ext,
+        "filepath": path,
+        "directory": path_module.dirname(path),
+        "drive": path_module.splitdrive(path)[0],
+        "file_extension": file_ext,
+        "file_format": file_ext or "UNKNOWN"
+    }
+    if record.get("detected_format") is not None:
+        file_info["detected_format"] = record["detected_format"]
+
+    # Recopilar metadatos completos y detallados
+    metadata = {
+        # Información básica del archivo
+        "file_info": file_info,
+
+        # Tamaños en diferentes unidades
+        "file_size": {
+            "bytes": file_size,
+            "kilobytes": size_kb,
+            "megabytes": size_mb,
+            "gigabytes": size_gb,
+            "human_readable": f"{size_mb} MB" if size_mb >= 1 else f"{size_kb} KB",
+            "category": size_category
+        },
+
+        # Dimensiones y resolución
+        "image_dimensions": {
+            "width_pixels": width,
+            "height_pixels": height,
+            "resolution": f"{width}x{height}",
+            "total_pixels": total_pixels,
+            "megapixels": round(megapixels, 2),
+            "resolution_category": resolution_category
+        },
+
+        # Información de aspecto y orientación
+        "aspect_ratio": {
+            "decimal": round(aspect_ratio, 4),
+            "ratio": f"{aspect_w}:{aspect_h}",
+            "orientation": orientation,
+            "is_landscape": width > height,
+            "is_portrait": height > width,
+            "is_square": width == height
+        },
+
+        # Información de color
+        "color_info": {
+            "bits_per_pixel": bits_per_pixel,
+            "has_alpha_channel": record.get("has_alpha"),
+            "color_depth": f"{bits_per_pixel} bits"
+        },
+
+        # Fechas y tiempos
+        "timestamps": {
+            "metadata_created": record.get("created"),
+            "file_modified": record.get("modified", _format_time(record.get("mtime"))),
+            "file_accessed": record.get("accessed", _format_time(record.get("atime"))),
+            "file_created_system": record.get("ctime"),
+            "unix_timestamp_modified": record.get("mtime"),
+            "unix_timestamp_accessed": record.get("atime")
+        },
+
+        # Información del sistema
+        "system_info": {
+            "file_mode": oct(record["mode"]) if record.get("mode") is not None else None,
+            "file_inode": record.get("inode"),
+            "operating_system": record.get("os")
+        },
+
+        # Estadísticas adicionales
+        "statistics": {
+            "aspect_ratio_percentage": round((width / height * 100) if height > 0 else 0, 2),
+            "compression_ratio_estimate": record.get(
+                "compression_ratio", compression_ratio_of(file_size, width, height, bits_per_pixel)),
+            "pixel_density_category": resolution_category,
+            "recommended_use": get_recommended_use(width, height, size_mb)
+        }
+    }
+
+    metadata["system_info"].update(_hash_fields(record))
+
+    # Secciones que no se calculan (similarity, catalog_status...)
+    for key, value in record.items():
+        if key not in COMPACT_FIELDS:
+            metadata[key] = value
+    return metadata
+
+
+def orientation_of(width, height):
+    """Orientación descriptiva de unas dimensiones"""
+    if width > height:
+        return "Horizontal (Landscape)"
+    if height > width:
+        return "Vertical (Portrait)"
+    return "Cuadrado (Square)"
+
+
+def size_category_of(size_mb):
+    """Categoría de tamaño de archivo (tamaño en MB redondeado a 2 decimales)"""
+    if size_mb < 0.1:
+        return "Muy pequeño"
+    if size_mb < 1:
+        return "Pequeño"
+    if size_mb < 5:
+        return "Mediano"
+    if size_mb < 10:
+        return "Grande"
+    return "Muy grande"
+
+
+def compression_ratio_of(file_size, width, height, bits_per_pixel):
+    """
+    Relación entre los bytes de los píxeles sin comprimir y los del archivo
+    (10.0 significa que el archivo ocupa la décima parte). "N/A" si faltan datos.
+    """
+    if not file_size or not width or not height or not bits_per_pixel:
+        return "N/A"
+    return round(width * height * bits_per_pixel / 8 / file_size, 2)
+
+
+def resolution_category_of(total_pixels):
+    """Categoría de resolución según la cantidad de píxeles"""
+    if total_pixels < 500_000:
+        return "Baja resolución"
+    if total_pixels < 2_000_000:
+        return "Resolución estándar"
+    if total_pixels < 8_000_000:
+        return "Alta resolución (HD)"
+    if total_pixels < 20_000_000:
+        return "Muy alta resolución (Full HD/4K)"
+    return "Ultra alta resolución (8K+)"
+
+
+def _hash_fields(record):
+    """Campos de system_info con el hash de un registro compacto"""
+    # MD5 se guarda en el campo de siempre; otros algoritmos indican cuál se usó
+    hash_algorithm = record.get("hash_algorithm", DEFAULT_ALGORITHM)
+    if hash_algorithm == "md5":
+        return {"file_hash_md5": record.get("hash")}
+    return {"file_hash": record.get("hash"), "hash_algorithm": hash_algorithm}
+
+
+# Secciones que se copian al resumen del índice
+SUMMARY_SECTIONS = ("catalog_status", "similarity")
+
+
+def summary_record(path, record):
+    """
+    Resumen de un registro (compacto o completo) para el índice que se carga
+    al iniciar. Tiene la misma estructura que el registro completo pero solo
+    los campos que usan la lista de imágenes, la detección de cambios, el
+    índice de duplicados y la búsqueda por facetas.
+    """
+    if not is_compact(record):
+        if not isinstance(record.get('file_info'), dict):
+            # Formato antiguo sin secciones: el registro ya es pequeño
+            return record
+        record = compact_record(record)
+
+    path_module = ntpath if record.get("os") == "nt" else posixpath
+    summary = {
+        "file_info": {
+            "filename": path_module.basename(path),
+            "file_extension": path_module.splitext(path)[1].upper().replace('.', '')
+        },
+        "file_size": {"bytes": record.get("bytes")},
+        "image_dimensions": {
+            "width_pixels": record.get("width"),
+            "height_pixels": record.get("height"),
+            "resolution": f"{record.get('width')}x{record.get('height')}"
+        },
+        "color_info": {"has_alpha_channel": record.get("has_alpha")},
+        "timestamps": {
+            "metadata_created": record.get("created"),
+            "unix_timestamp_modified": record.get("mtime")
+        },
+        "system_info": dict(_hash_fields(record), file_inode=record.get("inode"))
+    }
+    for key in SUMMARY_SECTIONS:
+        if key in record:
+            summary[key] = record[key]
+    return summary
+
+
+# Campos del formato compacto (el resto son secciones que se copian tal cual)
+COMPACT_FIELDS = frozenset((
+    "detected_format", "bytes", "width", "height", "bits_per_pixel", "has_alpha",
+    "created", "mtime", "atime", "ctime", "modified", "accessed", "mode", "inode", "os", "hash",
+    "hash_algorithm", "compression_ratio"
+))
+
+
+def get_recommended_use(width, height, size_mb):
+    """Recomienda el uso según las dimensiones y tamaño"""
+    total_pixels = width * height
+
+    if total_pixels < 500_000:
+        return "Iconos, miniaturas, web pequeña"
+    elif total_pixels < 2_000_000:
+        return "Web estándar, redes sociales"
+    elif total_pixels < 8_000_000:
+        return "Impresión pequeña, pantallas HD"
+    elif total_pixels < 20_000_000:
+        return "Impresión grande, fotografía profesional"
+    else:
+        return "Impresión comercial, publicidad, arte digital"
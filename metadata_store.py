@@ -0,0 +1,893 @@
+"""
+Persistencia de la base de datos de metadatos.
+
+La ventana principal y el modo por lotes comparten estas clases para leer y
+escribir la base de datos, de modo que ninguno de los dos necesita Qt para
+guardar.
+
+- JsonMetadataStore reescribe el archivo JSON completo en cada guardado
+  (copiando sin decodificar los registros que no cambiaron).
+- JournalMetadataStore añade cada cambio como una línea a un diario
+  (JSON Lines) y solo reescribe el archivo JSON al compactar.
+- SqliteMetadataStore guarda cada imagen como una fila de SQLite con
+  columnas indexadas para consultas y los metadatos completos en JSON.
+
+Todos registran sus cambios en IncrementalBackup, que decide cuándo hacer
+backup según settings.backup_policy.
+
+En disco (archivo, diario, SQLite y backups) los registros se guardan en el
+formato compacto de metadata_extractor.compact_record. Las bases de
+versiones anteriores se convierten al cargar con migrate_old_format y se
+reescriben una vez en el formato nuevo.
+
+Al iniciar, load_index() lee solo un resumen de cada imagen
+(metadata_extractor.summary_record); los registros completos se leen de uno
+en uno con get(). load() sigue devolviendo todos los registros completos.
+"""
+import os
+import json
+import sqlite3
+import threading
+from collections.abc import Mapping
+from datetime import datetime
+from file_hashing import DEFAULT_ALGORITHM, stored_hash
+from metadata_extractor import RECORD_VERSION, compact_record, expand_record, summary_record
+from incremental_backup import IncrementalBackup
+from perf_trace import span
+
+
+def default_database():
+    """Estructura vacía de la base de datos"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return {
+        "metadata_version": RECORD_VERSION,
+        "created_at": now,
+        "last_updated": now,
+        "total_images": 0,
+        "images": {},
+        "settings": {
+            "auto_backup": True,
+            "max_images": 1000,
+            "eviction_policy": "oldest",
+            "archive_evicted": True,
+            "write_delay_ms": 500,
+            "max_write_delay_ms": 5000,
+            "watch_folders": [],
+            "watch_delay_ms": 1000,
+            "embedded_metadata": True,
+            "pixel_statistics": False,
+            "hash_algorithm": DEFAULT_ALGORITHM
+        }
+    }
+
+
+def write_database(full_db, f, records=None):
+    """
+    Escribe la base de datos en JSON sobre f (modo binario): los campos
+    generales con sangría para poder editarlos a mano y cada imagen compacta
+    en una sola línea. records, si se indica, da pares (ruta, registro
+    compacto ya serializado en bytes) en lugar de full_db['images'].
+    Devuelve {ruta: (posición, longitud)} en bytes de cada registro.
+    """
+    if records is None:
+        records = (
+            (path, json.dumps(compact_record(metadata), ensure_ascii=False,
+                              separators=(',', ':')).encode('utf-8'))
+            for path, metadata in full_db['images'].items()
+        )
+    header = {k: v for k, v in full_db.items() if k != 'images'}
+    f.write(json.dumps(header, indent=4, ensure_ascii=False)[:-2].encode('utf-8'))
+    f.write(b',\n' + IMAGES_LINE)
+    offsets = {}
+    separator = b"\n"
+    for path, data in records:
+        f.write(separator)
+        f.write(b"        " + json.dumps(path, ensure_ascii=False).encode('utf-8') + b": ")
+        offsets[path] = (f.tell(), len(data))
+        f.write(data)
+        separator = b",\n"
+    f.write(b"\n    }\n}\n")
+    return offsets
+
+
+# Línea que abre la sección de imágenes en el archivo escrito por write_database
+IMAGES_LINE = b'    "images": {'
+
+
+class StoreRecords(Mapping):
+    """
+    Vista de solo lectura de los registros completos de un almacén: cada
+    registro se lee del disco al acceder a él, así que recorrerla (por
+    ejemplo para un backup completo) no carga toda la base en memoria.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, path):
+        metadata = self.store.get(path)
+        if metadata is None:
+            raise KeyError(path)
+        return metadata
+
+    def __iter__(self):
+        return iter(self.store.paths())
+
+    def __len__(self):
+        return self.store.count()
+
+    def items(self):
+        # Lectura secuencial: más rápida que leer cada registro por separado
+        return self.store.iter_records()
+
+
+class MetadataStore:
+    """Comportamiento común de los almacenes: settings y backups"""
+
+    def __init__(self, metadata_file, backup_dir="backups"):
+        self.metadata_file = metadata_file
+        self.backup_dir = backup_dir
+        self.backups = IncrementalBackup(backup_dir, pack=compact_record, unpack=expand_record)
+        # Registros completos (se leen del disco al acceder) y campos generales de la base
+        self.images = StoreRecords(self)
+        self.header = {}
+        # La interfaz lee registros mientras el hilo de escritura guarda
+        self.lock = threading.RLock()
+
+    def settings(self):
+        """Configuración guardada en la base de datos"""
+        return self.header.get('settings', default_database()['settings'])
+
+    def update_settings(self, values):
+        """Cambia valores de settings y los guarda en la base"""
+        with self.lock:
+            self.header['settings'] = dict(self.settings(), **values)
+            self.save_header()
+
+    def load(self):
+        """Carga todos los registros completos en un diccionario"""
+        self.load_index()
+        return dict(self.iter_records())
+
+    def migrate_old_format(self, old_data):
+        """
+        Migra datos de formatos anteriores al registro completo en memoria:
+        registros compactos (2.0) y completos (1.0) se aceptan por igual, y
+        se descartan los valores que no son registros.
+        """
+        if not isinstance(old_data, dict):
+            return {}
+        return {
+            path: expand_record(path, metadata)
+            for path, metadata in old_data.items()
+            if isinstance(metadata, dict)
+        }
+
+    def create_backup(self):
+        """Crea un backup incremental inmediato"""
+        return self.backups.backup(self.images, self.header, self.settings().get('backup_policy'))
+
+    def flush_backups(self):
+        """Hace backup de los cambios pendientes (al cerrar)"""
+        if self.backups.pending() and self.settings().get('auto_backup', True):
+            self.create_backup()
+
+    def restore_backup(self, until=None):
+        """
+        Reemplaza la base por su estado en un backup ("YYYYMMDD_HHMMSS";
+        sin fecha, el último). Devuelve las imágenes restauradas o None.
+        """
+        header, images = self.backups.restore(until)
+        if images is None:
+            return None
+        self.header.update(header)
+        self.save(images)
+        return self.images
+
+    def cleanup_old_backups(self, backup_dir, max_backups=10):
+        """Elimina backups antiguos (copias completas) manteniendo solo los más recientes"""
+        try:
+            backups = [f for f in os.listdir(backup_dir)
+                       if f.startswith("metadata_backup_") and os.path.isfile(os.path.join(backup_dir, f))]
+            backups.sort(reverse=True)
+
+            for old_backup in backups[max_backups:]:
+                os.remove(os.path.join(backup_dir, old_backup))
+        except Exception as e:
+            print(f"Error al limpiar backups: {e}")
+
+
+# Registros que iter_records lee cada vez que abre el archivo
+ITER_CHUNK = 256
+
+
+def compact_records(records):
+    """Registros compactos de {ruta: metadatos} (antes de cambiar nada en memoria)"""
+    return {path: compact_record(metadata) for path, metadata in records.items()}
+
+
+class JsonMetadataStore(MetadataStore):
+    """
+    Base de datos en un archivo JSON con una imagen por línea.
+
+    Al cargar solo se lee el índice (ruta -> resumen) y la posición de cada
+    registro en el archivo; get() lee un registro completo cuando hace falta.
+    Los registros modificados esperan en pending hasta la siguiente
+    reescritura, que copia sin decodificar los que no cambiaron.
+    """
+
+    def __init__(self, metadata_file="image_metadata.json", backup_dir="backups"):
+        super().__init__(metadata_file, backup_dir)
+        # Ruta -> (posición, longitud) en el archivo, o None si solo está en pending
+        self.offsets = {}
+        # Registros compactos aún no escritos en el archivo
+        self.pending = {}
+
+    def load_index(self):
+        """Devuelve {ruta: resumen} leyendo solo lo necesario del archivo"""
+        with self.lock, span("load_index"):
+            index = self._scan_file()
+            if index is None:
+                # Formato anterior: se carga completo una vez y se reescribe en el formato nuevo
+                images = self._load_file()
+                self._replace(images)
+                self.write_file()
+                index = {path: summary_record(path, metadata) for path, metadata in images.items()}
+            return index
+
+    def _scan_file(self):
+        """
+        Recorre el archivo escrito por write_database anotando la posición de
+        cada registro. Devuelve el índice, o None si el archivo tiene otro
+        formato (versión anterior, sin estructura o editado a mano).
+        """
+        if not os.path.exists(self.metadata_file):
+            # Crear base de datos inicial
+            self.initialize_database()
+        decoder = json.JSONDecoder()
+        header_lines = []
+        offsets = {}
+        index = {}
+        try:
+            with open(self.metadata_file, 'rb') as f:
+                position = 0
+                lines = iter(f)
+                for line in lines:
+                    position += len(line)
+                    if line.rstrip(b"\r\n") == IMAGES_LINE:
+                        break
+                    header_lines.append(line)
+                else:
+                    return None
+
+                header = json.loads(b"".join(header_lines).decode('utf-8').rstrip().rstrip(',') + "}")
+                if header.get('metadata_version') != RECORD_VERSION:
+                    return None
+
+                for line in lines:
+                    start = position
+                    position += len(line)
+                    text = line.decode('utf-8').rstrip("\r\n")
+                    if text == "    }":
+                        break
+                    path, end = decoder.raw_decode(text, 8)
+                    value = text[end + 2:].rstrip(",")
+                    record = json.loads(value)
+                    offsets[path] = (start + len(text[:end + 2].encode('utf-8')), len(value.encode('utf-8')))
+                    index[path] = summary_record(path, record)
+                else:
+                    return None
+        except (OSError, ValueError) as e:
+            print(f"Base de datos en otro formato, se convertirá: {e}")
+            return None
+
+        self.header = header
+        self.offsets = offsets
+        self.pending = {}
+        return index
+
+    def _load_file(self):
+        """Lee el archivo completo (formatos anteriores)"""
+        if os.path.exists(self.metadata_file):
+            try:
+                with open(self.metadata_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    # Si es el formato antiguo (sin estructura), convertir
+                    if not isinstance(data, dict) or 'images' not in data:
+                        return self.migrate_old_format(data)
+                    self.header = {k: v for k, v in data.items() if k != 'images'}
+                    return self.migrate_old_format(data.get('images', {}))
+            except Exception as e:
+                print(f"Error al cargar base de datos: {e}")
+                return {}
+        else:
+            # Crear base de datos inicial
+            self.initialize_database()
+            return {}
+
+    def initialize_database(self):
+        """Inicializa la base de datos con estructura"""
+        with open(self.metadata_file, 'wb') as f:
+            write_database(default_database(), f)
+
+    def paths(self):
+        with self.lock:
+            return list(self.offsets)
+
+    def count(self):
+        return len(self.offsets)
+
+    def get(self, path):
+        """Devuelve los metadatos completos de una imagen o None"""
+        with self.lock:
+            if path in self.pending:
+                return expand_record(path, self.pending[path])
+            position = self.offsets.get(path)
+            if position is None:
+                return None
+            with open(self.metadata_file, 'rb') as f:
+                f.seek(position[0])
+                return expand_record(path, json.loads(f.read(position[1])))
+
+    def iter_records(self):
+        """
+        Recorre (ruta, metadatos completos) de todas las imágenes en orden.
+        Se leen bloques de ITER_CHUNK registros con el archivo abierto solo
+        mientras dura cada bloque: una reescritura (os.replace) durante una
+        exportación larga no encuentra el archivo abierto, lo que en Windows
+        la haría fallar. Cada bloque usa las posiciones vigentes.
+        """
+        with self.lock:
+            paths = list(self.offsets)
+        for start in range(0, len(paths), ITER_CHUNK):
+            with self.lock:
+                chunk = []
+                snapshot = None
+                try:
+                    for path in paths[start:start + ITER_CHUNK]:
+                        if path in self.pending:
+                            chunk.append((path, self.pending[path]))
+                            continue
+                        position = self.offsets.get(path)
+                        if position is None:
+                            # Eliminada después de empezar el recorrido
+                            continue
+                        if snapshot is None:
+                            snapshot = open(self.metadata_file, 'rb')
+                        snapshot.seek(position[0])
+                        chunk.append((path, json.loads(snapshot.read(position[1]))))
+                finally:
+                    if snapshot is not None:
+                        snapshot.close()
+            for path, record in chunk:
+                yield path, expand_record(path, record)
+
+    def _replace(self, images):
+        """Sustituye todos los registros (se escriben en la próxima reescritura)"""
+        # Se leen antes de cambiar offsets: images puede leer de este mismo almacén
+        pending = {path: compact_record(metadata) for path, metadata in images.items()}
+        self.offsets = dict.fromkeys(pending)
+        self.pending = pending
+
+    def _stage(self, compacted):
+        """Pasa registros compactos a pending (se escriben en la próxima reescritura)"""
+        for path, record in compacted.items():
+            self.pending[path] = record
+            self.offsets.setdefault(path, None)
+
+    def _unlink(self, paths):
+        for path in paths:
+            del self.offsets[path]
+            self.pending.pop(path, None)
+
+    def _state(self):
+        """Copia de los registros en memoria para deshacer un cambio que no llegó al disco"""
+        return dict(self.offsets), dict(self.pending)
+
+    def put(self, path, metadata):
+        """Guarda o actualiza los metadatos de una imagen"""
+        self.put_many({path: metadata})
+
+    def put_many(self, records):
+        """Guarda o actualiza varias imágenes con una sola escritura"""
+        with self.lock:
+            previous = self._state()
+            self._stage(compact_records(records))
+            self._write_or_raise(previous)
+        self.backups.after_change(self.images, self.header, changed=records)
+
+    def remove(self, path):
+        """Elimina una imagen de la base de datos"""
+        self.remove_many([path])
+
+    def remove_many(self, paths):
+        """Elimina varias imágenes con una sola escritura"""
+        with self.lock:
+            paths = [path for path in dict.fromkeys(paths) if path in self.offsets]
+            if not paths:
+                return
+            previous = self._state()
+            self._unlink(paths)
+            self._write_or_raise(previous)
+        self.backups.after_change(self.images, self.header, removed=paths)
+
+    def save(self, images):
+        """Guarda la base de datos JSON con estructura completa"""
+        with self.lock:
+            previous = self._state()
+            self._replace(images)
+            self._write_or_raise(previous)
+        self.backups.note_reset()
+        self.backups.after_change(self.images, self.header)
+
+    def _records(self, snapshot, serialized):
+        """Pares (ruta, bytes) de todos los registros para reescribir el archivo"""
+        for path, position in self.offsets.items():
+            if path in serialized:
+                yield path, serialized[path]
+            else:
+                # Sin cambios: se copia tal cual del archivo actual
+                snapshot.seek(position[0])
+                yield path, snapshot.read(position[1])
+
+    def save_header(self):
+        """Guarda los campos generales (reescribe el archivo)"""
+        with self.lock:
+            self._write_or_raise()
+
+    def _write_or_raise(self, previous=None):
+        # Un guardado solo se confirma si llegó al disco; si no, se deshace en memoria
+        if not self.write_file():
+            if previous is not None:
+                self.offsets, self.pending = previous
+            raise OSError(f"No se pudo escribir {self.metadata_file}")
+
+    def write_file(self):
+        """Reescribe el archivo con todos los registros (de forma atómica)"""
+        try:
+            full_db = default_database()
+            full_db.update(self.header)
+            full_db['total_images'] = len(self.offsets)
+            full_db['last_updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            full_db['metadata_version'] = RECORD_VERSION
+
+            with span("serialize", records=len(self.pending)):
+                serialized = {
+                    path: json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                    for path, record in self.pending.items()
+                }
+
+            temp_file = self.metadata_file + ".tmp"
+            with span("write", file=self.metadata_file, records=len(self.offsets)):
+                with open(temp_file, 'wb') as f:
+                    if any(position is not None for position in self.offsets.values()):
+                        with open(self.metadata_file, 'rb') as snapshot:
+                            offsets = write_database(full_db, f, self._records(snapshot, serialized))
+                    else:
+                        offsets = write_database(full_db, f, self._records(None, serialized))
+                    # El archivo nuevo está completo en disco antes de reemplazar al anterior
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.metadata_file)
+
+            self.offsets = offsets
+            self.pending = {}
+            self.header = {k: v for k, v in full_db.items() if k != 'images'}
+            return True
+        except Exception as e:
+            print(f"Error al guardar base de datos: {e}")
+            return False
+
+
+class JournalMetadataStore(JsonMetadataStore):
+    """
+    Base de datos con diario de solo escritura al final.
+
+    El archivo JSON principal actúa como instantánea. Cada guardado añade una
+    línea al diario, por lo que su costo no depende del tamaño de la base.
+    Al cargar se aplica el diario sobre la instantánea, y cada compact_every
+    entradas se reescribe la instantánea y se vacía el diario.
+    """
+
+    def __init__(self, metadata_file="image_metadata.json", backup_dir="backups",
+                 compact_every=1000):
+        super().__init__(metadata_file, backup_dir)
+        self.journal_file = os.path.splitext(metadata_file)[0] + ".journal.jsonl"
+        self.compact_every = compact_every
+        self.journal_entries = 0
+        self.journal_damaged = False
+
+    def load_index(self):
+        """Lee el índice de la instantánea y aplica los cambios pendientes del diario"""
+        with self.lock:
+            index = super().load_index()
+            self.journal_entries = self.replay_journal(index)
+            # Un diario dañado se compacta para no añadir entradas tras una línea incompleta
+            if self.journal_entries >= self.compact_every or self.journal_damaged:
+                self.compact()
+            return index
+
+    def replay_journal(self, index):
+        """Aplica las entradas del diario sobre el índice y devuelve cuántas había"""
+        if not os.path.exists(self.journal_file):
+            return 0
+        entries = 0
+        self.journal_damaged = False
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Línea incompleta por un cierre inesperado: se ignora
+                    self.journal_damaged = True
+                    continue
+                path = entry.get('path')
+                if entry.get('op') == 'put':
+                    record = compact_record(entry['metadata'])
+                    self.pending[path] = record
+                    self.offsets.setdefault(path, None)
+                    index[path] = summary_record(path, record)
+                elif entry.get('op') == 'delete':
+                    self.pending.pop(path, None)
+                    self.offsets.pop(path, None)
+                    index.pop(path, None)
+                entries += 1
+        return entries
+
+    def put_many(self, records):
+        """Guarda o actualiza varias imágenes con una sola escritura"""
+        compacted = compact_records(records)
+        with self.lock:
+            # En memoria solo cambia lo que ya está en el diario
+            self.append_entries([
+                {"op": "put", "path": path, "metadata": record}
+                for path, record in compacted.items()
+            ])
+            self._stage(compacted)
+            self.compact_if_due()
+        self.backups.after_change(self.images, self.header, changed=records)
+
+    def remove_many(self, paths):
+        """Elimina varias imágenes con una sola escritura del diario"""
+        with self.lock:
+            paths = [path for path in dict.fromkeys(paths) if path in self.offsets]
+            if not paths:
+                return
+            self.append_entries([{"op": "delete", "path": path} for path in paths])
+            self._unlink(paths)
+            self.compact_if_due()
+        self.backups.after_change(self.images, self.header, removed=paths)
+
+    def append_entries(self, entries):
+        """Añade entradas al final del diario (relanza el error si no se pudo)"""
+        if not entries:
+            return
+        try:
+            with span("serialize", records=len(entries)):
+                lines = "".join(
+                    json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n"
+                    for entry in entries
+                )
+            with span("write", file=self.journal_file, records=len(entries)):
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.journal_entries += len(entries)
+        except Exception as e:
+            print(f"Error al escribir el diario: {e}")
+            raise
+
+    def compact_if_due(self):
+        if self.journal_entries >= self.compact_every:
+            self.compact()
+
+    def save(self, images):
+        """Reescribe la base de datos completa (compactación)"""
+        with self.lock:
+            previous = self._state()
+            self._replace(images)
+            if not self.compact():
+                self.offsets, self.pending = previous
+                raise OSError(f"No se pudo escribir {self.metadata_file}")
+        self.backups.note_reset()
+        self.backups.after_change(self.images, self.header)
+
+    def save_header(self):
+        """Los campos generales solo están en la instantánea: se compacta"""
+        self.compact()
+
+    def compact(self):
+        """Escribe una instantánea nueva y vacía el diario; devuelve si se escribió"""
+        with self.lock:
+            # Escritura atómica: el diario solo se borra cuando la instantánea está completa
+            if not self.write_file():
+                print("Error al compactar base de datos")
+                return False
+            try:
+                if os.path.exists(self.journal_file):
+                    os.remove(self.journal_file)
+                self.journal_entries = 0
+                self.journal_damaged = False
+            except Exception as e:
+                print(f"Error al compactar base de datos: {e}")
+            return True
+
+
+class SqliteMetadataStore(MetadataStore):
+    """
+    Base de datos SQLite.
+
+    Cada imagen es una fila con columnas indexadas (hash, extensión,
+    dimensiones, megapíxeles, categoría, orientación y fechas) y los
+    metadatos completos en una columna JSON. Las consultas con find() y get()
+    no necesitan cargar toda la base en memoria. La columna metadata guarda
+    el registro compacto.
+    """
+
+    # Columnas indexadas y cómo se obtienen de los metadatos
+    COLUMNS = (
+        ("file_hash", "TEXT"),
+        ("extension", "TEXT"),
+        ("width", "INTEGER"),
+        ("height", "INTEGER"),
+        ("megapixels", "REAL"),
+        ("resolution_category", "TEXT"),
+        ("orientation", "TEXT"),
+        ("file_size", "INTEGER"),
+        ("metadata_created", "TEXT"),
+        ("unix_modified", "INTEGER"),
+    )
+
+    def __init__(self, metadata_file="image_metadata.db", backup_dir="backups"):
+        super().__init__(metadata_file, backup_dir)
+        self.connection = sqlite3.connect(metadata_file, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.initialize_database()
+
+    def initialize_database(self):
+        """Crea las tablas e índices si no existen"""
+        columns = ", ".join(f"{name} {sql_type}" for name, sql_type in self.COLUMNS)
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS images (path TEXT PRIMARY KEY, {columns}, metadata TEXT NOT NULL)"
+            )
+            for name, _sql_type in self.COLUMNS:
+                if name in ("width", "height", "file_size"):
+                    continue
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_images_{name} ON images ({name})"
+                )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_dimensions ON images (width, height)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS database_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            # Campos generales de la base (versión, fechas, settings)
+            defaults = default_database()
+            for key in ("metadata_version", "created_at", "settings"):
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO database_info (key, value) VALUES (?, ?)",
+                    (key, json.dumps(defaults[key], ensure_ascii=False))
+                )
+        self.header = {
+            key: json.loads(value)
+            for key, value in self.connection.execute("SELECT key, value FROM database_info")
+        }
+        if self.header.get('metadata_version') != RECORD_VERSION:
+            self.upgrade_records()
+
+    def upgrade_records(self):
+        """Reescribe los registros completos de la versión 1.0 en formato compacto"""
+        rows = self.connection.execute("SELECT path, metadata FROM images").fetchall()
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE images SET metadata = ? WHERE path = ?",
+                ((json.dumps(compact_record(json.loads(metadata)), ensure_ascii=False,
+                             separators=(',', ':')), path)
+                 for path, metadata in rows)
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO database_info (key, value) VALUES ('metadata_version', ?)",
+                (json.dumps(RECORD_VERSION),)
+            )
+        self.header['metadata_version'] = RECORD_VERSION
+
+    def save_header(self):
+        """Guarda los campos generales en database_info"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO database_info (key, value) VALUES (?, ?)",
+                ((key, json.dumps(self.header[key], ensure_ascii=False))
+                 for key in ("metadata_version", "created_at", "settings") if key in self.header)
+            )
+
+    def load(self):
+        """Carga todas las imágenes en un diccionario"""
+        with self.lock:
+            return {
+                path: expand_record(path, json.loads(metadata))
+                for path, metadata in self.connection.execute("SELECT path, metadata FROM images ORDER BY rowid")
+            }
+
+    def iter_records(self):
+        """Recorre (ruta, metadatos completos) de todas las imágenes en orden"""
+        with self.lock:
+            rows = self.connection.execute("SELECT path, metadata FROM images ORDER BY rowid").fetchall()
+        for path, metadata in rows:
+            yield path, expand_record(path, json.loads(metadata))
+
+    def load_index(self):
+        """Devuelve {ruta: resumen} sin generar los registros completos"""
+        with self.lock, span("load_index"):
+            return {
+                path: summary_record(path, json.loads(metadata))
+                for path, metadata in self.connection.execute("SELECT path, metadata FROM images ORDER BY rowid")
+            }
+
+    def get(self, path):
+        """Devuelve los metadatos de una imagen o None"""
+        with self.lock:
+            row = self.connection.execute("SELECT metadata FROM images WHERE path = ?", (path,)).fetchone()
+        return expand_record(path, json.loads(row[0])) if row else None
+
+    def paths(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT path FROM images ORDER BY rowid")]
+
+    def count(self):
+        """Cantidad de imágenes guardadas"""
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def find(self, extension=None, orientation=None, resolution_category=None, file_hash=None,
+             min_megapixels=None, max_megapixels=None, min_width=None, min_height=None,
+             modified_after=None, modified_before=None, limit=None):
+        """
+        Devuelve las rutas de las imágenes que cumplen todos los filtros
+        indicados. Las fechas de modificación son timestamps Unix.
+        """
+        conditions = []
+        params = []
+        for column, operator, value in (
+            ("extension", "=", extension.upper() if extension else None),
+            ("orientation", "=", orientation),
+            ("resolution_category", "=", resolution_category),
+            ("file_hash", "=", file_hash),
+            ("megapixels", ">=", min_megapixels),
+            ("megapixels", "<=", max_megapixels),
+            ("width", ">=", min_width),
+            ("height", ">=", min_height),
+            ("unix_modified", ">=", modified_after),
+            ("unix_modified", "<=", modified_before),
+        ):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+
+        query = "SELECT path FROM images"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY rowid"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return [row[0] for row in self.connection.execute(query, params)]
+
+    def _row(self, path, metadata):
+        """Valores de la fila para una imagen"""
+        file_info = metadata.get('file_info', {})
+        dimensions = metadata.get('image_dimensions', {})
+        aspect = metadata.get('aspect_ratio', {})
+        timestamps = metadata.get('timestamps', {})
+        return (
+            path,
+            stored_hash(metadata)[1],
+            file_info.get('file_extension'),
+            dimensions.get('width_pixels'),
+            dimensions.get('height_pixels'),
+            dimensions.get('megapixels'),
+            dimensions.get('resolution_category'),
+            aspect.get('orientation'),
+            metadata.get('file_size', {}).get('bytes'),
+            timestamps.get('metadata_created'),
+            timestamps.get('unix_timestamp_modified'),
+            json.dumps(compact_record(metadata), ensure_ascii=False, separators=(',', ':')),
+        )
+
+    def _rows(self, records):
+        with span("serialize", records=len(records)):
+            return [self._row(path, metadata) for path, metadata in records.items()]
+
+    def _write_rows(self, rows):
+        """Inserta las filas (dentro de la transacción abierta por el llamador)"""
+        columns = ", ".join(name for name, _sql_type in self.COLUMNS)
+        placeholders = ", ".join("?" * (len(self.COLUMNS) + 2))
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO images (path, {columns}, metadata) VALUES ({placeholders})",
+            rows
+        )
+        self.connection.execute(
+            "INSERT OR REPLACE INTO database_info (key, value) VALUES ('last_updated', ?)",
+            (json.dumps(datetime.now().strftime("%Y-%m-%d %H:%M:%S")),)
+        )
+
+    def _upsert(self, records):
+        rows = self._rows(records)
+        with self.lock, span("write", file=self.metadata_file, records=len(rows)), self.connection:
+            self._write_rows(rows)
+
+    def put(self, path, metadata):
+        """Guarda o actualiza los metadatos de una imagen"""
+        self._upsert({path: metadata})
+        self.backups.after_change(self.images, self.header, changed=[path])
+
+    def put_many(self, records):
+        """Guarda o actualiza varias imágenes en una sola transacción"""
+        self._upsert(records)
+        self.backups.after_change(self.images, self.header, changed=records)
+
+    def remove(self, path):
+        """Elimina una imagen de la base de datos"""
+        self.remove_many([path])
+
+    def remove_many(self, paths):
+        """Elimina varias imágenes en una sola transacción"""
+        removed = []
+        with self.lock, self.connection:
+            for path in dict.fromkeys(paths):
+                # Solo se anotan para el backup las filas que existían
+                if self.connection.execute("DELETE FROM images WHERE path = ?", (path,)).rowcount:
+                    removed.append(path)
+        if removed:
+            self.backups.after_change(self.images, self.header, removed=removed)
+
+    def save(self, images):
+        """Reemplaza el contenido completo de la base de datos"""
+        try:
+            with self.lock:
+                # Se leen antes de borrar: images puede leer de esta misma base
+                rows = self._rows(dict(images.items()))
+                # Borrado e inserción en una sola transacción: si algo falla no se pierde nada
+                with span("write", file=self.metadata_file, records=len(rows)), self.connection:
+                    self.connection.execute("DELETE FROM images")
+                    self._write_rows(rows)
+        except Exception as e:
+            print(f"Error al guardar base de datos: {e}")
+            raise
+        self.backups.note_reset()
+        self.backups.after_change(self.images, self.header)
+
+    def import_store(self, other):
+        """Copia en SQLite todas las imágenes de otro almacén (por ejemplo JSON)"""
+        self.put_many(other.load())
+
+    def close(self):
+        self.connection.close()
+
+
+# Backends disponibles para open_store
+STORE_BACKENDS = {
+    "json": JsonMetadataStore,
+    "journal": JournalMetadataStore,
+    "sqlite": SqliteMetadataStore,
+}
+
+# Extensiones de archivo que abren la base de datos SQLite
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def open_store(metadata_file="image_metadata.json", backend=None, **options):
+    """
+    Crea el almacén de metadatos del tipo indicado. Si no se indica backend,
+    se usa SQLite para archivos .db/.sqlite y el diario para el resto.
+    """
+    if backend is None:
+        is_sqlite = os.path.splitext(metadata_file)[1].lower() in SQLITE_EXTENSIONS
+        backend = "sqlite" if is_sqlite else "journal"
+    if backend not in STORE_BACKENDS:
+        raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+    return STORE_BACKENDS[backend](metadata_file, **options)
@@ -0,0 +1,166 @@
+"""
+Medición de tiempos de las operaciones principales.
+
+Las operaciones se marcan con span("nombre", detalle=valor) (o con el
+decorador traced) y cada una queda registrada de tres formas:
+
+- Estadísticas por nombre (veces, total, media, máximo, última) y los
+  eventos recientes, que muestra el panel de diagnóstico de la aplicación.
+- Logs estructurados: una línea JSON por operación en el logger
+  "image_metadata.perf" si está activo en nivel DEBUG (enable_log).
+- Traza en formato Chrome (chrome://tracing o Perfetto) con write_chrome_trace.
+
+count("nombre") suma contadores sueltos (aciertos de caché, guardados...).
+Medir una operación cuesta unos microsegundos; set_enabled(False) lo
+desactiva. Las operaciones de los procesos de trabajo del modo por lotes
+no se registran en el proceso principal.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from functools import wraps
+
+# Eventos que se conservan para la traza y el panel
+MAX_EVENTS = 20000
+
+logger = logging.getLogger("image_metadata.perf")
+
+
+class Tracer:
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = True
+        self.origin = time.perf_counter_ns()
+        self.lock = threading.Lock()
+        # (nombre, inicio ns, duración ns, hilo, detalles)
+        self.events = deque(maxlen=max_events)
+        # nombre -> [veces, total ns, máximo ns, última ns]
+        self.stats = {}
+        self.counters = {}
+
+    def span(self, name, **args):
+        return Span(self, name, args)
+
+    def record(self, name, start, duration, args):
+        thread_id = threading.get_ident()
+        with self.lock:
+            self.events.append((name, start - self.origin, duration, thread_id, args))
+            stats = self.stats.get(name)
+            if stats is None:
+                self.stats[name] = [1, duration, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = max(stats[2], duration)
+                stats[3] = duration
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(dict(
+                {"op": name, "ms": round(duration / 1e6, 3), "thread": thread_id}, **args
+            ), ensure_ascii=False, default=str))
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self, recent=200):
+        """Copia de las estadísticas, los contadores y los últimos eventos"""
+        with self.lock:
+            stats = {name: list(values) for name, values in self.stats.items()}
+            counters = dict(self.counters)
+            events = list(self.events)[-recent:]
+        return stats, counters, events
+
+    def reset(self):
+        with self.lock:
+            self.events.clear()
+            self.stats.clear()
+            self.counters.clear()
+
+    def write_chrome_trace(self, file_name):
+        """Guarda los eventos en el formato de traza de Chrome; devuelve cuántos se escribieron"""
+        with self.lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        pid = os.getpid()
+        trace = [
+            {"name": name, "ph": "X", "ts": start / 1000, "dur": duration / 1000,
+             "pid": pid, "tid": thread_id, "args": args}
+            for name, start, duration, thread_id, args in events
+        ]
+        if events:
+            end = max(start + duration for _name, start, duration, _thread, _args in events)
+            trace.append({"name": "contadores", "ph": "C", "ts": end / 1000, "pid": pid, "args": counters})
+        with open(file_name, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+        return len(events)
+
+
+class Span:
+    """Mide el bloque with; los detalles se pueden completar dentro con set()"""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        if self.tracer.enabled:
+            self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.start is not None:
+            if exc_type is not None:
+                self.args["error"] = exc_type.__name__
+            self.tracer.record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+# Registro compartido por toda la aplicación
+tracer = Tracer()
+
+
+def span(name, **args):
+    return tracer.span(name, **args)
+
+
+def count(name, value=1):
+    tracer.count(name, value)
+
+
+def traced(name):
+    """Decorador que mide cada llamada a la función"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_enabled(enabled):
+    tracer.enabled = enabled
+
+
+def enable_log(file_name=None):
+    """Escribe una línea JSON por operación en file_name (o en la consola)"""
+    handler = logging.FileHandler(file_name, encoding='utf-8') if file_name else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return handler
+
+
+def write_chrome_trace(file_name):
+    return tracer.write_chrome_trace(file_name)
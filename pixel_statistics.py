@@ -0,0 +1,151 @@
+"""
+Estadísticas de los píxeles de una imagen (histogramas, brillo, contraste y
+colores dominantes).
+
+La imagen se decodifica reducida a SAMPLE_SIZE píxeles de lado (en JPEG la
+reducción ocurre durante la decodificación) y se lee como una vista NumPy
+sobre los bytes del QImage, sin copiarlos. Todos los cálculos son
+operaciones vectorizadas (bincount, medias y desviaciones), así que el coste
+lo marca la decodificación y no el número de píxeles.
+
+Es una etapa opcional de la extracción (settings.pixel_statistics) que se
+ejecuta en el mismo pool de procesos que el resto de los metadatos. Requiere
+el paquete numpy; sin él la sección no se genera.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Lado máximo de la miniatura que se analiza
+SAMPLE_SIZE = 256
+# Intervalos de cada histograma (potencia de 2)
+HISTOGRAM_BINS = 16
+# Colores dominantes que se guardan
+DOMINANT_COLORS = 5
+# Bits por canal al agrupar colores parecidos (4 bits: 4096 grupos)
+COLOR_BITS = 4
+
+# Pesos de la luminancia (ITU-R BT.601)
+LUMINANCE_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def available():
+    """Indica si se pueden calcular las estadísticas (numpy instalado)"""
+    return numpy is not None
+
+
+def brightness_category_of(mean_luminance):
+    """Brillo descriptivo a partir de la luminancia media (0-255)"""
+    if mean_luminance < 64:
+        return "Muy oscura"
+    if mean_luminance < 110:
+        return "Oscura"
+    if mean_luminance < 160:
+        return "Media"
+    if mean_luminance < 210:
+        return "Clara"
+    return "Muy clara"
+
+
+def load_sample(path, size=SAMPLE_SIZE):
+    """
+    Decodifica la imagen reducida a size píxeles de lado con cuatro bytes por
+    píxel (RGBA8888, o RGBX8888 si no tiene canal alfa).
+    """
+    # Importación tardía: el resto de la extracción no necesita Qt
+    from PyQt5.QtGui import QImage, QImageReader
+    from PyQt5.QtCore import Qt
+
+    reader = QImageReader(path)
+    original = reader.size()
+    if original.isValid() and max(original.width(), original.height()) > size:
+        reader.setScaledSize(original.scaled(size, size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    return image.convertToFormat(QImage.Format_RGBA8888 if image.hasAlphaChannel() else QImage.Format_RGBX8888)
+
+
+def pixel_view(image):
+    """Vista NumPy (alto, ancho, 4) sobre los bytes de un QImage RGBA8888/RGBX8888, sin copia"""
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    rows = numpy.frombuffer(bits, numpy.uint8).reshape(image.height(), image.bytesPerLine())
+    # Cada fila puede tener relleno al final (bytesPerLine >= ancho * 4)
+    return rows[:, :image.width() * 4].reshape(image.height(), image.width(), 4)
+
+
+def compute_statistics(pixels, has_alpha):
+    """Estadísticas de un array (alto, ancho, 4) de píxeles RGBA"""
+    height, width = pixels.shape[:2]
+    statistics = {"sample": f"{width}x{height}"}
+    if has_alpha:
+        # Los píxeles totalmente transparentes no cuentan para el color
+        opaque = pixels[..., 3] > 0
+        rgb = pixels[..., :3][opaque]
+        statistics["transparent_share"] = round(1 - len(rgb) / (width * height), 4) if width * height else 1.0
+    else:
+        rgb = pixels[..., :3].reshape(-1, 3)
+    total = len(rgb)
+    if total == 0:
+        return statistics
+
+    # Histogramas: un solo bincount para los tres canales desplazando cada uno
+    shift = 8 - (HISTOGRAM_BINS.bit_length() - 1)
+    bins = (rgb >> shift).astype(numpy.intp) + numpy.arange(3) * HISTOGRAM_BINS
+    channel_counts = numpy.bincount(bins.ravel(), minlength=3 * HISTOGRAM_BINS).reshape(3, HISTOGRAM_BINS)
+
+    luminance = rgb @ numpy.array(LUMINANCE_WEIGHTS)
+    luminance_counts = numpy.bincount(
+        numpy.minimum(luminance, 255).astype(numpy.intp) >> shift, minlength=HISTOGRAM_BINS)
+
+    histograms = {}
+    for name, counts in zip(("red", "green", "blue", "luminance"), (*channel_counts, luminance_counts)):
+        histograms[name] = numpy.round(counts / total, 4).tolist()
+
+    mean_luminance = float(luminance.mean())
+    statistics.update({
+        "mean_rgb": [round(value, 2) for value in rgb.mean(axis=0).tolist()],
+        "mean_luminance": round(mean_luminance, 2),
+        # Contraste RMS: desviación típica de la luminancia
+        "contrast": round(float(luminance.std()), 2),
+        "brightness": brightness_category_of(mean_luminance),
+        "histograms": histograms,
+        "dominant_colors": dominant_colors(rgb)
+    })
+    return statistics
+
+
+def dominant_colors(rgb, count=DOMINANT_COLORS):
+    """
+    Colores más frecuentes: los píxeles se agrupan por los COLOR_BITS bits
+    altos de cada canal y de cada grupo se da el color medio y su proporción.
+    """
+    shift = 8 - COLOR_BITS
+    quantized = (rgb >> shift).astype(numpy.intp)
+    keys = (quantized[:, 0] << (2 * COLOR_BITS)) | (quantized[:, 1] << COLOR_BITS) | quantized[:, 2]
+    groups = 1 << (3 * COLOR_BITS)
+    counts = numpy.bincount(keys, minlength=groups)
+    top = numpy.argsort(counts)[::-1][:count]
+    top = top[counts[top] > 0]
+    sums = [numpy.bincount(keys, weights=rgb[:, channel], minlength=groups)[top] for channel in range(3)]
+    means = numpy.rint(numpy.stack(sums, axis=1) / counts[top, None]).astype(int)
+
+    total = len(rgb)
+    return [{"color": "#{:02x}{:02x}{:02x}".format(*mean), "share": round(int(pixels) / total, 4)}
+            for mean, pixels in zip(means.tolist(), counts[top].tolist())]
+
+
+def pixel_statistics(path, size=SAMPLE_SIZE):
+    """
+    Sección pixel_statistics de una imagen, o None si no se puede decodificar
+    o numpy no está instalado.
+    """
+    if numpy is None:
+        return None
+    image = load_sample(path, size)
+    if image is None:
+        return None
+    # image debe seguir viva mientras se usa la vista sobre sus bytes
+    return compute_statistics(pixel_view(image), image.hasAlphaChannel())
@@ -0,0 +1,172 @@
+"""
+Carga de la vista previa en segundo plano.
+
+Al seleccionar una imagen de la lista, PreviewLoader decodifica la miniatura
+(ThumbnailCache), lee el registro completo del almacén y los datos del
+archivo en un pool de hilos, y entrega el resultado con la señal ready; la
+interfaz no espera a ninguna lectura de disco.
+
+- Cada petición nueva cancela las que aún no empezaron. Las que ya están
+  en curso terminan (su miniatura queda en la caché), pero su resultado se
+  descarta si la selección cambió mientras tanto.
+- Tras la imagen pedida se precargan las PREFETCH_DISTANCE filas anteriores
+  y siguientes en la caché de miniaturas, que está limitada en bytes, de
+  modo que recorrer la lista con el teclado encuentra casi siempre la
+  miniatura ya en memoria.
+- Si la imagen pedida ya se está precargando, la petición espera a esa
+  decodificación en lugar de repetirla.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from PyQt5.QtCore import QObject, pyqtSignal
+from image_probe import probe_image
+from batch_ingest import has_changed
+from file_hashing import stored_hash
+from perf_trace import span, count
+
+# Filas que se precargan a cada lado de la seleccionada
+PREFETCH_DISTANCE = 3
+# Hilos de decodificación (la imagen pedida no espera a más de una precarga)
+PREVIEW_WORKERS = 2
+
+
+def load_preview(thumbnails, path, size, summary=None, record=None, load=None):
+    """
+    Datos de la vista previa de una imagen (se ejecuta en un hilo del pool).
+    summary (resumen del índice) da la clave de la miniatura; record es el
+    registro completo si ya está en memoria y load lo lee del almacén.
+    Lanza OSError si el archivo no existe.
+    """
+    file_stats = os.stat(path)
+    image = cached_thumbnail(thumbnails, path, size, summary, file_stats)
+
+    if record is None and load is not None:
+        record = load(path)
+    # Dimensiones originales: de los metadatos o de la cabecera del archivo
+    if record is not None and isinstance(record.get('image_dimensions'), dict):
+        width = record['image_dimensions'].get('width_pixels')
+        height = record['image_dimensions'].get('height_pixels')
+    else:
+        image_info = probe_image(path) or {}
+        width = image_info.get('width')
+        height = image_info.get('height')
+    return {
+        "path": path,
+        "image": image,
+        "metadata": record,
+        "bytes": file_stats.st_size,
+        "width": width,
+        "height": height
+    }
+
+
+def cached_thumbnail(thumbnails, path, size, summary, file_stats):
+    """Miniatura de la caché (o decodificada y guardada en ella)"""
+    # El hash guardado solo sirve como clave si el archivo no cambió
+    content_hash = None
+    if summary is not None and not has_changed(summary, file_stats):
+        content_hash = stored_hash(summary)[1]
+    return thumbnails.get(path, size, content_hash)
+
+
+def prefetch_thumbnail(thumbnails, path, size, summary=None):
+    """Deja la miniatura de una imagen en la caché (errores ignorados)"""
+    try:
+        cached_thumbnail(thumbnails, path, size, summary, os.stat(path))
+    except OSError:
+        pass
+
+
+class PreviewLoader(QObject):
+    # Datos de la vista previa pedida (ver load_preview)
+    ready = pyqtSignal(dict)
+    # (ruta, mensaje) si la imagen pedida no se pudo leer
+    failed = pyqtSignal(str, str)
+    # Uso interno: (número de petición, ruta, datos o None, mensaje de error)
+    _finished = pyqtSignal(int, str, object, str)
+
+    def __init__(self, thumbnails, prefetch_distance=PREFETCH_DISTANCE, parent=None):
+        super().__init__(parent)
+        self.thumbnails = thumbnails
+        self.prefetch_distance = prefetch_distance
+        self.executor = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="preview")
+        self.generation = 0
+        # Trabajos sin terminar: ruta -> future (los hilos quitan los suyos al terminar)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self._finished.connect(self._deliver)
+
+    def request(self, path, size, summary=None, record=None, load=None, neighbours=()):
+        """
+        Pide la vista previa de path y precarga neighbours [(ruta, resumen)]
+        (de la más cercana a la más lejana). Cancela lo que quedaba en cola.
+        """
+        self.generation += 1
+        generation = self.generation
+        self.cancel_queued()
+
+        # Si la miniatura se está decodificando (precarga en curso) se espera a ella
+        with self.lock:
+            running = self.pending.get(path)
+        self._submit(path, self._run, generation, running, path, size, summary, record, load)
+
+        for neighbour, neighbour_summary in neighbours:
+            with self.lock:
+                if neighbour in self.pending:
+                    continue
+            count("preview.prefetch")
+            self._submit(neighbour, prefetch_thumbnail, self.thumbnails, neighbour, size, neighbour_summary)
+
+    def _submit(self, path, function, *args):
+        future = self.executor.submit(function, *args)
+        with self.lock:
+            self.pending[path] = future
+        future.add_done_callback(lambda done: self._forget(path, done))
+
+    def cancel_queued(self):
+        """Cancela los trabajos que todavía no empezaron"""
+        with self.lock:
+            futures = list(self.pending.values())
+        # cancel() llama a _forget en este mismo hilo: no se puede tener el bloqueo
+        for future in futures:
+            if future.cancel():
+                count("preview.cancelled")
+
+    def _forget(self, path, future):
+        # Se llama desde el hilo que terminó el trabajo (o desde cancel())
+        with self.lock:
+            if self.pending.get(path) is future:
+                del self.pending[path]
+
+    def _run(self, generation, running, path, size, summary, record, load):
+        if generation != self.generation:
+            # La selección cambió antes de empezar
+            return
+        if running is not None:
+            try:
+                running.result()
+            except (CancelledError, Exception):
+                pass
+        try:
+            with span("preview.load"):
+                preview = load_preview(self.thumbnails, path, size, summary, record, load)
+        except Exception as e:
+            self._finished.emit(generation, path, None, str(e))
+            return
+        self._finished.emit(generation, path, preview, "")
+
+    def _deliver(self, generation, path, preview, error):
+        # Solo se entrega el resultado de la última petición
+        if generation != self.generation:
+            count("preview.stale")
+            return
+        if preview is None:
+            self.failed.emit(path, error)
+        else:
+            self.ready.emit(preview)
+
+    def shutdown(self):
+        """Cancela lo pendiente sin esperar a los trabajos en curso (al cerrar la ventana)"""
+        self.generation += 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,167 @@
+"""
+Modelo de la lista de imágenes guardadas.
+
+Sustituye al QListWidget que se vaciaba y se volvía a llenar con un widget
+por imagen en cada guardado. El modelo trabaja directamente sobre el
+diccionario de metadatos: las filas se exponen por bloques a medida que la
+vista las necesita (canFetchMore/fetchMore), el texto de cada fila se
+calcula solo cuando se dibuja, y los guardados insertan, actualizan o
+quitan filas sueltas en lugar de reconstruir la lista.
+"""
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from batch_ingest import is_stale
+from perf_trace import span
+
+
+def item_text(metadata):
+    """Texto de una fila de la lista"""
+    # Extraer información según la estructura
+    if isinstance(metadata.get('file_info'), dict):
+        filename = metadata['file_info'].get('filename', 'Sin nombre')
+        resolution = metadata['image_dimensions'].get('resolution', 'N/A')
+        date = metadata['timestamps'].get('metadata_created', '')
+    else:
+        # Compatibilidad con formato antiguo
+        filename = metadata.get('filename', 'Sin nombre')
+        resolution = metadata.get('resolution', 'N/A')
+        date = metadata.get('date_created', '')
+
+    icon = "⚠️" if is_stale(metadata) else "📷"
+    text = f"{icon} {filename}\n"
+    text += f"   🖼️ {resolution}\n"
+    text += f"   📅 {date}"
+    return text
+
+
+class SavedImagesModel(QAbstractListModel):
+    # Rol con la ruta de la imagen: clave estable aunque la vista ordene o filtre
+    PathRole = Qt.UserRole + 1
+
+    # Filas que se exponen cada vez que la vista pide más
+    FETCH_BATCH = 200
+
+    def __init__(self, images, parent=None):
+        super().__init__(parent)
+        self.images = images
+        self.paths = list(images)
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        self.loaded = 0
+        # Filtro de búsqueda activo: ruta -> bool para las imágenes que se guardan después
+        self.accept = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.paths)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.FETCH_BATCH, len(self.paths) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DisplayRole:
+            return item_text(self.images.get(path, {}))
+        if role in (self.PathRole, Qt.ToolTipRole):
+            return path
+        return None
+
+    def path_at(self, row):
+        """Ruta de la imagen de una fila"""
+        return self.paths[row] if 0 <= row < self.loaded else None
+
+    def index_of(self, path):
+        """Índice de la fila de una ruta (expone más filas si hace falta)"""
+        row = self.rows.get(path)
+        if row is None:
+            return QModelIndex()
+        while row >= self.loaded and self.canFetchMore():
+            self.fetchMore()
+        return self.index(row)
+
+    def add_or_update(self, paths):
+        """Inserta las rutas nuevas al final y refresca las existentes"""
+        with span("list.update", rows=len(paths)):
+            self._add_or_update(paths)
+
+    def _add_or_update(self, paths):
+        new_paths = []
+        hidden = []
+        for path in dict.fromkeys(paths):
+            row = self.rows.get(path)
+            if self.accept is not None and not self.accept(path):
+                # Ya no cumple la búsqueda activa
+                if row is not None:
+                    hidden.append(path)
+                continue
+            if row is None:
+                new_paths.append(path)
+            elif row < self.loaded:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+        # Las filas ocultas se quitan antes de numerar las nuevas: remove()
+        # vuelve a calcular rows a partir de paths
+        if hidden:
+            self.remove(hidden)
+        if not new_paths:
+            return
+        for offset, path in enumerate(new_paths):
+            self.rows[path] = len(self.paths) + offset
+        if self.loaded < len(self.paths):
+            # Aún hay filas sin exponer: las nuevas aparecerán con fetchMore
+            self.paths.extend(new_paths)
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + len(new_paths) - 1)
+        self.paths.extend(new_paths)
+        self.loaded = len(self.paths)
+        self.endInsertRows()
+
+    def remove(self, paths):
+        """Quita las filas de las rutas indicadas"""
+        rows = sorted((self.rows[path] for path in paths if path in self.rows), reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            if row < self.loaded:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.paths[row]
+                self.loaded -= 1
+                self.endRemoveRows()
+            else:
+                del self.paths[row]
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+
+    def reload(self, images=None):
+        """Vuelve a leer todas las rutas (cuando cambia la base completa)"""
+        with span("list.rebuild") as timing:
+            self.beginResetModel()
+            if images is not None:
+                self.images = images
+            self.paths = list(self.images)
+            self.rows = {path: row for row, path in enumerate(self.paths)}
+            self.loaded = 0
+            self.accept = None
+            self.endResetModel()
+            timing.set(rows=len(self.paths))
+
+    def set_filter(self, paths, accept):
+        """
+        Muestra solo las rutas indicadas (resultado de una búsqueda, en orden).
+        accept (ruta -> bool) decide si se muestran las imágenes que se
+        guardan después. reload() quita el filtro.
+        """
+        with span("list.filter", rows=len(paths)):
+            self.beginResetModel()
+            self.paths = list(paths)
+            self.rows = {path: row for row, path in enumerate(self.paths)}
+            self.loaded = 0
+            self.accept = accept
+            self.endResetModel()
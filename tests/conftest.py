@@ -0,0 +1,49 @@
+"""
+Configuración común de las pruebas.
+
+Los módulos de la aplicación están en la raíz del repositorio; las pruebas
+que usan Qt trabajan sin pantalla (QT_QPA_PLATFORM=offscreen).
+"""
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """QCoreApplication para las pruebas con temporizadores o señales entre hilos"""
+    from PyQt5.QtCore import QCoreApplication
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+# ---------- Archivos PNG de prueba (se importan con "from conftest import ...") ----------
+
+# Canales por tipo de color de PNG
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def png_chunk(chunk_type, data):
+    """Bloque PNG con su longitud y CRC"""
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def png_bytes(width, height, bit_depth=8, color_type=2, chunks=()):
+    """PNG válido con píxeles a cero; chunks se añaden entre IHDR e IDAT"""
+    header = struct.pack('>IIBBBBB', width, height, bit_depth, color_type, 0, 0, 0)
+    row = (width * PNG_CHANNELS[color_type] * bit_depth + 7) // 8 + 1
+    return (b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) + b''.join(chunks)
+            + png_chunk(b'IDAT', zlib.compress(b'\0' * row * height)) + png_chunk(b'IEND', b''))
+
+
+def write_png(path, width=4, height=3, **options):
+    """Escribe un PNG y devuelve su ruta con separadores "/" (como las guarda la aplicación)"""
+    path = str(path)
+    with open(path, 'wb') as f:
+        f.write(png_bytes(width, height, **options))
+    return path.replace(os.sep, '/')
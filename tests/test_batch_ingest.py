@@ -0,0 +1,104 @@
+import os
+
+import batch_ingest
+import metadata_cli
+from conftest import write_png
+from metadata_store import JournalMetadataStore, open_store
+from batch_ingest import find_images, extract_many, has_changed, select_changed, refresh_records, is_stale
+
+
+def catalog(tmp_path, count=3):
+    folder = tmp_path / "fotos"
+    (folder / "sub").mkdir(parents=True)
+    for i in range(count):
+        write_png(folder / ("sub" if i % 2 else "") / f"{i}.png", width=4 + i)
+    (folder / "notas.txt").write_text("no es una imagen")
+    paths = find_images(str(folder))
+    results, errors = extract_many(paths, max_workers=1)
+    assert not errors
+    return paths, results
+
+
+def test_find_and_extract(tmp_path):
+    paths, results = catalog(tmp_path)
+    assert len(paths) == 3 and all(path.endswith(".png") for path in paths)
+    assert set(results) == set(paths)
+    assert results[paths[0]]['image_dimensions']['width_pixels'] == 4
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    paths, results = catalog(tmp_path)
+    assert select_changed(paths, results) == []
+    assert not has_changed(results[paths[0]], os.stat(paths[0]))
+
+    # Otro tamaño y otra fecha: hay que regenerar
+    write_png(paths[0], width=40)
+    os.utime(paths[0], (1_000_000_000, 1_000_000_000))
+    new = write_png(tmp_path / "fotos" / "nueva.png")
+    assert select_changed(paths + [new], results) == [paths[0], new]
+
+    # Formato antiguo sin huella
+    assert has_changed({"filename": "x.png"}, os.stat(new))
+
+
+def test_refresh_marks_missing_and_recovers(tmp_path):
+    paths, results = catalog(tmp_path)
+    moved = paths[1] + ".bak"
+    os.rename(paths[1], moved)
+    updated, errors = refresh_records(results, max_workers=1)
+    assert not errors
+    assert list(updated) == [paths[1]]
+    assert is_stale(updated[paths[1]])
+
+    # Vuelve a aparecer sin cambios: se quita la marca sin regenerar
+    results.update(updated)
+    os.rename(moved, paths[1])
+    updated, _errors = refresh_records(results, max_workers=1)
+    assert list(updated) == [paths[1]]
+    assert not is_stale(updated[paths[1]])
+    assert updated[paths[1]]['file_info'] == results[paths[1]]['file_info']
+
+
+def image_tree(tmp_path):
+    folder = tmp_path / "arbol"
+    for i in range(7):
+        directory = folder / f"d{i % 3}"
+        directory.mkdir(parents=True, exist_ok=True)
+        write_png(directory / f"{i}.png", width=4 + i)
+    (folder / "d0" / "rota.png").write_bytes(b"no es un png")
+    return folder
+
+
+def test_process_pool_merges_all_chunks(tmp_path, monkeypatch):
+    # Grupos de dos rutas: el lote se reparte entre varios procesos
+    monkeypatch.setattr(batch_ingest, "CHUNK_SIZE", 2)
+    paths = find_images(str(image_tree(tmp_path)))
+    progress = []
+    results, errors = extract_many(paths, max_workers=2, progress=lambda done, total: progress.append((done, total)))
+
+    serial, serial_errors = extract_many(paths, max_workers=1)
+    assert set(results) == set(serial) and len(results) == 7
+    for path, metadata in results.items():
+        assert metadata['image_dimensions'] == serial[path]['image_dimensions']
+    assert [path for path, _error in errors] == [path for path, _error in serial_errors]
+    assert errors[0][0].endswith("d0/rota.png")
+    assert progress[-1] == (8, 8)
+
+
+def test_batch_writes_the_store_once(tmp_path, monkeypatch):
+    # Los backups se crean junto al directorio actual
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch_ingest, "CHUNK_SIZE", 2)
+    writes = []
+    put_many = JournalMetadataStore.put_many
+
+    def counting_put_many(store, records):
+        writes.append(set(records))
+        return put_many(store, records)
+
+    monkeypatch.setattr(JournalMetadataStore, "put_many", counting_put_many)
+    folder = image_tree(tmp_path)
+    database = str(tmp_path / "base.json")
+    assert metadata_cli.main_batch([str(folder), "--db", database, "--workers", "2"]) == 0
+    assert writes == [set(find_images(str(folder))) - {str(folder / "d0" / "rota.png").replace(os.sep, '/')}]
+    assert len(open_store(database).load_index()) == 7
@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "bench_app.py")
+
+
+def test_benchmark_smoke(tmp_path):
+    output = tmp_path / "resultados.json"
+    environment = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    # En otro proceso: el benchmark crea su propia QApplication con ventanas
+    completed = subprocess.run(
+        [sys.executable, BENCHMARK, "--count", "2", "--size", "64x48", "--repeat", "1", "--output", str(output)],
+        cwd=str(tmp_path), env=environment, capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert report["corpus"]["count"] == 2 and report["repeat"] == 1
+    assert list(report["stages"]) == ["extract", "md5_loop", "hash_file", "save_metadata_to_file",
+                                      "create_backup", "update_saved_list", "load_metadata", "export_json"]
+    for stage in report["stages"].values():
+        assert set(stage) == {"samples", "items_per_sample", "throughput_per_s", "p50_ms", "p99_ms", "mean_ms"}
+    assert report["stages"]["extract"]["samples"] == 2
+
+    # Una comparación con resultados de la versión anterior (etapa save_metadata)
+    baseline = dict(report, stages=dict(report["stages"]))
+    baseline["stages"]["save_metadata"] = baseline["stages"].pop("extract")
+    (tmp_path / "base.json").write_text(json.dumps(baseline), encoding="utf-8")
+    completed = subprocess.run(
+        [sys.executable, BENCHMARK, "--count", "2", "--size", "64x48", "--repeat", "1",
+         "--output", str(tmp_path / "nuevo.json"), "--compare", str(tmp_path / "base.json"), "--threshold", "100"],
+        cwd=str(tmp_path), env=environment, capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    # La etapa aparece en el resumen y en la tabla de comparación
+    assert sum(line.startswith("extract ") for line in completed.stdout.splitlines()) == 2
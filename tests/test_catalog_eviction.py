@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from catalog_eviction import (eviction_order, select_evictions, enforce_limit, ColdArchive, ViewLog,
+                              archive_file_for)
+from metadata_extractor import expand_record, summary_record
+from metadata_store import open_store
+
+
+def facts(created, width=10):
+    return {"detected_format": "PNG", "bytes": 500, "width": width, "height": 10, "bits_per_pixel": 24,
+            "has_alpha": False, "created": created, "mtime": 1, "atime": 1, "ctime": created,
+            "mode": 0o100644, "inode": width, "os": "posix", "hash": f"{width:032x}", "hash_algorithm": "md5"}
+
+
+def summaries(tmp_path):
+    # b es la más antigua; c ya no existe en disco
+    created = {"a": "2026-03-01 00:00:00", "b": "2026-01-01 00:00:00", "c": "2026-02-01 00:00:00"}
+    result = {}
+    for name, date in created.items():
+        path = str(tmp_path / f"{name}.png")
+        if name != "c":
+            open(path, 'wb').close()
+        result[path] = summary_record(path, facts(date))
+    return result
+
+
+def names(paths):
+    return [os.path.basename(path)[0] for path in paths]
+
+
+def test_policies(tmp_path):
+    index = summaries(tmp_path)
+    assert names(eviction_order(index, "oldest")) == ["b", "c", "a"]
+    assert names(eviction_order(index, "missing_first")) == ["c", "b", "a"]
+    viewed = {str(tmp_path / "b.png"): "2026-05-01 00:00:00", str(tmp_path / "a.png"): "2026-04-01 00:00:00"}
+    # Las nunca abiertas van primero
+    assert names(eviction_order(index, "least_viewed", viewed)) == ["c", "a", "b"]
+    assert names(eviction_order(index, "oldest", protect=[str(tmp_path / "b.png")])) == ["c", "a", "b"]
+    with pytest.raises(ValueError):
+        eviction_order(index, "random")
+
+
+def test_select_evictions(tmp_path):
+    index = summaries(tmp_path)
+    assert names(select_evictions(index, 1)) == ["b", "c"]
+    assert select_evictions(index, 3) == []
+    # Sin límite
+    assert select_evictions(index, None) == []
+    assert select_evictions(index, 0) == []
+
+
+def test_enforce_limit_archives_evicted(tmp_path):
+    store = open_store(str(tmp_path / "base.json"), backup_dir=str(tmp_path / "backups"))
+    store.load_index()
+    records = {f"/f/{i}.png": expand_record(f"/f/{i}.png", facts(f"2026-01-0{i + 1} 00:00:00", 10 + i))
+               for i in range(4)}
+    store.put_many(records)
+    store.update_settings({"max_images": 2, "eviction_policy": "oldest"})
+
+    evicted = enforce_limit(store, store.load_index(), protect=["/f/0.png"])
+    assert evicted == ["/f/1.png", "/f/2.png"]
+    assert set(store.load_index()) == {"/f/0.png", "/f/3.png"}
+    archived = ColdArchive(archive_file_for(store.metadata_file)).load()
+    assert archived == {path: records[path] for path in evicted}
+
+
+def test_view_log_round_trip(tmp_path):
+    log = ViewLog(str(tmp_path / "base.views.json"))
+    log.touch("/f/a.png")
+    log.touch("/f/b.png")
+    log.forget(["/f/b.png"])
+    log.save()
+    assert list(ViewLog(log.views_file).last_viewed) == ["/f/a.png"]
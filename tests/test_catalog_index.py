@@ -0,0 +1,81 @@
+from catalog_index import CatalogIndex
+from metadata_extractor import expand_record, compact_record, summary_record
+
+
+def facts(width, **extra):
+    return dict({"detected_format": "PNG", "bytes": 1000 + width, "width": width, "height": 10,
+                 "bits_per_pixel": 24, "has_alpha": False, "created": "2026-01-01 00:00:00", "mtime": 1,
+                 "atime": 1, "ctime": "2026-01-01 00:00:00", "mode": 0o100644, "inode": width, "os": "posix",
+                 "hash": f"{width:032x}", "hash_algorithm": "md5"}, **extra)
+
+
+class FakeStore:
+    """Almacén en memoria que cuenta las lecturas de registros completos"""
+
+    def __init__(self, records):
+        self.records = records
+        self.reads = 0
+
+    def load_index(self):
+        return {path: summary_record(path, record) for path, record in self.records.items()}
+
+    def get(self, path):
+        self.reads += 1
+        record = self.records.get(path)
+        return expand_record(path, record) if record is not None else None
+
+
+def test_summary_has_the_same_shape_as_the_full_record():
+    record = facts(40, similarity={"dhash": "ab"}, embedded_metadata={"camera": {"make": "X"}})
+    full = expand_record("/f/a.png", record)
+    summary = summary_record("/f/a.png", record)
+    assert summary == summary_record("/f/a.png", full)
+    assert summary["similarity"] == {"dhash": "ab"}
+    assert "embedded_metadata" not in summary
+    for section, values in summary.items():
+        for key, value in values.items():
+            assert full[section][key] == value, (section, key)
+
+
+def test_reads_full_records_on_demand():
+    store = FakeStore({f"/f/{i}.png": facts(10 + i) for i in range(100)})
+    index = CatalogIndex(store)
+    assert len(index) == 100 and store.reads == 0
+    assert index["/f/3.png"]["image_dimensions"]["width_pixels"] == 13
+    index["/f/3.png"]
+    assert store.reads == 1
+    assert index.loaded("/f/3.png") is not None
+    assert index.loaded("/f/4.png") is None
+
+    # La caché tiene un tamaño fijo
+    for i in range(100):
+        index[f"/f/{i}.png"]
+    assert len(index.cache) == CatalogIndex.CACHE_SIZE
+
+
+def test_recent_saves_until_released():
+    store = FakeStore({"/f/a.png": facts(10)})
+    index = CatalogIndex(store)
+    new = expand_record("/f/b.png", facts(20))
+    index["/f/b.png"] = new
+    assert index["/f/b.png"] is new and store.reads == 0
+    assert index.summaries["/f/b.png"]["image_dimensions"]["width_pixels"] == 20
+
+    # El almacén escribió el registro: se vuelve a leer del disco
+    store.records["/f/b.png"] = compact_record(new)
+    index.release({"/f/b.png": new})
+    assert index["/f/b.png"] == new and store.reads == 1
+
+    # Un guardado posterior no se suelta con la versión anterior
+    newer = expand_record("/f/b.png", facts(30))
+    index["/f/b.png"] = newer
+    index.release({"/f/b.png": new})
+    assert index.loaded("/f/b.png") is newer
+
+
+def test_evict_keeps_paths_saved_again():
+    store = FakeStore({"/f/a.png": facts(10), "/f/b.png": facts(11)})
+    index = CatalogIndex(store)
+    index["/f/b.png"] = expand_record("/f/b.png", facts(12))
+    assert index.evict(["/f/a.png", "/f/b.png", "/f/c.png"]) == ["/f/a.png"]
+    assert list(index) == ["/f/b.png"]
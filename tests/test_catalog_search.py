@@ -0,0 +1,91 @@
+import random
+
+import catalog_search
+from catalog_search import SearchIndex, parse_query, name_parts
+
+
+def record(name, width, height, size, modified, alpha=False):
+    return {
+        "file_info": {"filename": name, "file_extension": name.rsplit(".", 1)[-1].upper()},
+        "image_dimensions": {"width_pixels": width, "height_pixels": height},
+        "file_size": {"bytes": size},
+        "color_info": {"has_alpha_channel": alpha},
+        "timestamps": {"unix_timestamp_modified": modified, "metadata_created": "2026-01-01 10:00:00"},
+    }
+
+
+def random_records(count, seed=1):
+    rng = random.Random(seed)
+    words = ["playa", "Montaña", "IMG", "foto", "vacaciones", "DSC"]
+    records = {}
+    for i in range(count):
+        name = f"{rng.choice(words)}_{rng.randint(1, 3000)}{rng.choice(['', '-editada'])}.{rng.choice(['jpg', 'png'])}"
+        records[f"/fotos/{i}/{name}"] = record(
+            name, rng.randint(100, 6000), rng.randint(100, 6000), rng.randint(1000, 20_000_000),
+            rng.randint(1_600_000_000, 1_800_000_000), rng.random() < 0.2)
+    return records
+
+
+QUERIES = ["", "playa", "pla 20", "montana ext:png", "img_1", "-editada", "editada mp>5",
+           "orientacion:vertical mb<2", "foto_2 alfa:si", "jpg", "zzz", "dsc_1 kb>100"]
+
+
+def brute_force(index, text):
+    query = parse_query(text)
+    return [path for path in index.names if index.matches(query, path)]
+
+
+def test_parse_query():
+    query = parse_query("Playa ext:png,jpg mp>10 modificada:2026-09")
+    assert query.words == ["playa"]
+    assert query.facets == {"extension": [(":", "png"), (":", "jpg")]}
+    assert query.ranges["megapixels"] == [(10.0, False, None, True)]
+    assert len(query.ranges["modified"]) == 1
+
+
+def test_name_parts():
+    assert name_parts("img_2024-07.jpg") == ["img_2024-07.jpg", "2024-07.jpg", "07.jpg", "jpg"]
+    assert name_parts("dsc0042.jpg") == ["dsc0042.jpg", "0042.jpg", "jpg"]
+    assert name_parts("") == []
+
+
+def test_name_search_matches_word_prefixes():
+    index = SearchIndex({
+        "/a/playa_2024.jpg": record("playa_2024.jpg", 10, 20, 100, 1),
+        "/a/laplaya.jpg": record("laplaya.jpg", 10, 20, 100, 1),
+        "/a/Montaña.png": record("Montaña.png", 10, 20, 100, 1),
+    })
+    assert index.search(parse_query("pla")) == ["/a/playa_2024.jpg"]
+    assert index.search(parse_query("2024")) == ["/a/playa_2024.jpg"]
+    assert index.search(parse_query("montana")) == ["/a/Montaña.png"]
+    assert index.search(parse_query("jpg")) == ["/a/playa_2024.jpg", "/a/laplaya.jpg"]
+
+
+def test_search_matches_brute_force():
+    index = SearchIndex(random_records(300))
+    for text in QUERIES:
+        assert index.search(parse_query(text)) == brute_force(index, text), text
+
+
+def test_updates_and_compaction_keep_results(monkeypatch):
+    monkeypatch.setattr(catalog_search, "COMPACT_MIN_FREE", 10)
+    records = random_records(200)
+    index = SearchIndex(records)
+    paths = list(records)
+    for path in paths[:150]:
+        index.remove(path)
+    # Se renumeró: no quedan posiciones libres de más
+    assert len(index.slot_paths) < 200
+    assert index.free * 2 <= len(index.slot_paths)
+    assert set(index.slot_paths) - {None} == set(paths[150:])
+
+    extra = random_records(40, seed=2)
+    index.add_many({"/nuevas" + path: metadata for path, metadata in extra.items()})
+    index.add(paths[160], record("renombrada_9.png", 10, 10, 10, 10))
+    assert list(index.names)[:50] == paths[150:]
+    for text in QUERIES + ["renombrada"]:
+        assert index.search(parse_query(text)) == brute_force(index, text), text
+    assert index.search(parse_query("renombrada")) == [paths[160]]
+
+    counts = index.facet_counts(parse_query("ext:png"))
+    assert sum(counts["extension"].values()) == len(index)
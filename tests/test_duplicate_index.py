@@ -0,0 +1,72 @@
+import random
+
+from duplicate_index import BKTree, DuplicateIndex, hamming, dhash_file
+
+
+def record(file_hash, dhash=None):
+    metadata = {"system_info": {"file_hash": file_hash, "hash_algorithm": "md5"}}
+    if dhash is not None:
+        metadata["similarity"] = {"dhash": f"{dhash:016x}"}
+    return metadata
+
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(3)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Algunos valores repetidos y otros a pocos bits de distancia
+    values += values[:5] + [value ^ (1 << rng.randrange(64)) for value in values[:20]]
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, f"img{i}")
+
+    for query in values[:30] + [rng.getrandbits(64)]:
+        for max_distance in (0, 3, 12):
+            expected = sorted((hamming(query, value), f"img{i}") for i, value in enumerate(values)
+                              if hamming(query, value) <= max_distance)
+            assert tree.search(query, max_distance) == expected
+
+    tree.discard(values[0], "img0")
+    assert (0, "img0") not in tree.search(values[0], 0)
+    assert (0, "img300") in tree.search(values[0], 0)
+
+
+def test_exact_duplicates():
+    index = DuplicateIndex({"a.jpg": record("h1"), "b.jpg": record("h1"), "c.jpg": record("h2"), "d.jpg": {}})
+    assert index.duplicates_of("a.jpg") == ["b.jpg"]
+    assert index.duplicates_of("d.jpg") == []
+    assert index.duplicate_groups() == [["a.jpg", "b.jpg"]]
+
+    # Cambia el contenido de b.jpg: deja de ser duplicado
+    index.add("b.jpg", record("h2"))
+    assert index.duplicate_groups() == [["b.jpg", "c.jpg"]]
+    index.remove("c.jpg")
+    assert index.duplicate_groups() == []
+
+
+def test_similar_images():
+    base = 0x0F0F_0F0F_0F0F_0F0F
+    index = DuplicateIndex({
+        "a.jpg": record("1", base),
+        "b.jpg": record("2", base ^ 0b111),
+        "c.jpg": record("3", base ^ 0b111 ^ (0b111 << 20)),
+        "d.jpg": record("4", ~base & (2 ** 64 - 1)),
+    })
+    assert index.similar_to("a.jpg", 5) == [(3, "b.jpg")]
+    assert index.similar_to("a.jpg", 6) == [(3, "b.jpg"), (6, "c.jpg")]
+    # b une a y c aunque a y c estén a 6 bits
+    assert index.similar_groups(3) == [["a.jpg", "b.jpg", "c.jpg"]]
+    assert index.similar_to("d.jpg") == []
+
+
+def test_dhash_file(qapp, tmp_path):
+    from PyQt5.QtGui import QImage, QColor
+
+    image = QImage(90, 80, QImage.Format_RGB32)
+    for x in range(90):
+        for y in range(80):
+            image.setPixelColor(x, y, QColor(255 - x * 2, 255 - x * 2, 255 - x * 2))
+    path = str(tmp_path / "degradado.png")
+    image.save(path)
+    # Cada píxel es más claro que su vecino derecho
+    assert dhash_file(path) == "f" * 16
+    assert dhash_file(str(tmp_path / "no_existe.png")) is None
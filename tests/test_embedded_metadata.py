@@ -0,0 +1,191 @@
+import json
+import struct
+
+from conftest import png_bytes, png_chunk
+from embedded_metadata import read_embedded, parse_tiff, parse_iptc, parse_xmp, build_section
+
+
+# ---------- Construcción de archivos de prueba ----------
+
+def ascii_value(text):
+    raw = text.encode() + b'\0'
+    return 2, len(raw), raw
+
+
+def rational_value(*pairs):
+    return 5, len(pairs), b''.join(struct.pack('<II', a, b) for a, b in pairs)
+
+
+def short_value(*values):
+    return 3, len(values), b''.join(struct.pack('<H', v) for v in values)
+
+
+def long_value(value):
+    return 4, 1, struct.pack('<I', value)
+
+
+def undefined_value(raw):
+    return 7, len(raw), raw
+
+
+def ifd(entries, start):
+    """IFD little endian en la posición start con sus datos a continuación"""
+    data_offset = start + 2 + len(entries) * 12 + 4
+    head = struct.pack('<H', len(entries))
+    data = b''
+    for tag, (value_type, count, raw) in entries:
+        head += struct.pack('<HHI', tag, value_type, count)
+        if len(raw) <= 4:
+            head += raw.ljust(4, b'\0')
+        else:
+            head += struct.pack('<I', data_offset + len(data))
+            data += raw + (b'\0' if len(raw) % 2 else b'')
+    return head + b'\0\0\0\0' + data
+
+
+def tiff(ifd0_entries, exif_entries=(), gps_entries=()):
+    """Estructura TIFF con IFD0 en 8, IFD Exif en 400 e IFD GPS en 700"""
+    ifd0_entries = list(ifd0_entries)
+    if exif_entries:
+        ifd0_entries.append((0x8769, long_value(400)))
+    if gps_entries:
+        ifd0_entries.append((0x8825, long_value(700)))
+    data = b'II*\0' + struct.pack('<I', 8) + ifd(ifd0_entries, 8)
+    if exif_entries:
+        data = data.ljust(400, b'\0') + ifd(exif_entries, 400)
+    if gps_entries:
+        data = data.ljust(700, b'\0') + ifd(gps_entries, 700)
+    return data
+
+
+def segment(marker, body):
+    return b'\xff' + bytes([marker]) + struct.pack('>H', len(body) + 2) + body
+
+
+def jpeg(*segments):
+    start_of_frame = segment(0xC0, struct.pack('>BHHB', 8, 480, 640, 3) + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01')
+    start_of_scan = segment(0xDA, b'\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00')
+    return b'\xff\xd8' + b''.join(segments) + start_of_frame + start_of_scan + b'\0' * 64 + b'\xff\xd9'
+
+
+XMP = (b'http://ns.adobe.com/xap/1.0/\0<?xpacket begin=""?><x:xmpmeta xmlns:x="adobe:ns:meta/">'
+       b'<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+       b'<rdf:Description xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:xmp="http://ns.adobe.com/xap/1.0/"'
+       b' xmp:Rating="4"><dc:title><rdf:Alt><rdf:li xml:lang="x-default">Atardecer</rdf:li></rdf:Alt></dc:title>'
+       b'<dc:subject><rdf:Bag><rdf:li>playa</rdf:li><rdf:li>verano</rdf:li></rdf:Bag></dc:subject>'
+       b'</rdf:Description></rdf:RDF></x:xmpmeta><?xpacket end="w"?>')
+
+
+def iptc_block(datasets):
+    return b''.join(b'\x1c\x02' + bytes([dataset]) + struct.pack('>H', len(value)) + value
+                    for dataset, value in datasets)
+
+
+def photoshop(iim):
+    return b'Photoshop 3.0\0' + b'8BIM' + struct.pack('>H', 0x0404) + b'\0\0' + struct.pack('>I', len(iim)) + iim
+
+
+CAMERA_TIFF = tiff(
+    [(0x010F, ascii_value("Canon")), (0x0110, ascii_value("EOS R6")), (0x0112, short_value(6))],
+    [(0x829A, rational_value((1, 250))), (0x829D, rational_value((8, 1))), (0x8827, short_value(100)),
+     (0x9003, ascii_value("2024:05:01 19:42:10")), (0x920A, rational_value((35, 1))),
+     (0x9209, short_value(16)), (0xA434, ascii_value("RF24-105mm"))],
+    [(1, ascii_value("N")), (2, rational_value((40, 1), (25, 1), (0, 1))),
+     (3, ascii_value("W")), (4, rational_value((3, 1), (42, 1), (1368, 100))), (6, rational_value((657, 1)))]
+)
+
+
+# ---------- Pruebas ----------
+
+def test_jpeg_with_exif_xmp_and_iptc(tmp_path):
+    path = tmp_path / "foto.jpg"
+    iim = iptc_block([(80, b'Ana'), (25, b'kw1'), (120, 'Descripción'.encode())])
+    path.write_bytes(jpeg(segment(0xE1, b'Exif\0\0' + CAMERA_TIFF), segment(0xE1, XMP), segment(0xED, photoshop(iim))))
+
+    section = read_embedded(str(path))
+    # XMP tiene preferencia sobre IPTC, e IPTC sobre EXIF
+    assert section["title"] == "Atardecer"
+    assert section["keywords"] == ["playa", "verano"]
+    assert section["author"] == "Ana"
+    assert section["description"] == "Descripción"
+    assert section["rating"] == 4
+    assert section["camera"] == {"make": "Canon", "model": "EOS R6", "lens": "RF24-105mm"}
+    assert section["orientation"] == 6
+    assert section["capture_date"] == "2024-05-01 19:42:10"
+    assert section["exposure"]["exposure_time"] == "1/250 s"
+    assert section["exposure"]["f_number"] == 8.0
+    assert section["exposure"]["iso"] == 100
+    assert section["exposure"]["flash"] is False
+    assert abs(section["gps"]["latitude"] - 40.4166667) < 1e-6
+    assert abs(section["gps"]["longitude"] + 3.7038) < 1e-6
+    assert section["gps"]["altitude"] == 657.0
+    assert section["sources"] == ["exif", "xmp", "iptc"]
+
+
+def test_png_text_and_exif(tmp_path):
+    path = tmp_path / "logo.png"
+    path.write_bytes(png_bytes(4, 4, color_type=6, chunks=[
+        png_chunk(b'tEXt', b'Title\0Logo'), png_chunk(b'iTXt', b'Author\0\0\0\0\0Luis'),
+        png_chunk(b'eXIf', CAMERA_TIFF)]))
+    section = read_embedded(str(path))
+    assert section["title"] == "Logo"
+    assert section["author"] == "Luis"
+    assert section["camera"]["make"] == "Canon"
+
+
+def test_big_endian_tiff():
+    data = b'MM\0*' + struct.pack('>I', 8) + struct.pack('>H', 1) + struct.pack('>HHI', 0x0112, 3, 1) \
+        + struct.pack('>H', 3) + b'\0\0' + b'\0\0\0\0'
+    exif, gps = parse_tiff(data)
+    assert exif == {"orientation": 3}
+    assert gps == {}
+
+
+def test_malformed_values_are_skipped():
+    # Racionales múltiples donde se espera uno, texto como bytes (tipo 7) y
+    # enteros como listas: no deben romper la extracción ni acabar en el registro
+    data = tiff(
+        [(0x013B, undefined_value(b'artista\xff\xfe')), (0x8298, undefined_value(b'\x00\x01\x02\x03\x04')),
+         (0x0131, short_value(1, 2)), (0x0112, rational_value((1, 2)))],
+        [(0x829A, rational_value((1, 250), (1, 125))), (0x829D, rational_value((8, 1), (4, 1))),
+         (0x8822, short_value(1, 2)), (0x9207, short_value(1, 2)), (0x9209, rational_value((1, 1))),
+         (0x9011, undefined_value(b'+02:00\0\0')), (0x9003, ascii_value("2024:05:01 19:42:10"))]
+    )
+    section = build_section([("exif", data)])
+    json.dumps(section)
+    assert "author" not in section
+    assert "copyright" not in section
+    assert "software" not in section
+    assert "orientation" not in section
+    assert "capture_offset" not in section
+    assert "exposure" not in section
+    assert section["capture_date"] == "2024-05-01 19:42:10"
+
+
+def test_zero_and_infinite_rationals():
+    data = tiff([], [(0x829A, rational_value((1, 0))), (0x829D, (11, 1, struct.pack('<f', float('inf'))))])
+    section = build_section([("exif", data)])
+    json.dumps(section)
+    assert "exposure" not in section
+
+
+def test_truncated_and_damaged_files(tmp_path):
+    good = jpeg(segment(0xE1, b'Exif\0\0' + CAMERA_TIFF))
+    truncated = tmp_path / "cortado.jpg"
+    truncated.write_bytes(good[:120])
+    json.dumps(read_embedded(str(truncated)))
+
+    damaged = tmp_path / "danado.jpg"
+    damaged.write_bytes(jpeg(segment(0xE1, b'Exif\0\0II*\0\xff\xff\xff\xff')))
+    assert read_embedded(str(damaged)) == {}
+
+    assert read_embedded(str(tmp_path / "no_existe.jpg")) == {}
+
+
+def test_iptc_dates_and_keywords():
+    values = parse_iptc(iptc_block([(55, b'20240501'), (25, b'uno'), (25, b'dos')]))
+    assert values == {"date": "2024-05-01", "keywords": ["uno", "dos"]}
+
+
+def test_xmp_without_packet_is_ignored():
+    assert parse_xmp(b'<html>no es xmp</html>') == {}
@@ -0,0 +1,53 @@
+import hashlib
+
+import pytest
+
+import file_hashing
+from file_hashing import available_algorithms, new_hasher, hash_file, hash_files, stored_hash
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "datos.bin"
+    # Más grande que el búfer de prueba y no múltiplo de él
+    path.write_bytes(bytes(range(256)) * 41 + b'fin')
+    return path
+
+
+@pytest.mark.parametrize("algorithm", ["md5", "sha256", "blake2b"])
+def test_matches_hashlib(data_file, algorithm):
+    expected = hashlib.new(algorithm, data_file.read_bytes()).hexdigest()
+    assert hash_file(str(data_file), algorithm) == expected
+    assert hash_file(str(data_file), algorithm, buffer_size=1000) == expected
+
+
+def test_mmap_path(data_file, monkeypatch):
+    monkeypatch.setattr(file_hashing, "MMAP_THRESHOLD", 1024)
+    assert hash_file(str(data_file)) == hashlib.md5(data_file.read_bytes()).hexdigest()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "vacio.bin"
+    path.write_bytes(b'')
+    assert hash_file(str(path), "sha256") == hashlib.sha256(b'').hexdigest()
+
+
+def test_hash_files_reports_unreadable(data_file, tmp_path):
+    missing = str(tmp_path / "no_existe.bin")
+    hashes = hash_files([str(data_file), missing], "md5", max_workers=2)
+    assert hashes == {str(data_file): hash_file(str(data_file)), missing: None}
+
+
+def test_algorithms():
+    assert {"md5", "sha256", "blake2b"} <= set(available_algorithms())
+    for algorithm in available_algorithms():
+        assert new_hasher(algorithm).hexdigest()
+    with pytest.raises(ValueError):
+        new_hasher("crc0")
+
+
+def test_stored_hash():
+    assert stored_hash({"system_info": {"file_hash": "ab", "hash_algorithm": "sha256"}}) == ("sha256", "ab")
+    # Registros anteriores solo tienen el MD5
+    assert stored_hash({"system_info": {"file_hash_md5": "cd"}}) == ("md5", "cd")
+    assert stored_hash({}) == ("md5", None)
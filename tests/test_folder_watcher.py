@@ -0,0 +1,68 @@
+import os
+
+import conftest
+from batch_ingest import extract_many, find_images, sync_changes, is_stale
+from folder_watcher import FolderWatcher, list_watch_paths, is_under
+
+
+def write_png(path, width=4):
+    # Un tamaño distinto por ancho: el inodo de un archivo borrado se puede reutilizar
+    return conftest.write_png(path, width, chunks=[conftest.png_chunk(b'tEXt', b'x' * width)])
+
+
+def test_is_under():
+    assert is_under("/fotos/a.jpg", ["/fotos"])
+    assert is_under("/fotos", ["/fotos"])
+    assert not is_under("/fotos2/a.jpg", ["/fotos"])
+
+
+def test_list_watch_paths(tmp_path):
+    root = tmp_path / "fotos"
+    (root / "sub").mkdir(parents=True)
+    inside = write_png(root / "sub" / "a.png")
+    outside = write_png(tmp_path / "b.png")
+    root_path = str(root).replace(os.sep, '/')
+    directories, files = list_watch_paths([root_path], [inside, outside, root_path + "/borrada.png"])
+    assert sorted(directories) == [root_path, root_path + "/sub"]
+    assert files == [inside]
+
+
+def test_sync_changes(tmp_path):
+    root = tmp_path / "fotos"
+    root.mkdir()
+    kept = write_png(root / "kept.png", 4)
+    moved = write_png(root / "moved.png", 5)
+    deleted = write_png(root / "deleted.png", 6)
+    images, errors = extract_many(find_images(str(root)), max_workers=1)
+    assert not errors
+
+    # Renombrado, borrado, imagen nueva y carpeta nueva con una imagen
+    renamed = str(root / "renamed.png").replace(os.sep, '/')
+    os.rename(moved, renamed)
+    os.remove(deleted)
+    added = write_png(root / "added.png", 7)
+    (root / "nueva").mkdir()
+    nested = write_png(root / "nueva" / "n.png", 8)
+
+    root_path = str(root).replace(os.sep, '/')
+    updated, removed, errors, new_directories = sync_changes([root_path], set(), images, watched=[root_path])
+    assert not errors
+    assert removed == [moved]
+    assert set(updated) == {renamed, added, nested, deleted}
+    assert is_stale(updated[deleted])
+    assert kept not in updated
+    assert new_directories == [root_path + "/nueva"]
+
+
+def test_watcher_coalesces_notifications(qapp):
+    watcher = FolderWatcher(delay=10_000)
+    batches = []
+    watcher.changed.connect(lambda directories, files: batches.append((directories, files)))
+    watcher.on_directory_changed("/fotos")
+    watcher.on_directory_changed("/fotos")
+    watcher.on_file_changed("/fotos/a.png")
+    assert watcher.timer.isActive() and not batches
+    watcher.flush()
+    assert batches == [({"/fotos"}, {"/fotos/a.png"})]
+    watcher.flush()
+    assert len(batches) == 1
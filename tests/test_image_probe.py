@@ -0,0 +1,75 @@
+import struct
+
+import pytest
+
+from conftest import png_bytes, png_chunk
+from image_probe import probe_image, decode_fallback
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_png(tmp_path):
+    rgba = write(tmp_path, "rgba.png", png_bytes(640, 480, 8, 6))
+    assert probe_image(rgba, fallback=False) == {
+        "width": 640, "height": 480, "bits_per_pixel": 32, "has_alpha": True, "format": "PNG"}
+
+    # Paleta con transparencia en tRNS, después de otros bloques
+    palette = write(tmp_path, "paleta.png", png_bytes(16, 8, 4, 3, [png_chunk(b'PLTE', b'\0' * 6), png_chunk(b'tRNS', b'\0')]))
+    info = probe_image(palette, fallback=False)
+    assert (info["width"], info["bits_per_pixel"], info["has_alpha"]) == (16, 4, True)
+
+    gray = write(tmp_path, "gris.png", png_bytes(3, 3, 16, 0))
+    assert probe_image(gray, fallback=False)["has_alpha"] is False
+
+
+def test_jpeg_skips_segments_and_fill_bytes(tmp_path):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\0' + b'\0' * 9
+    sof = b'\xff\xc2' + struct.pack('>HBHHB', 17, 8, 1080, 1920, 3) + b'\0' * 9
+    data = b'\xff\xd8' + app0 + b'\xff\xff' + sof[1:] + b'\xff\xda'
+    info = probe_image(write(tmp_path, "foto.jpg", data), fallback=False)
+    assert info == {"width": 1920, "height": 1080, "bits_per_pixel": 24, "has_alpha": False, "format": "JPEG"}
+
+
+def test_bmp_headers(tmp_path):
+    masks = struct.pack('<IIII', 0xFF, 0xFF00, 0xFF0000, 0xFF000000)
+    info_header = struct.pack('<IiiHHI', 56, 300, -200, 1, 32, 3) + b'\0' * 20 + masks
+    info = probe_image(write(tmp_path, "alfa.bmp", b'BM' + b'\0' * 12 + info_header), fallback=False)
+    assert info == {"width": 300, "height": 200, "bits_per_pixel": 32, "has_alpha": True, "format": "BMP"}
+
+    core = struct.pack('<IHHHH', 12, 40, 30, 1, 24)
+    assert probe_image(write(tmp_path, "os2.bmp", b'BM' + b'\0' * 12 + core), fallback=False)["width"] == 40
+
+
+def test_gif_transparency(tmp_path):
+    header = b'GIF89a' + struct.pack('<HHBBB', 120, 90, 0x80 | 0x02, 0, 0) + b'\0' * 3 * 8
+    comment = b'\x21\xfe\x03abc\x00'
+    control = b'\x21\xf9\x04\x01\x00\x00\x00\x00'
+    info = probe_image(write(tmp_path, "anim.gif", header + comment + control + b'\x2c'), fallback=False)
+    assert info == {"width": 120, "height": 90, "bits_per_pixel": 3, "has_alpha": True, "format": "GIF"}
+
+
+def test_unreadable_files(tmp_path):
+    assert probe_image(str(tmp_path / "no_existe.png")) is None
+    assert probe_image(write(tmp_path, "cortado.png", png_bytes(10, 10, 8, 2)[:20]), fallback=False) is None
+    # JPEG que termina antes del SOF
+    assert probe_image(write(tmp_path, "sin_sof.jpg", b'\xff\xd8\xff\xd9'), fallback=False) is None
+    assert probe_image(write(tmp_path, "texto.png", b'no es una imagen'), fallback=False) is None
+
+
+@pytest.mark.parametrize("image_format, qt_format", [("PNG", "ARGB32"), ("JPEG", "RGB32"), ("BMP", "RGB32")])
+def test_headers_agree_with_qt(qapp, tmp_path, image_format, qt_format):
+    from PyQt5.QtGui import QImage, QColor
+
+    image = QImage(37, 23, getattr(QImage, "Format_" + qt_format))
+    image.fill(QColor(10, 200, 30, 128))
+    path = str(tmp_path / f"qt.{image_format.lower()}")
+    assert image.save(path, image_format)
+
+    probed = probe_image(path, fallback=False)
+    decoded = decode_fallback(path)
+    assert (probed["width"], probed["height"]) == (decoded["width"], decoded["height"]) == (37, 23)
+    assert probed["has_alpha"] == decoded["has_alpha"]
@@ -0,0 +1,81 @@
+import os
+
+from incremental_backup import IncrementalBackup
+
+HEADER = {"version": "2.0", "settings": {}}
+
+
+def record(value):
+    return {"file_info": {"filename": value}}
+
+
+def test_full_then_delta_restores_latest_state(tmp_path):
+    backups = IncrementalBackup(str(tmp_path / "backups"))
+    images = {"a.jpg": record("a"), "b.jpg": record("b")}
+    first = backups.backup(images, HEADER)
+    assert ".full." in first
+
+    images["a.jpg"] = record("a2")
+    del images["b.jpg"]
+    images["c.jpg"] = record("c")
+    backups.note_changes(changed=["a.jpg", "c.jpg"], removed=["b.jpg"])
+    second = backups.backup(images, HEADER)
+    assert ".delta." in second
+
+    header, restored = backups.restore()
+    assert restored == images
+    assert header == HEADER
+    # El primer backup sigue disponible por fecha
+    _, old = backups.restore(first[len("metadata_backup_"):].split(".")[0])
+    assert old == {"a.jpg": record("a"), "b.jpg": record("b")}
+
+
+def test_unchanged_records_share_objects(tmp_path):
+    backups = IncrementalBackup(str(tmp_path / "backups"))
+    images = {"a.jpg": record("x"), "b.jpg": record("x")}
+    backups.backup(images, HEADER)
+    objects = [name for _, _, names in os.walk(backups.objects_dir) for name in names]
+    assert len(objects) == 1
+
+
+def test_cleanup_keeps_last_chains(tmp_path):
+    backups = IncrementalBackup(str(tmp_path / "backups"))
+    images = {}
+    for i in range(4):
+        images[f"{i}.jpg"] = record(str(i))
+        backups.note_reset()
+        backups.backup(images, HEADER, {"keep_full": 2})
+    assert len(backups.list_manifests()) == 2
+    _, restored = backups.restore()
+    assert restored == images
+
+
+def test_pending_changes_survive_a_crash(tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    backups = IncrementalBackup(backup_dir)
+    images = {"a.jpg": record("a")}
+    backups.backup(images, HEADER)
+    assert not os.path.exists(backups.pending_file)
+
+    # Cambio sin backup y el proceso termina sin llegar a hacerlo
+    images["b.jpg"] = record("b")
+    backups.note_changes(changed=["b.jpg"])
+    assert os.path.exists(backups.pending_file)
+
+    images["c.jpg"] = record("c")
+    reopened = IncrementalBackup(backup_dir)
+    assert reopened.pending()
+    reopened.note_changes(changed=["c.jpg"])
+    name = reopened.backup(images, HEADER)
+    # El delta solo conocería c.jpg: el backup tiene que ser completo
+    assert ".full." in name
+    assert not os.path.exists(reopened.pending_file)
+    _, restored = reopened.restore()
+    assert restored == images
+
+    # Sin cambios pendientes, la siguiente sesión sigue con deltas
+    again = IncrementalBackup(backup_dir)
+    assert not again.pending()
+    images["d.jpg"] = record("d")
+    again.note_changes(changed=["d.jpg"])
+    assert ".delta." in again.backup(images, HEADER)
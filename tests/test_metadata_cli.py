@@ -0,0 +1,35 @@
+import json
+
+import metadata_cli
+from metadata_store import open_store
+
+
+def record(name):
+    return {"file_info": {"filename": name, "extension": ".jpg"}}
+
+
+def test_key_finder_matches_batch_and_scan_keys(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    absolute = str(tmp_path / "otra" / "b.jpg").replace("\\", "/")
+    find = metadata_cli.key_finder({"fotos/a.jpg": {}, absolute: {}})
+    # --batch guarda la ruta tal como se indicó la carpeta
+    assert find("fotos/a.jpg") == "fotos/a.jpg"
+    assert find("./fotos/a.jpg") == "fotos/a.jpg"
+    assert find(str(tmp_path / "fotos" / "a.jpg")) == "fotos/a.jpg"
+    # scan guarda rutas absolutas
+    assert find("otra/b.jpg") == absolute
+    assert find("fotos/c.jpg") is None
+
+
+def test_show_finds_records_saved_by_batch(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    store = open_store("db.json")
+    store.load_index()
+    store.put_many({"fotos/a.jpg": record("a.jpg")})
+    store.flush_backups()
+
+    status = metadata_cli.main(["show", "./fotos/a.jpg", "--db", "db.json", "--fields", "file_info.filename"])
+    assert status == 0
+    shown = json.loads(capsys.readouterr().out)
+    assert list(shown) == ["fotos/a.jpg"]
+    assert shown["fotos/a.jpg"]["file_info"]["filename"] == "a.jpg"
@@ -0,0 +1,89 @@
+import csv
+import json
+
+import pytest
+
+import metadata_export
+from metadata_export import (export_records, format_from_filename, pick_fields, flatten_record,
+                             record_filter, available_formats)
+
+IMAGES = {
+    "/fotos/a.png": {
+        "file_info": {"filename": "a.png", "file_extension": "PNG"},
+        "image_dimensions": {"width_pixels": 4000, "height_pixels": 3000, "megapixels": 12.0},
+        "aspect_ratio": {"orientation": "Horizontal (Landscape)"},
+        "statistics": {"compression_ratio_estimate": 4.5},
+        "embedded_metadata": {"keywords": ["playa", "sol"]},
+    },
+    "/fotos/ñ.jpg": {
+        "file_info": {"filename": "ñ.jpg", "file_extension": "JPG"},
+        "image_dimensions": {"width_pixels": 300, "height_pixels": 600, "megapixels": 0.18},
+        "aspect_ratio": {"orientation": "Vertical (Portrait)"},
+        "statistics": {"compression_ratio_estimate": "N/A"},
+        "catalog_status": {"stale": True},
+    },
+}
+
+
+def test_formats_from_filename():
+    assert format_from_filename("salida.CSV") == "csv"
+    assert format_from_filename("lineas.ndjson") == "jsonl"
+    assert format_from_filename("sin_extension") == "json"
+    assert {"json", "jsonl", "csv"} <= set(available_formats())
+
+
+def test_pick_and_flatten():
+    picked = pick_fields(IMAGES["/fotos/a.png"], ["file_info.filename", "statistics", "falta.campo"])
+    assert picked == {"file_info": {"filename": "a.png"}, "statistics": {"compression_ratio_estimate": 4.5}}
+    flat = flatten_record(IMAGES["/fotos/a.png"])
+    assert flat["image_dimensions.width_pixels"] == 4000
+    assert flat["embedded_metadata.keywords"] == '["playa", "sol"]'
+
+
+def test_json_matches_source(tmp_path):
+    target = str(tmp_path / "base.json")
+    assert export_records(IMAGES, target) == 2
+    with open(target, encoding="utf-8") as f:
+        assert json.load(f) == IMAGES
+
+
+def test_jsonl_with_fields_and_filter(tmp_path):
+    target = str(tmp_path / "base.jsonl")
+    accept = record_filter(include_stale=False)
+    assert export_records(IMAGES, target, fields=["file_info.filename"], accept=accept) == 1
+    with open(target, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == [{"path": "/fotos/a.png", "file_info": {"filename": "a.png"}}]
+
+    assert record_filter(extension="jpg")("/fotos/ñ.jpg", IMAGES["/fotos/ñ.jpg"])
+    assert not record_filter(min_megapixels=1)("/fotos/ñ.jpg", IMAGES["/fotos/ñ.jpg"])
+
+
+def test_csv_has_union_of_columns(tmp_path):
+    target = str(tmp_path / "base.csv")
+    progress = []
+    assert export_records(IMAGES, target, progress=lambda done, total: progress.append((done, total))) == 2
+    assert progress[-1] == (2, 2)
+    with open(target, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["path"] == "/fotos/a.png"
+    assert rows[1]["file_info.filename"] == "ñ.jpg"
+    assert rows[0]["catalog_status.stale"] == ""
+    assert rows[1]["statistics.compression_ratio_estimate"] == "N/A"
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        export_records(IMAGES, str(tmp_path / "x.xml"), "xml")
+
+
+def test_parquet(tmp_path):
+    if metadata_export.pyarrow is None:
+        with pytest.raises(ValueError):
+            export_records(IMAGES, str(tmp_path / "x.parquet"))
+        return
+    target = str(tmp_path / "x.parquet")
+    assert export_records(IMAGES, target) == 2
+    table = metadata_export.pyarrow.parquet.read_table(target)
+    # Tipos mezclados en una columna: se guarda como texto
+    assert table.column("statistics.compression_ratio_estimate").to_pylist() == ["4.5", "N/A"]
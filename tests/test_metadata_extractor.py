@@ -0,0 +1,62 @@
+from conftest import write_png
+from metadata_extractor import build_metadata, compact_record, expand_record, is_compact
+
+FACTS = {
+    "detected_format": "JPEG", "bytes": 2_345_678, "width": 4000, "height": 3000, "bits_per_pixel": 24,
+    "has_alpha": False, "created": "2026-01-02 03:04:05", "mtime": 1_700_000_000, "atime": 1_700_000_100,
+    "ctime": "2023-11-14 22:13:20", "mode": 0o100644, "inode": 1234, "os": "posix",
+    "hash": "0" * 64, "hash_algorithm": "sha256",
+}
+
+
+def test_compact_then_expand_is_lossless():
+    full = expand_record("/fotos/viaje/playa.jpg", FACTS)
+    assert full["file_info"]["filename"] == "playa.jpg"
+    assert full["image_dimensions"]["megapixels"] == 12.0
+    assert full["aspect_ratio"]["ratio"] == "4:3"
+    assert full["system_info"]["hash_algorithm"] == "sha256"
+    assert compact_record(full) == FACTS
+    assert expand_record("/fotos/viaje/playa.jpg", compact_record(full)) == full
+
+
+def test_extra_sections_are_kept():
+    record = dict(FACTS, similarity={"dhash": "ff" * 8}, catalog_status={"stale": True},
+                  embedded_metadata={"camera": {"make": "Canon"}})
+    full = expand_record("/a.jpg", record)
+    assert full["similarity"] == {"dhash": "ff" * 8}
+    assert full["embedded_metadata"]["camera"]["make"] == "Canon"
+    assert compact_record(full) == record
+
+
+def test_values_that_do_not_derive_are_stored():
+    full = expand_record("/a.jpg", FACTS)
+    # Fecha escrita en otra zona horaria y relación de compresión de una versión anterior
+    full["timestamps"]["file_modified"] = "1999-01-01 00:00:00"
+    full["statistics"]["compression_ratio_estimate"] = 3.5
+    compact = compact_record(full)
+    assert compact["modified"] == "1999-01-01 00:00:00"
+    assert compact["compression_ratio"] == 3.5
+    assert expand_record("/a.jpg", compact) == full
+
+
+def test_windows_paths():
+    full = expand_record("C:\\Fotos\\IMG_1.JPG", dict(FACTS, os="nt"))
+    assert full["file_info"]["filename"] == "IMG_1.JPG"
+    assert full["file_info"]["directory"] == "C:\\Fotos"
+    assert full["file_info"]["drive"] == "C:"
+
+
+def test_old_formats_pass_through():
+    old = {"filename": "a.jpg", "resolution": "10x10"}
+    assert compact_record(old) is old
+    assert expand_record("a.jpg", old) is old
+    assert not is_compact(old)
+
+
+def test_built_record_round_trip(tmp_path):
+    path = write_png(tmp_path / "x.png", 6, 2, color_type=6)
+    full = build_metadata(path, hash_algorithm="md5")
+    compact = compact_record(full)
+    assert is_compact(compact)
+    assert expand_record(path, compact) == full
+    assert len(str(compact)) < len(str(full)) / 2
@@ -0,0 +1,188 @@
+import os
+import json
+
+import pytest
+
+from conftest import write_png
+from metadata_extractor import build_metadata
+from metadata_store import open_store, JournalMetadataStore
+
+
+def png_record(directory, name, width=4, height=3):
+    """Registro real de un PNG mínimo (la cabecera basta para extraerlo)"""
+    path = write_png(os.path.join(str(directory), name), width, height, color_type=6)
+    return path, build_metadata(path)
+
+
+@pytest.fixture
+def records(tmp_path):
+    images = tmp_path / "fotos"
+    images.mkdir()
+    return dict(png_record(images, f"{i}.png", width=4 + i) for i in range(3))
+
+
+def open_in(tmp_path, name, **options):
+    store = open_store(str(tmp_path / name), backup_dir=str(tmp_path / "backups"), **options)
+    store.load_index()
+    return store
+
+
+@pytest.mark.parametrize("name", ["base.json", "base.db"])
+def test_records_survive_reopening(tmp_path, records, name):
+    store = open_in(tmp_path, name)
+    store.put_many(records)
+    first = next(iter(records))
+    store.remove(first)
+    if hasattr(store, "close"):
+        store.close()
+
+    reopened = open_store(str(tmp_path / name), backup_dir=str(tmp_path / "backups"))
+    index = reopened.load_index()
+    assert set(index) == set(records) - {first}
+    for path in index:
+        assert reopened.get(path) == records[path]
+    assert reopened.get(first) is None
+
+
+@pytest.mark.parametrize("name", ["base.json", "base.db"])
+def test_remove_reports_only_existing_rows(tmp_path, records, name):
+    store = open_in(tmp_path, name)
+    store.put_many(records)
+    store.create_backup()
+    path = next(iter(records))
+
+    store.remove_many([path, "fotos/no_existe.png"])
+    assert store.backups.removed == {path}
+    store.remove("fotos/otra.png")
+    assert store.backups.removed == {path}
+
+
+def test_journal_replays_and_ignores_damaged_line(tmp_path, records):
+    store = open_in(tmp_path, "base.json")
+    store.put_many(records)
+    assert os.path.exists(store.journal_file)
+    # Cierre inesperado a mitad de una línea
+    with open(store.journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"op": "put", "path": "fotos/cor')
+
+    reopened = JournalMetadataStore(store.metadata_file, backup_dir=str(tmp_path / "backups"))
+    index = reopened.load_index()
+    assert set(index) == set(records)
+    # El diario dañado se compacta en la instantánea
+    assert not os.path.exists(reopened.journal_file)
+    assert all(reopened.get(path) == record for path, record in records.items())
+
+
+def test_journal_compacts_after_limit(tmp_path, records):
+    store = JournalMetadataStore(str(tmp_path / "base.json"), backup_dir=str(tmp_path / "backups"),
+                                 compact_every=2)
+    store.load_index()
+    paths = list(records)
+    store.put(paths[0], records[paths[0]])
+    assert store.journal_entries == 1
+    store.put(paths[1], records[paths[1]])
+    assert store.journal_entries == 0
+    assert not os.path.exists(store.journal_file)
+    assert set(open_in(tmp_path, "base.json").load_index()) == set(paths[:2])
+
+
+def test_journal_replays_entries_in_order(tmp_path, records):
+    store = open_in(tmp_path, "base.json")
+    first, second, third = records
+    store.put(first, records[first])
+    store.remove_many([first, second])
+    store.put_many({second: records[second], third: records[third]})
+    store.put(first, records[first])
+    # Cada guardado añade líneas al diario sin reescribir la instantánea
+    with open(store.journal_file, encoding='utf-8') as f:
+        assert [json.loads(line)["op"] for line in f] == ["put", "delete", "put", "put", "put"]
+
+    reopened = JournalMetadataStore(store.metadata_file, backup_dir=str(tmp_path / "backups"))
+    assert list(reopened.load_index()) == [second, third, first]
+    assert reopened.get(first) == records[first]
+
+
+def test_journal_settings_survive_reopening(tmp_path, records):
+    store = open_in(tmp_path, "base.json")
+    store.put_many(records)
+    store.update_settings({"max_images": 10})
+    # Los campos generales solo están en la instantánea: se compacta
+    assert not os.path.exists(store.journal_file)
+    assert open_in(tmp_path, "base.json").settings()["max_images"] == 10
+
+
+def test_sqlite_failed_save_keeps_catalogue(tmp_path, records, monkeypatch):
+    store = open_in(tmp_path, "base.db")
+    store.put_many(records)
+    store.create_backup()
+    broken = list(records)[-1]
+    row = store._row
+
+    def failing_row(path, metadata):
+        if path == broken:
+            raise ValueError("registro dañado")
+        return row(path, metadata)
+
+    monkeypatch.setattr(store, "_row", failing_row)
+    with pytest.raises(ValueError):
+        store.save(records)
+    # Ni se vació la base ni se anotó un estado nuevo para el backup
+    assert store.count() == len(records)
+    assert not store.backups.needs_full and not store.backups.pending()
+    store.close()
+
+
+def open_files():
+    directory = "/proc/self/fd"
+    links = []
+    for name in os.listdir(directory):
+        try:
+            links.append(os.readlink(os.path.join(directory, name)))
+        except OSError:
+            pass
+    return links
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="necesita /proc")
+def test_iter_records_keeps_no_file_open_between_chunks(tmp_path, records, monkeypatch):
+    monkeypatch.setattr("metadata_store.ITER_CHUNK", 1)
+    store = open_in(tmp_path, "base.json")
+    store.put_many(records)
+    store.compact()
+    first, second, third = records
+
+    iterator = store.iter_records()
+    assert next(iterator) == (first, records[first])
+    assert store.metadata_file not in open_files()
+    # Cambios durante el recorrido: se leen con las posiciones nuevas
+    store.remove(second)
+    store.compact()
+    assert list(iterator) == [(third, records[third])]
+
+
+@pytest.mark.parametrize("backend", ["json", "journal"])
+def test_failed_put_is_not_kept(tmp_path, records, monkeypatch, backend):
+    store = open_store(str(tmp_path / "base.json"), backend=backend, backup_dir=str(tmp_path / "backups"))
+    store.load_index()
+    first, second, third = records
+    store.put(first, records[first])
+    if backend == "json":
+        monkeypatch.setattr(store, "write_file", lambda: False)
+    else:
+        # El diario no se puede abrir para añadir
+        store.compact()
+        os.mkdir(store.journal_file)
+    with pytest.raises(OSError):
+        store.put_many({second: records[second]})
+    with pytest.raises(OSError):
+        store.remove(first)
+    assert store.get(second) is None
+    assert store.get(first) == records[first]
+    assert [path for path, _ in store.iter_records()] == [first]
+
+    monkeypatch.undo()
+    if backend == "journal":
+        os.rmdir(store.journal_file)
+    store.put(third, records[third])
+    store.save_header()
+    assert list(open_in(tmp_path, "base.json").load_index()) == [first, third]
@@ -0,0 +1,69 @@
+import json
+import logging
+
+import pytest
+
+import perf_trace
+from perf_trace import Tracer
+
+
+def test_spans_and_counters():
+    tracer = Tracer(max_events=3)
+    for i in range(5):
+        with tracer.span("guardar", registros=i) as timing:
+            timing.set(archivo="base.json")
+    tracer.count("cache.hit")
+    tracer.count("cache.hit", 2)
+
+    stats, counters, events = tracer.snapshot()
+    assert stats["guardar"][0] == 5
+    assert stats["guardar"][2] >= stats["guardar"][3] >= 0
+    assert counters == {"cache.hit": 3}
+    # Solo se conservan los últimos max_events
+    assert [args["registros"] for _name, _start, _duration, _thread, args in events] == [2, 3, 4]
+    assert events[-1][4]["archivo"] == "base.json"
+
+
+def test_errors_are_recorded():
+    tracer = Tracer()
+    with pytest.raises(KeyError):
+        with tracer.span("leer"):
+            raise KeyError("x")
+    assert tracer.snapshot()[2][-1][4] == {"error": "KeyError"}
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    tracer.enabled = False
+    with tracer.span("nada"):
+        pass
+    tracer.count("nada")
+    assert tracer.snapshot() == ({}, {}, [])
+
+
+def test_chrome_trace(tmp_path):
+    tracer = Tracer()
+    with tracer.span("exportar", formato="csv"):
+        pass
+    tracer.count("exportadas", 7)
+    target = str(tmp_path / "traza.json")
+    assert tracer.write_chrome_trace(target) == 1
+    with open(target, encoding="utf-8") as f:
+        trace = json.load(f)["traceEvents"]
+    assert trace[0]["name"] == "exportar" and trace[0]["ph"] == "X" and trace[0]["args"] == {"formato": "csv"}
+    assert trace[1]["args"] == {"exportadas": 7}
+
+
+def test_log_lines(tmp_path):
+    target = str(tmp_path / "tiempos.jsonl")
+    handler = perf_trace.enable_log(target)
+    try:
+        with perf_trace.span("prueba.log", filas=3):
+            pass
+    finally:
+        perf_trace.logger.removeHandler(handler)
+        perf_trace.logger.setLevel(logging.NOTSET)
+        handler.close()
+    with open(target, encoding="utf-8") as f:
+        line = json.loads(f.readlines()[-1])
+    assert line["op"] == "prueba.log" and line["filas"] == 3 and line["ms"] >= 0
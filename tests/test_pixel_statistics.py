@@ -0,0 +1,76 @@
+import pytest
+
+import pixel_statistics
+from pixel_statistics import compute_statistics, dominant_colors, brightness_category_of, HISTOGRAM_BINS
+
+numpy = pytest.importorskip("numpy")
+
+
+def solid(color, height=4, width=6, alpha=255):
+    pixels = numpy.zeros((height, width, 4), numpy.uint8)
+    pixels[...] = (*color, alpha)
+    return pixels
+
+
+def test_solid_image():
+    statistics = compute_statistics(solid((255, 0, 0)), has_alpha=False)
+    assert statistics["sample"] == "6x4"
+    assert statistics["mean_rgb"] == [255.0, 0.0, 0.0]
+    assert statistics["contrast"] == 0.0
+    assert statistics["dominant_colors"] == [{"color": "#ff0000", "share": 1.0}]
+    red = statistics["histograms"]["red"]
+    assert len(red) == HISTOGRAM_BINS and red[-1] == 1.0 and sum(red) == 1.0
+    assert statistics["histograms"]["green"][0] == 1.0
+
+
+def test_matches_direct_computation():
+    rng = numpy.random.default_rng(5)
+    pixels = rng.integers(0, 256, (30, 40, 4), dtype=numpy.uint8)
+    statistics = compute_statistics(pixels, has_alpha=False)
+    rgb = pixels[..., :3].reshape(-1, 3).astype(float)
+    luminance = rgb @ numpy.array(pixel_statistics.LUMINANCE_WEIGHTS)
+    assert statistics["mean_luminance"] == round(float(luminance.mean()), 2)
+    assert statistics["contrast"] == round(float(luminance.std()), 2)
+    for channel, name in enumerate(("red", "green", "blue")):
+        counts = numpy.bincount(pixels[..., channel].ravel() // (256 // HISTOGRAM_BINS), minlength=HISTOGRAM_BINS)
+        assert statistics["histograms"][name] == numpy.round(counts / (30 * 40), 4).tolist()
+
+
+def test_transparent_pixels_are_ignored():
+    pixels = solid((0, 0, 255))
+    pixels[:2, :, 3] = 0
+    pixels[:2, :, :3] = 255
+    statistics = compute_statistics(pixels, has_alpha=True)
+    assert statistics["transparent_share"] == 0.5
+    assert statistics["dominant_colors"] == [{"color": "#0000ff", "share": 1.0}]
+
+    empty = compute_statistics(solid((1, 2, 3), alpha=0), has_alpha=True)
+    assert empty == {"sample": "6x4", "transparent_share": 1.0}
+
+
+def test_dominant_colors_order():
+    rgb = numpy.array([(250, 250, 250)] * 6 + [(10, 10, 10)] * 3 + [(0, 200, 0)], numpy.uint8)
+    colors = dominant_colors(rgb, count=2)
+    assert [color["share"] for color in colors] == [0.6, 0.3]
+    assert colors[0]["color"] == "#fafafa"
+
+
+def test_brightness_categories():
+    assert brightness_category_of(10) == "Muy oscura"
+    assert brightness_category_of(130) == "Media"
+    assert brightness_category_of(250) == "Muy clara"
+
+
+def test_from_file(qapp, tmp_path):
+    from PyQt5.QtGui import QImage, QColor
+
+    image = QImage(600, 300, QImage.Format_RGB32)
+    image.fill(QColor(0, 128, 255))
+    path = str(tmp_path / "azul.png")
+    image.save(path)
+    statistics = pixel_statistics.pixel_statistics(path)
+    # Reducida a SAMPLE_SIZE de lado, sin canal alfa
+    assert statistics["sample"] == "256x128"
+    assert "transparent_share" not in statistics
+    assert statistics["dominant_colors"][0]["color"] == "#0080ff"
+    assert pixel_statistics.pixel_statistics(str(tmp_path / "no_existe.png")) is None
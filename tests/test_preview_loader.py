@@ -0,0 +1,62 @@
+import time
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QImage, QColor
+
+from preview_loader import PreviewLoader, load_preview
+from thumbnail_cache import ThumbnailCache
+
+SIZE = QSize(40, 40)
+
+
+def make_image(directory, name, width=80, height=60):
+    path = str(directory / name)
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor(20, 40, 60))
+    assert image.save(path, "PNG")
+    return path
+
+
+def wait_for(qapp, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def test_load_preview(qapp, tmp_path):
+    path = make_image(tmp_path, "a.png")
+    thumbnails = ThumbnailCache(str(tmp_path / "thumbs"))
+    preview = load_preview(thumbnails, path, SIZE)
+    assert (preview["width"], preview["height"]) == (80, 60)
+    assert preview["image"].width() == 40
+    assert preview["metadata"] is None
+
+    # Dimensiones del registro cuando se tiene
+    record = {"image_dimensions": {"width_pixels": 800, "height_pixels": 600}}
+    preview = load_preview(thumbnails, path, SIZE, load=lambda _path: record)
+    assert preview["metadata"] is record and preview["width"] == 800
+
+
+def test_only_latest_request_is_delivered(qapp, tmp_path):
+    paths = [make_image(tmp_path, f"{i}.png") for i in range(4)]
+    loader = PreviewLoader(ThumbnailCache(str(tmp_path / "thumbs")))
+    ready, failed = [], []
+    loader.ready.connect(lambda preview: ready.append(preview["path"]))
+    loader.failed.connect(lambda path, error: failed.append(path))
+    try:
+        loader.request(paths[0], SIZE)
+        loader.request(paths[1], SIZE, neighbours=[(paths[2], None), (paths[3], None)])
+        assert wait_for(qapp, lambda: ready and not loader.pending)
+        assert ready == [paths[1]]
+
+        # Los vecinos quedaron en la caché de miniaturas
+        keys = [loader.thumbnails.cache_key(path, SIZE) for path in paths[2:]]
+        assert all(key in loader.thumbnails.memory for key in keys)
+
+        loader.request(str(tmp_path / "no_existe.png"), SIZE)
+        assert wait_for(qapp, lambda: failed)
+        assert ready == [paths[1]]
+    finally:
+        loader.shutdown()
@@ -0,0 +1,63 @@
+from saved_list_model import SavedImagesModel
+
+
+def summary(name):
+    return {
+        "file_info": {"filename": name},
+        "image_dimensions": {"resolution": "10x10"},
+        "timestamps": {"metadata_created": "2024-01-01 00:00:00"}
+    }
+
+
+def make_model(paths):
+    images = {path: summary(path) for path in paths}
+    model = SavedImagesModel(images)
+    model.fetchMore()
+    return model, images
+
+
+def check_rows(model):
+    assert model.rows == {path: row for row, path in enumerate(model.paths)}
+
+
+def test_add_appends_new_paths():
+    model, images = make_model(["/p/a.jpg", "/p/b.jpg"])
+    images["/p/c.jpg"] = summary("c")
+    model.add_or_update(["/p/c.jpg"])
+    assert model.paths == ["/p/a.jpg", "/p/b.jpg", "/p/c.jpg"]
+    assert model.rowCount() == 3
+    check_rows(model)
+
+
+def test_hide_and_add_in_one_batch():
+    # Con un filtro activo, un lote que oculta filas y añade otras no pierde las nuevas
+    model, images = make_model(["/p/a.jpg", "/p/b.jpg", "/p/c.jpg"])
+    model.set_filter(["/p/a.jpg", "/p/b.jpg", "/p/c.jpg"], lambda path: path != "/p/a.jpg")
+    model.fetchMore()
+    images["/p/new.jpg"] = summary("new")
+
+    model.add_or_update(["/p/a.jpg", "/p/new.jpg"])
+    assert model.paths == ["/p/b.jpg", "/p/c.jpg", "/p/new.jpg"]
+    check_rows(model)
+    assert model.index_of("/p/new.jpg").row() == 2
+
+    # Guardar de nuevo la misma imagen actualiza su fila, no la repite
+    model.add_or_update(["/p/new.jpg"])
+    assert model.paths.count("/p/new.jpg") == 1
+    assert model.rowCount() == 3
+
+
+def test_duplicate_paths_in_batch_are_added_once():
+    model, images = make_model(["/p/a.jpg"])
+    images["/p/b.jpg"] = summary("b")
+    model.add_or_update(["/p/b.jpg", "/p/b.jpg"])
+    assert model.paths == ["/p/a.jpg", "/p/b.jpg"]
+    check_rows(model)
+
+
+def test_remove_updates_rows():
+    model, _ = make_model(["/p/a.jpg", "/p/b.jpg", "/p/c.jpg"])
+    model.remove(["/p/b.jpg"])
+    assert model.paths == ["/p/a.jpg", "/p/c.jpg"]
+    assert model.rowCount() == 2
+    check_rows(model)
@@ -0,0 +1,65 @@
+import os
+import time
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import QImage, QColor
+
+from thumbnail_cache import ThumbnailCache
+
+SIZE = QSize(32, 32)
+
+
+def make_image(directory, name, seed):
+    path = str(directory / name)
+    image = QImage(64, 48, QImage.Format_ARGB32)
+    # Píxeles distintos en cada imagen para que los PNG no se compriman igual
+    for x in range(64):
+        for y in range(48):
+            image.setPixelColor(x, y, QColor((x * seed) % 256, (y * seed) % 256, seed % 256, 200))
+    assert image.save(path, "PNG")
+    return path
+
+
+def thumb_files(cache):
+    return sorted(os.listdir(cache.cache_dir)) if os.path.isdir(cache.cache_dir) else []
+
+
+def test_memory_and_disk_tiers(qapp, tmp_path):
+    source = make_image(tmp_path, "a.png", 7)
+    cache = ThumbnailCache(str(tmp_path / "thumbs"))
+    image = cache.get(source, SIZE)
+    assert (image.width(), image.height()) == (32, 24)
+    assert cache.get(source, SIZE) is image
+    assert len(thumb_files(cache)) == 1
+
+    # Otra sesión lee la miniatura del disco
+    reopened = ThumbnailCache(str(tmp_path / "thumbs"))
+    assert reopened.get(source, SIZE).size() == image.size()
+
+
+def test_disk_cache_evicts_least_recently_used(qapp, tmp_path):
+    sources = [make_image(tmp_path, f"{i}.png", i + 3) for i in range(4)]
+    cache = ThumbnailCache(str(tmp_path / "thumbs"))
+    cache.get(sources[0], SIZE)
+    thumb_size = cache.disk_bytes
+    # Caben unas tres miniaturas
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), disk_budget=int(thumb_size * 3.5))
+
+    first_key = cache.cache_key(sources[0], SIZE)
+    old = time.time() - 100
+    for source in sources[1:3]:
+        cache.get(source, SIZE)
+    # El orden lo marca la última vez que se usó cada archivo
+    for offset, name in enumerate(thumb_files(cache)):
+        os.utime(os.path.join(cache.cache_dir, name), (old + offset, old + offset))
+    # Leer del disco la primera la hace la más reciente
+    cache.clear_memory()
+    cache.get(sources[0], SIZE)
+
+    cache.get(sources[3], SIZE)
+    files = thumb_files(cache)
+    assert len(files) <= 3
+    assert first_key + ".thumb" in files
+    assert cache.cache_key(sources[3], SIZE) + ".thumb" in files
+    assert cache.disk_bytes == sum(os.path.getsize(os.path.join(cache.cache_dir, name)) for name in files)
+    assert cache.disk_bytes <= cache.disk_budget
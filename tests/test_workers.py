@@ -0,0 +1,53 @@
+import threading
+import time
+
+from workers import TaskRunner
+
+
+def wait_for(qapp, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def test_results_and_errors_return_to_the_caller(qapp):
+    runner = TaskRunner()
+    results, errors, progress = [], [], []
+
+    def work(value, progress=None):
+        progress(1, 2)
+        progress(2, 2)
+        return value * 2
+
+    def fail():
+        raise ValueError("sin permiso")
+
+    runner.extract(work, 21, on_finished=results.append, on_progress=lambda done, total: progress.append(done))
+    runner.extract(fail, on_error=errors.append)
+    assert wait_for(qapp, lambda: results and errors and not runner.active)
+    assert results == [42]
+    assert errors == ["sin permiso"]
+    assert progress == [1, 2]
+
+
+def test_writes_run_one_at_a_time_in_order(qapp):
+    runner = TaskRunner()
+    order = []
+    running = []
+    lock = threading.Lock()
+
+    def write(index):
+        with lock:
+            running.append(index)
+            assert len(running) == 1
+        time.sleep(0.002)
+        order.append(index)
+        with lock:
+            running.remove(index)
+
+    for index in range(20):
+        runner.persist(write, index)
+    assert wait_for(qapp, lambda: len(order) == 20 and not runner.active)
+    assert order == list(range(20))
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from write_behind import WriteBehind
+
+
+class FakeTasks:
+    """Ejecuta las escrituras al momento, como el hilo de escritura"""
+
+    def persist(self, function, *args, on_finished=None, on_error=None, **kwargs):
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            if on_error is not None:
+                on_error(str(e))
+            return
+        if on_finished is not None:
+            on_finished(result)
+
+
+class FlakyWrite:
+    def __init__(self, failures):
+        self.failures = failures
+        self.batches = []
+
+    def __call__(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disco lleno")
+        self.batches.append(dict(batch))
+
+
+def process_until(qapp, condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end and not condition():
+        qapp.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+def test_saves_are_coalesced(qapp):
+    write = FlakyWrite(0)
+    writer = WriteBehind(FakeTasks(), write, delay=20, max_delay=1000)
+    writer.add({"a": 1})
+    writer.add({"a": 2, "b": 1})
+    assert process_until(qapp, lambda: write.batches)
+    assert write.batches == [{"a": 2, "b": 1}]
+    assert not writer.has_pending()
+
+
+def test_failed_write_is_retried_without_new_saves(qapp):
+    write = FlakyWrite(1)
+    writer = WriteBehind(FakeTasks(), write, delay=20, max_delay=1000)
+    failures = []
+    writer.failed.connect(failures.append)
+    writer.add({"a": 1}, immediate=True)
+    assert failures == ["disco lleno"]
+    assert writer.has_pending()
+    assert writer.timer.isActive()
+    assert process_until(qapp, lambda: write.batches)
+    assert write.batches == [{"a": 1}]
+    assert not writer.has_pending()
+
+
+def test_retry_keeps_newer_saves(qapp):
+    write = FlakyWrite(1)
+    writer = WriteBehind(FakeTasks(), write, delay=20, max_delay=1000)
+    # La escritura falla después de que llegó un guardado más nuevo de la misma imagen
+    writer.pending = {"a": "nuevo"}
+    writer._retry({"a": "viejo", "b": 1}, "error")
+    assert writer.pending == {"a": "nuevo", "b": 1}
+
+
+def test_flush_now_keeps_batch_when_write_fails(qapp):
+    write = FlakyWrite(1)
+    writer = WriteBehind(FakeTasks(), write, delay=1000, max_delay=1000)
+    writer.add({"a": 1})
+    with pytest.raises(OSError):
+        writer.flush_now()
+    assert writer.pending == {"a": 1}
+    writer.flush_now()
+    assert write.batches == [{"a": 1}]
+    assert not writer.has_pending()
+
+
+def test_lasting_failure_backs_off_and_reports_once(qapp, monkeypatch):
+    monkeypatch.setattr("write_behind.MAX_RETRY_DELAY", 80)
+    write = FlakyWrite(100)
+    writer = WriteBehind(FakeTasks(), write, delay=20, max_delay=1000)
+    failures = []
+    writer.failed.connect(failures.append)
+    writer.add({"a": 1}, immediate=True)
+    delays = [writer.retry_delay]
+    for _ in range(4):
+        writer.flush()
+        delays.append(writer.retry_delay)
+    assert delays == [20, 40, 80, 80, 80]
+    assert failures == ["disco lleno"]
+
+    # Un guardado nuevo no adelanta el reintento
+    writer.add({"b": 1}, immediate=True)
+    assert write.failures == 95 and writer.pending == {"a": 1, "b": 1}
+
+    # Tras una escritura correcta, el siguiente fallo se vuelve a avisar
+    write.failures = 0
+    writer.flush()
+    assert writer.retry_delay == 0 and write.batches == [{"a": 1, "b": 1}]
+    write.failures = 1
+    writer.add({"c": 1}, immediate=True)
+    assert failures == ["disco lleno", "disco lleno"]
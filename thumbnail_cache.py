@@ -0,0 +1,183 @@
+"""
+Caché de miniaturas para la vista previa.
+
+Dos niveles:
+- Memoria: LRU limitado por bytes (no por cantidad de imágenes).
+- Disco: archivos en thumbnails/ con nombre según el hash del contenido y el
+  tamaño pedido, así que sobreviven entre sesiones y a cambios de ruta.
+  Se guardan en JPEG, o en PNG si tienen transparencia. También está
+  limitado por bytes: cada lectura actualiza la fecha de modificación del
+  archivo y, al pasar de disk_budget, se borran los menos usados hasta
+  quedar en DISK_PRUNE_TARGET del límite (así no se poda en cada escritura).
+
+Las miniaturas se decodifican con QImageReader.setScaledSize, que en JPEG
+reduce la imagen durante la decodificación y nunca genera los píxeles a
+resolución completa. Se trabaja con QImage (no QPixmap) para poder generar
+miniaturas fuera del hilo de la interfaz.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from PyQt5.QtGui import QImage, QImageReader
+from PyQt5.QtCore import Qt
+from perf_trace import span, count
+
+# Fracción del límite de disco en la que se deja la caché al podarla
+DISK_PRUNE_TARGET = 0.9
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir="thumbnails", memory_budget=64 * 1024 * 1024,
+                 disk_budget=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.disk_budget = disk_budget
+        # Bytes de las miniaturas en disco (None hasta recorrer la carpeta)
+        self.disk_bytes = None
+        self.disk_lock = threading.Lock()
+
+    def get(self, path, size, content_hash=None):
+        """
+        Devuelve un QImage de la imagen reducido para caber en size
+        (QSize), o None si no se puede leer. content_hash es el hash guardado
+        en los metadatos; sin él la clave se calcula con ruta, tamaño y fecha.
+        """
+        key = self.cache_key(path, size, content_hash)
+        if key is None:
+            return None
+
+        with self.lock:
+            image = self.memory.get(key)
+            if image is not None:
+                self.memory.move_to_end(key)
+                count("thumbnail.memory_hit")
+                return image
+
+        disk_file = os.path.join(self.cache_dir, key + ".thumb")
+        image = QImage(disk_file) if os.path.exists(disk_file) else QImage()
+        if image.isNull():
+            count("thumbnail.miss")
+            image = self.decode_scaled(path, size)
+            if image is None:
+                return None
+            self.store_on_disk(disk_file, image)
+        else:
+            count("thumbnail.disk_hit")
+            self.touch(disk_file)
+
+        self.remember(key, image)
+        return image
+
+    def cache_key(self, path, size, content_hash=None):
+        if content_hash is None:
+            try:
+                file_stats = os.stat(path)
+            except OSError:
+                return None
+            fingerprint = f"{path}|{file_stats.st_size}|{int(file_stats.st_mtime)}"
+            content_hash = hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+        return f"{content_hash}_{size.width()}x{size.height()}"
+
+    def decode_scaled(self, path, size):
+        """Decodifica la imagen directamente al tamaño de la vista previa"""
+        reader = QImageReader(path)
+        original = reader.size()
+        if original.isValid() and (original.width() > size.width() or original.height() > size.height()):
+            reader.setScaledSize(original.scaled(size, Qt.KeepAspectRatio))
+        with span("preview.decode", width=original.width(), height=original.height()):
+            image = reader.read()
+        if image.isNull():
+            return None
+        # Algunos formatos ignoran setScaledSize o no informan el tamaño
+        if image.width() > size.width() or image.height() > size.height():
+            with span("preview.scale", width=image.width(), height=image.height()):
+                image = image.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return image
+
+    def store_on_disk(self, disk_file, image):
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            # JPEG salvo que haya transparencia; QImage detecta el formato al leer
+            image_format = "PNG" if image.hasAlphaChannel() else "JPG"
+            # Escritura atómica para que otro hilo nunca lea un archivo a medias
+            temp_file = f"{disk_file}.{threading.get_ident()}.tmp"
+            if image.save(temp_file, image_format, 90):
+                os.replace(temp_file, disk_file)
+                self.account(os.path.getsize(disk_file))
+        except OSError as e:
+            print(f"Error al guardar miniatura: {e}")
+
+    def touch(self, disk_file):
+        """Marca una miniatura del disco como usada ahora"""
+        try:
+            os.utime(disk_file)
+        except OSError:
+            pass
+
+    def disk_entries(self):
+        """(archivo, bytes, última vez usado) de las miniaturas en disco"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as files:
+                for entry in files:
+                    if entry.name.endswith(".thumb"):
+                        try:
+                            file_stats = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((entry.path, file_stats.st_size, file_stats.st_mtime))
+        except OSError:
+            pass
+        return entries
+
+    def account(self, added):
+        """Suma una miniatura guardada y poda el disco si se pasa del límite"""
+        with self.disk_lock:
+            if self.disk_bytes is None:
+                # La primera vez se mide la carpeta (ya incluye la miniatura nueva)
+                self.disk_bytes = sum(size for _file, size, _used in self.disk_entries())
+            else:
+                self.disk_bytes += added
+            if self.disk_bytes > self.disk_budget:
+                self.prune_disk()
+
+    def prune_disk(self):
+        """Borra las miniaturas menos usadas hasta quedar bajo el límite"""
+        with span("thumbnail.prune") as timing:
+            entries = sorted(self.disk_entries(), key=lambda entry: entry[2])
+            total = sum(size for _file, size, _used in entries)
+            target = self.disk_budget * DISK_PRUNE_TARGET
+            removed = 0
+            for disk_file, size, _used in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(disk_file)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self.disk_bytes = total
+            timing.set(removed=removed)
+
+    def remember(self, key, image):
+        """Guarda la miniatura en memoria y descarta las menos usadas si se pasa del límite"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return
+            self.memory[key] = image
+            self.memory_bytes += image.sizeInBytes()
+            while self.memory_bytes > self.memory_budget and len(self.memory) > 1:
+                _key, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= evicted.sizeInBytes()
+
+    def clear_memory(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
@@ -0,0 +1,89 @@
+"""
+Ejecución de tareas en segundo plano para la interfaz gráfica.
+
+La generación de metadatos (lectura de cabeceras, hash del archivo) se
+ejecuta en un pool de hilos y la escritura de la base de datos en un pool de
+un solo hilo, de modo que los guardados se aplican en orden sin bloquear la
+ventana. Los resultados, el progreso y los errores vuelven al hilo de la
+interfaz mediante señales de Qt.
+"""
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+
+class Worker(QRunnable):
+    """Ejecuta una función en un hilo del pool y avisa con señales"""
+
+    def __init__(self, function, *args, report_progress=False, **kwargs):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        if report_progress:
+            self.kwargs['progress'] = self.signals.progress.emit
+
+    def run(self):
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            return
+        self.signals.finished.emit(result)
+
+
+class TaskRunner(QObject):
+    """
+    Cola de tareas de la ventana principal.
+
+    extract() reparte trabajo en paralelo; persist() encola escrituras que se
+    ejecutan de una en una y en el orden en que se pidieron.
+    """
+
+    # Cantidad de tareas pendientes (para mostrar en la barra de estado)
+    pending_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.extract_pool = QThreadPool(self)
+        self.write_pool = QThreadPool(self)
+        self.write_pool.setMaxThreadCount(1)
+        # Referencias a los workers activos para que sus señales no se destruyan
+        self.active = set()
+
+    def extract(self, function, *args, on_finished=None, on_error=None, on_progress=None, **kwargs):
+        """Ejecuta function en el pool de extracción"""
+        return self._start(self.extract_pool, function, args, kwargs, on_finished, on_error, on_progress)
+
+    def persist(self, function, *args, on_finished=None, on_error=None, on_progress=None, **kwargs):
+        """Encola una escritura (o una lectura que debe ver las escrituras anteriores)"""
+        return self._start(self.write_pool, function, args, kwargs, on_finished, on_error, on_progress)
+
+    def _start(self, pool, function, args, kwargs, on_finished, on_error, on_progress):
+        worker = Worker(function, *args, report_progress=on_progress is not None, **kwargs)
+        if on_progress is not None:
+            worker.signals.progress.connect(on_progress)
+        worker.signals.finished.connect(lambda result: self._done(worker, on_finished, result))
+        worker.signals.error.connect(lambda message: self._done(worker, on_error, message))
+        self.active.add(worker)
+        self.pending_changed.emit(len(self.active))
+        pool.start(worker)
+        return worker
+
+    def _done(self, worker, callback, value):
+        self.active.discard(worker)
+        self.pending_changed.emit(len(self.active))
+        if callback is not None:
+            callback(value)
+
+    def pending(self):
+        return len(self.active)
+
+    def wait_for_writes(self):
+        """Espera a que terminen las escrituras encoladas (al cerrar la ventana)"""
+        self.write_pool.waitForDone()
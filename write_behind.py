@@ -0,0 +1,126 @@
+"""
+Escritura diferida de los guardados de la ventana principal.
+
+Los registros guardados se acumulan durante settings.write_delay_ms (cada
+guardado nuevo reinicia la espera, hasta un máximo de
+settings.max_write_delay_ms desde el primero pendiente) y se escriben juntos
+con una sola llamada a store.put_many en el hilo de escritura. Si una imagen
+se guarda varias veces dentro de la ventana solo se escribe la última
+versión. Diez guardados seguidos cuestan así una escritura y no diez.
+
+Un guardado se confirma (señal saved) solo cuando su escritura terminó, de
+modo que ninguno de los guardados confirmados se pierde; si la escritura
+falla, sus registros vuelven a pendiente y se reintentan con una espera que
+se duplica en cada fallo seguido, hasta MAX_RETRY_DELAY (también con
+flush_now, que además relanza el error). La señal failed se emite solo en el
+primer fallo de una racha, y no otra vez hasta que una escritura termine
+bien: un disco lleno no produce un aviso por reintento. Al cerrar la
+ventana se escribe todo lo pendiente con flush() y wait_for_writes(), y si
+ocurre un error no controlado, flush_now() escribe lo pendiente en el hilo
+actual. Los almacenes escriben de forma atómica (archivo temporal y
+os.replace, o diario de solo añadir), así que un cierre inesperado a mitad de
+escritura no deja la base dañada.
+"""
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+# Espera por defecto antes de escribir y espera máxima con guardados continuos (ms)
+DEFAULT_DELAY = 500
+DEFAULT_MAX_DELAY = 5000
+# Espera máxima entre reintentos de una escritura que sigue fallando (ms)
+MAX_RETRY_DELAY = 60000
+
+
+class WriteBehind(QObject):
+    # Registros {ruta: metadatos} que ya están escritos en el almacén
+    saved = pyqtSignal(dict)
+    # Mensaje del primer error de una racha de escrituras fallidas (sus registros siguen pendientes)
+    failed = pyqtSignal(str)
+
+    def __init__(self, tasks, write, delay=DEFAULT_DELAY, max_delay=DEFAULT_MAX_DELAY, parent=None):
+        super().__init__(parent)
+        self.tasks = tasks
+        self.write = write
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending = {}
+        self.first_pending = None
+        # Espera del próximo reintento; 0 mientras las escrituras terminan bien
+        self.retry_delay = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def add(self, records, immediate=False):
+        """Marca registros para escribir; immediate escribe sin esperar la ventana"""
+        if not records:
+            return
+        self.pending.update(records)
+        if self.retry_delay and self.timer.isActive():
+            # Tras un fallo se respeta la espera del reintento, que escribirá también estos
+            return
+        if immediate or not self.delay:
+            self.flush()
+            return
+        now = time.monotonic()
+        if self.first_pending is None:
+            self.first_pending = now
+        # Se espera delay desde el último guardado, sin pasar de max_delay desde el primero
+        remaining = self.max_delay - (now - self.first_pending) * 1000
+        self.timer.start(int(max(0, min(self.delay, remaining))))
+
+    def flush(self):
+        """Encola la escritura de todo lo pendiente"""
+        self.timer.stop()
+        self.first_pending = None
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = {}
+        self.tasks.persist(
+            self.write, batch,
+            on_finished=lambda _: self._written(batch),
+            on_error=lambda message: self._retry(batch, message)
+        )
+
+    def _written(self, batch):
+        self.retry_delay = 0
+        self.saved.emit(batch)
+
+    def _retry(self, batch, message):
+        # Lo que no se pudo escribir vuelve a pendiente, salvo lo que ya se guardó de nuevo
+        self._restore(batch)
+        first_failure = not self.retry_delay
+        # La espera parte de la normal (sin espera, la que se usa por defecto) y se duplica
+        if first_failure:
+            self.retry_delay = self.delay or DEFAULT_DELAY
+        else:
+            self.retry_delay = min(self.retry_delay * 2, MAX_RETRY_DELAY)
+        if self.first_pending is None:
+            self.first_pending = time.monotonic()
+        self.timer.start(self.retry_delay)
+        if first_failure:
+            self.failed.emit(message)
+
+    def _restore(self, batch):
+        for path, metadata in batch.items():
+            self.pending.setdefault(path, metadata)
+
+    def flush_now(self):
+        """Escribe lo pendiente en el hilo actual (ante un error no controlado)"""
+        self.timer.stop()
+        self.first_pending = None
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending = {}
+        try:
+            self.write(batch)
+        except Exception:
+            # Sigue pendiente para un nuevo intento
+            self._restore(batch)
+            raise
+        self.retry_delay = 0
+
+    def has_pending(self):
+        return bool(self.pending)